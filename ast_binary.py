@@ -0,0 +1,377 @@
+import mmap
+import struct
+import sys
+from array import array
+
+import ast_nodes
+from ast_nodes import Node
+
+
+# Layout (little-endian):
+#
+#   header     magic, version, then the size of every section below
+#   strings    offsets into a UTF-8 blob, one interned copy of each string
+#   types      per type tag: name and field names (string indexes)
+#   constants  ints too wide for a word, and floats: 1 byte tag + 8 bytes
+#   words      uint32 array holding every node, list and record
+#
+# A value is one word: the low 3 bits give its kind, the rest a payload.
+# Nodes, lists and records live in `words` and are referenced by their word
+# offset; a parent comes before its children:
+#
+#   node    [type tag, one value per field]
+#   list    [length, values...]
+#   record  [length, key string, value, key string, value...]  (params)
+
+magic = b"CAST"
+version = 1
+header = struct.Struct("<4sHHIIIIII")
+
+NONE, NODE, STRING, INT, CONSTANT, LIST, BOOL, RECORD = range(8)
+payload_limit = 1 << 29
+int_bias = 1 << 28
+constant_entry = struct.Struct("<cd")
+wide_int = struct.Struct("<cq")
+
+
+def pad(data):
+    return data + b"\0" * (-len(data) % 4)
+
+
+class Writer:
+    def __init__(self):
+        self.words = array("I")
+        self.strings = {}
+        self.types = {}
+        self.tags = {}
+        self.constants = []
+
+    def string(self, text):
+        index = self.strings.get(text)
+        if index is None:
+            index = self.strings[text] = len(self.strings)
+        return index
+
+    def type_tag(self, name, fields, key):
+        # Several keys (dict key order, ast_nodes slots) may share one tag.
+        tag = self.tags.get((name, fields))
+        if tag is None:
+            tag = self.tags[(name, fields)] = len(self.tags)
+            self.string(name)
+            for field in fields:
+                self.string(field)
+        self.types[key] = tag
+        return tag
+
+    def scalar(self, value):
+        if value is None:
+            return NONE
+        if value is True or value is False:
+            return BOOL | value << 3
+        if type(value) is str:
+            return STRING | self.string(value) << 3
+        if type(value) is int and -int_bias <= value < int_bias:
+            return INT | (value + int_bias) << 3
+        if type(value) in (int, float):
+            if type(value) is int and not -(1 << 63) <= value < 1 << 63:
+                # Wider than 64 bits: kept as decimal text in the string table.
+                self.string(str(value))
+            self.constants.append(value)
+            return CONSTANT | (len(self.constants) - 1) << 3
+        raise TypeError(f"Cannot serialize {type(value).__name__} in an AST")
+
+    def write(self, tree):
+        """Appends `tree` and returns the value word for its root. Each
+        container is written when popped, with a placeholder for every
+        child container; the child fills that slot with its reference once
+        it is written in turn."""
+        words = self.words
+        scalar = self.scalar
+        types = self.types
+        root = array("I", [0])
+        stack = [(tree, root, 0)]
+        while stack:
+            value, parent, slot = stack.pop()
+            offset = len(words)
+            kind = type(value)
+            if kind is list:
+                items = value
+                words.append(len(items))
+                reference = LIST
+            elif kind is dict:
+                keys = tuple(value)
+                if "type" in value:
+                    key = (value["type"], keys)
+                    tag = types.get(key)
+                    if tag is None:
+                        tag = self.type_tag(value["type"], tuple(name for name in keys if name != "type"), key)
+                    items = [item for name, item in value.items() if name != "type"]
+                    words.append(tag)
+                    reference = NODE
+                else:
+                    items = []
+                    words.append(len(value))
+                    for name, item in value.items():
+                        items.append(name)
+                        items.append(item)
+                    reference = RECORD
+            elif isinstance(value, Node):
+                names = value.__slots__
+                key = (value.type, names)
+                tag = types.get(key)
+                if tag is None:
+                    tag = self.type_tag(value.type, names, key)
+                items = [getattr(value, name) for name in names]
+                words.append(tag)
+                reference = NODE
+            else:
+                parent[slot] = scalar(value)
+                continue
+            if offset >= payload_limit:
+                raise OverflowError("AST too large for the binary format")
+            parent[slot] = reference | offset << 3
+            base = len(words)
+            if reference == RECORD:
+                # Keys are plain string indexes, not values.
+                for index in range(0, len(items), 2):
+                    items[index] = self.string(items[index])
+                words.extend(items[index] if index % 2 == 0 else 0 for index in range(len(items)))
+                values = range(1, len(items), 2)
+            else:
+                words.extend(bytes(len(items)))
+                values = range(len(items))
+            for index in values:
+                item = items[index]
+                if type(item) in (list, dict) or isinstance(item, Node):
+                    stack.append((item, words, base + index))
+                else:
+                    words[base + index] = scalar(item)
+        return root[0]
+
+    def to_bytes(self, root):
+        strings = list(self.strings)
+        blob = bytearray()
+        offsets = array("I", [0])
+        for text in strings:
+            blob += text.encode("utf-8")
+            offsets.append(len(blob))
+        types = array("I")
+        for name, fields in self.tags:
+            types.append(self.strings[name])
+            types.append(len(fields))
+            types.extend(self.strings[field] for field in fields)
+        constants = bytearray()
+        for value in self.constants:
+            if type(value) is float:
+                constants += constant_entry.pack(b"f", value)
+            elif -(1 << 63) <= value < 1 << 63:
+                constants += wide_int.pack(b"i", value)
+            else:
+                constants += wide_int.pack(b"s", self.strings[str(value)])
+        sections = [offsets, types, self.words]
+        if sys.byteorder != "little":
+            for section in sections:
+                section.byteswap()
+        head = header.pack(magic, version, 0, len(strings), len(blob), len(types), len(self.constants),
+                           len(self.words), root)
+        return b"".join([head, offsets.tobytes(), pad(bytes(blob)), types.tobytes(), pad(bytes(constants)),
+                         self.words.tobytes()])
+
+
+def dumps(tree):
+    """Serializes an AST (dict or ast_nodes) to bytes."""
+    writer = Writer()
+    root = writer.write(tree)
+    return writer.to_bytes(root)
+
+
+def dump(tree, file):
+    """Writes `tree` to a binary file object or path."""
+    data = dumps(tree)
+    if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__"):
+        with open(file, 'wb') as output:
+            output.write(data)
+    else:
+        file.write(data)
+
+
+class LazyNode:
+    """Mixin for nodes decoded on demand. Each loaded type gets a subclass
+    of its ast_nodes class with this mixin first; a field slot stays unset
+    until read, the AttributeError it raises lands in __getattr__, and the
+    decoded value is stored in the slot so later reads are plain slot
+    reads and return the same objects."""
+
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        index = self._fields.get(name)
+        if index is None:
+            raise AttributeError(name)
+        reader = self._reader
+        value = reader.value(reader.words[self._offset + 1 + index])
+        setattr(self, name, value)
+        return value
+
+    def __reduce__(self):
+        # Pickles as the plain ast_nodes class.
+        base = ast_nodes.node_classes[type(self).__name__]
+        return base, tuple(getattr(self, name) for name in self.__slots__)
+
+
+lazy_classes = {}
+
+
+def lazy_class(name, fields):
+    key = (name, fields)
+    cls = lazy_classes.get(key)
+    if cls is None:
+        base = ast_nodes.node_classes[name]
+        cls = lazy_classes[key] = type(name, (LazyNode, base), {
+            "__slots__": ("_reader", "_offset"),
+            "_fields": {field: index for index, field in enumerate(fields)},
+            "__module__": __name__,
+        })
+        # The two extra slots stay out of __slots__ as code walking node
+        # fields (children(), to_dict()) sees it.
+        cls.__slots__ = base.__slots__
+    return cls
+
+
+class Reader:
+    def __init__(self, data, lazy=True):
+        self.data = data
+        view = memoryview(data)
+        found, file_version, _, string_count, blob_size, type_words, constant_count, word_count, self.root = \
+            header.unpack_from(view)
+        if found != magic:
+            raise ValueError("Not a binary AST file")
+        if file_version != version:
+            raise ValueError(f"Unsupported binary AST version {file_version}")
+        position = header.size
+        self.string_offsets = self.section(view, position, string_count + 1)
+        position += 4 * (string_count + 1)
+        self.blob = view[position:position + blob_size]
+        position += blob_size + (-blob_size % 4)
+        type_table = self.section(view, position, type_words)
+        position += 4 * type_words
+        self.constants = view[position:position + constant_count * constant_entry.size]
+        position += len(self.constants) + (-len(self.constants) % 4)
+        self.words = self.section(view, position, word_count)
+        self.lazy = lazy
+        self.strings = [None] * string_count
+        self.types = []
+        index = 0
+        while index < len(type_table):
+            name = self.string(type_table[index])
+            fields = tuple(self.string(field) for field in type_table[index + 2:index + 2 + type_table[index + 1]])
+            cls = None
+            if lazy and name in ast_nodes.node_classes and set(fields) == set(ast_nodes.node_classes[name].__slots__):
+                cls = lazy_class(name, fields)
+            self.types.append((name, fields, cls))
+            index += 2 + type_table[index + 1]
+
+    def section(self, view, position, count):
+        words = view[position:position + 4 * count]
+        if sys.byteorder == "little":
+            return words.cast("I")
+        swapped = array("I", words.tobytes())
+        swapped.byteswap()
+        return swapped
+
+    def string(self, index):
+        text = self.strings[index]
+        if text is None:
+            offsets = self.string_offsets
+            text = self.strings[index] = sys.intern(str(self.blob[offsets[index]:offsets[index + 1]], "utf-8"))
+        return text
+
+    def scalar(self, kind, payload):
+        if kind == STRING:
+            return self.string(payload)
+        if kind == INT:
+            return payload - int_bias
+        if kind == NONE:
+            return None
+        if kind == BOOL:
+            return bool(payload)
+        tag, number = constant_entry.unpack_from(self.constants, payload * constant_entry.size)
+        if tag == b"f":
+            return number
+        number = wide_int.unpack_from(self.constants, payload * constant_entry.size)[1]
+        return number if tag == b"i" else int(self.string(number))
+
+    def value(self, word):
+        kind = word & 7
+        payload = word >> 3
+        if kind == NODE:
+            cls = self.types[self.words[payload]][2]
+            if cls is None:
+                return self.decode(word)
+            node = cls.__new__(cls)
+            node._reader = self
+            node._offset = payload
+            return node
+        if kind == LIST:
+            words = self.words
+            return [self.value(words[payload + 1 + index]) for index in range(words[payload])]
+        if kind == RECORD:
+            return self.decode(word)
+        return self.scalar(kind, payload)
+
+    def decode(self, word):
+        """Decodes the value `word` refers to into dicts and lists all the
+        way down, with an explicit stack. Node types outside ast_nodes, and
+        every node when not lazy, come out this way."""
+        words = self.words
+        result = [None]
+        stack = [(word, result, 0)]
+        while stack:
+            word, parent, key = stack.pop()
+            kind = word & 7
+            payload = word >> 3
+            if kind == NODE:
+                name, fields, cls = self.types[words[payload]]
+                if cls is not None:
+                    value = self.value(word)
+                else:
+                    value = {"type": name}
+                    for index, field in enumerate(fields):
+                        value[field] = None
+                        stack.append((words[payload + 1 + index], value, field))
+            elif kind == LIST:
+                value = [None] * words[payload]
+                stack.extend((words[payload + 1 + index], value, index) for index in range(words[payload]))
+            elif kind == RECORD:
+                value = {}
+                for index in range(words[payload]):
+                    field = self.string(words[payload + 1 + 2 * index])
+                    value[field] = None
+                    stack.append((words[payload + 2 + 2 * index], value, field))
+            else:
+                value = self.scalar(kind, payload)
+            parent[key] = value
+        return result[0]
+
+    def tree(self):
+        return self.value(self.root) if self.lazy else self.decode(self.root)
+
+
+def loads(data, lazy=True):
+    """AST from bytes made by dumps(). Lazily, nodes are ast_nodes-compatible
+    and decode each field on first access; otherwise the whole tree is
+    decoded to dicts."""
+    return Reader(data, lazy).tree()
+
+
+def load(file, lazy=True):
+    """AST from a path or binary file object. The file is memory-mapped, so
+    a lazy load reads only the parts of the tree that are used."""
+    if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__"):
+        with open(file, 'rb') as source:
+            return load(source, lazy)
+    try:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        data = file.read()
+    return loads(data, lazy)
@@ -0,0 +1,165 @@
+class Node:
+    """Base class for the compact AST.
+
+    Slot names mirror the keys of the dict nodes the Parser used to build, and
+    node["key"] / node.get("key") keep working so code written against the
+    dict representation can consume these nodes unchanged.
+    """
+    __slots__ = ()
+
+    @property
+    def type(self):
+        return type(self).__name__
+
+    def __getitem__(self, key):
+        if key == "type":
+            return type(self).__name__
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        if key == "type":
+            return type(self).__name__
+        return getattr(self, key, default)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __repr__(self):
+        fields = ", ".join(f"{slot}={getattr(self, slot)!r}" for slot in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def to_dict(self):
+        node = {"type": type(self).__name__}
+        for slot in self.__slots__:
+            node[slot] = _to_dict(getattr(self, slot))
+        return node
+
+
+def _to_dict(value):
+    if isinstance(value, Node):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_to_dict(item) for item in value]
+    return value
+
+
+class Program(Node):
+    __slots__ = ("body",)
+
+    def __init__(self, body):
+        self.body = body
+
+
+class FunctionDeclaration(Node):
+    __slots__ = ("name", "returnType", "params", "body", "line", "column")
+
+    def __init__(self, name, returnType, params, body, line=None, column=None):
+        self.name = name
+        self.returnType = returnType
+        self.params = params
+        self.body = body
+        self.line = line
+        self.column = column
+
+
+class VariableDeclaration(Node):
+    __slots__ = ("datatype", "name", "line", "column")
+
+    def __init__(self, datatype, name, line=None, column=None):
+        self.datatype = datatype
+        self.name = name
+        self.line = line
+        self.column = column
+
+
+class AssignmentExpression(Node):
+    __slots__ = ("left", "right")
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+
+class ReturnStatement(Node):
+    __slots__ = ("argument",)
+
+    def __init__(self, argument):
+        self.argument = argument
+
+
+class Identifier(Node):
+    __slots__ = ("name", "line", "column")
+
+    def __init__(self, name, line=None, column=None):
+        self.name = name
+        self.line = line
+        self.column = column
+
+
+class Literal(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class ExpressionStatement(Node):
+    __slots__ = ("expression",)
+
+    def __init__(self, expression):
+        self.expression = expression
+
+
+class BinaryExpression(Node):
+    __slots__ = ("operator", "left", "right")
+
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+
+class UnaryExpression(Node):
+    __slots__ = ("operator", "argument")
+
+    def __init__(self, operator, argument):
+        self.operator = operator
+        self.argument = argument
+
+
+class UpdateExpression(Node):
+    __slots__ = ("operator", "argument", "prefix")
+
+    def __init__(self, operator, argument, prefix):
+        self.operator = operator
+        self.argument = argument
+        self.prefix = prefix
+
+
+class CallExpression(Node):
+    __slots__ = ("callee", "arguments")
+
+    def __init__(self, callee, arguments):
+        self.callee = callee
+        self.arguments = arguments
+
+
+class MemberExpression(Node):
+    __slots__ = ("object", "property")
+
+    def __init__(self, object, property):
+        self.object = object
+        self.property = property
+
+
+node_classes = {cls.__name__: cls for cls in (
+    Program, FunctionDeclaration, VariableDeclaration, AssignmentExpression,
+    ReturnStatement, Identifier, Literal, ExpressionStatement, BinaryExpression,
+    UnaryExpression, UpdateExpression, CallExpression, MemberExpression)}
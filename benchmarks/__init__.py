@@ -0,0 +1,5 @@
+"""Throughput benchmarks for the compiler pipeline.
+
+Run with ``python -m benchmarks`` from the repository root; see
+``python -m benchmarks --help`` for corpus size and baseline options.
+"""
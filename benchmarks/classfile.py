@@ -0,0 +1,75 @@
+"""Latency of the direct class file backend against Java source plus javac.
+
+    python -m benchmarks.classfile [--functions 200] [--runs 5]
+
+Times turning an analyzed AST into loadable bytecode: generate_class_file
+on one side, generate_java_code followed by a javac run on the other. The
+javac column is n/a when javac is not on PATH. With java on PATH the
+direct class is also run once to check it loads and verifies.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+from classfile import generate_class_file
+from emitter import generate_java_code
+from main import Lexer, Parser, SemanticAnalyzer
+
+from benchmarks.corpus import generate_program
+
+
+def median_time(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog="python -m benchmarks.classfile")
+    argparser.add_argument("--functions", type=int, default=200)
+    argparser.add_argument("--runs", type=int, default=5)
+    args = argparser.parse_args(argv)
+
+    source = generate_program(args.functions) + "int main() {\n    return 0;\n}\n"
+    tree = Parser(Lexer(source)).parse()
+    SemanticAnalyzer(tree).analyze()
+
+    with tempfile.TemporaryDirectory() as directory:
+        class_path = os.path.join(directory, "MainClass.class")
+
+        def direct():
+            with open(class_path, 'wb') as class_file:
+                class_file.write(generate_class_file(tree))
+
+        def via_javac():
+            java_path = os.path.join(directory, "MainClass.java")
+            with open(java_path, 'w') as java_file:
+                generate_java_code(tree, java_file)
+            subprocess.run(["javac", "-d", directory, java_path], check=True)
+
+        direct_time = median_time(direct, args.runs)
+        class_size = os.path.getsize(class_path)
+        verified = "n/a"
+        if shutil.which("java"):
+            result = subprocess.run(["java", "-Xverify:all", "-cp", directory, "MainClass"],
+                                    capture_output=True, text=True)
+            verified = "yes" if result.returncode == 0 else f"no: {result.stderr.strip()}"
+        javac_time = median_time(via_javac, args.runs) if shutil.which("javac") else None
+
+    print(f"{args.functions} functions, {len(source)} bytes of C")
+    print(f"direct     {direct_time * 1e3:10.2f} ms  ({class_size} bytes, verified: {verified})")
+    if javac_time is None:
+        print(f"{'javac':10} {'n/a':>10}")
+    else:
+        print(f"javac      {javac_time * 1e3:10.2f} ms  ({javac_time / direct_time:.0f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import random
+
+from .new_path import reserved_words, operators
+
+
+types = ["int", "float"]
+
+
+def generate_program(functions=100, statements=20, seed=0):
+    """C source in the subset main.Parser accepts: functions with
+    parameters, declarations, assignments and returns. Every identifier is
+    declared before use, so the result also passes SemanticAnalyzer."""
+    rng = random.Random(seed)
+    parts = []
+    for f in range(functions):
+        params = [f"p{f}_{i}" for i in range(rng.randint(0, 3))]
+        declared = list(params)
+        signature = ", ".join(f"{rng.choice(types)} {name}" for name in params)
+        parts.append(f"{rng.choice(types)} f{f}({signature}) {{\n")
+        for s in range(statements):
+            if not declared or rng.random() < 0.3:
+                name = f"v{f}_{s}"
+                declared.append(name)
+                parts.append(f"    {rng.choice(types)} {name};\n")
+            else:
+                target = rng.choice(declared)
+                value = rng.choice(declared) if rng.random() < 0.5 else str(rng.randint(0, 100000))
+                parts.append(f"    {target} = {value};\n")
+        result = rng.choice(declared) if declared else str(rng.randint(0, 9))
+        parts.append(f"    return {result};\n}}\n")
+    return "".join(parts)
+
+
+def generate_wide_program(functions=100, statements=20, seed=0):
+    """C-like source exercising the wider token set of new/dict.py
+    (reserved words, every operator, floats and text constants) for the
+    new/utils.Utils scanners. It is not meant to parse."""
+    rng = random.Random(seed)
+    keywords = [word for word in reserved_words if word not in ("include",)]
+    parts = []
+    for f in range(functions):
+        parts.append(f"int funcao_{f}(int a, float b) {{\n")
+        for s in range(statements):
+            kind = rng.random()
+            left = f"x{rng.randint(0, 50)}"
+            right = f"y{rng.randint(0, 50)}"
+            if kind < 0.4:
+                parts.append(f"    {left} {rng.choice(operators)} {right} {rng.choice(operators)} {rng.randint(0, 999)};\n")
+            elif kind < 0.6:
+                parts.append(f"    {rng.choice(keywords)} ({left} >= {rng.random() * 100:.3f}) {{ {right} += 1; }}\n")
+            elif kind < 0.8:
+                parts.append(f"    printf(\"valor %d de {left}\", {left});\n")
+            else:
+                parts.append(f"    {rng.choice(keywords)} {left}, {right};\n")
+        parts.append("    return a;\n}\n")
+    return "".join(parts)
@@ -0,0 +1,76 @@
+"""Turnaround of the warm compiler server against a cold driver.py run.
+
+    python -m benchmarks.daemon [--functions 50] [--runs 5]
+
+Compiles one synthetic C file three ways:
+- a fresh `python driver.py -j 1` process
+- a request to a CompilerServer that has to recompile the file
+- a request for the same, unchanged file, which the server skips
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import daemon
+
+from benchmarks.corpus import generate_program
+
+
+def median_time(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog="python -m benchmarks.daemon")
+    argparser.add_argument("--functions", type=int, default=50)
+    argparser.add_argument("--runs", type=int, default=5)
+    args = argparser.parse_args(argv)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as directory:
+        c_path = os.path.join(directory, "program.c")
+        with open(c_path, 'w') as source:
+            source.write(generate_program(args.functions))
+        output_dir = os.path.join(directory, "build")
+        socket_path = os.path.join(directory, "server.sock")
+
+        def cold():
+            subprocess.run([sys.executable, os.path.join(root, "driver.py"), "-j", "1", "-d", output_dir, c_path],
+                           check=True, capture_output=True)
+
+        def compile_request(force):
+            return lambda: daemon.request({"command": "compile", "files": [c_path], "output_dir": output_dir,
+                                           "force": force}, socket_path)
+
+        service = daemon.CompilerService()
+        service.warm_up()
+        server = daemon.CompilerServer(socket_path, service)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            cold_time = median_time(cold, args.runs)
+            warm_time = median_time(compile_request(True), args.runs)
+            unchanged_time = median_time(compile_request(False), args.runs)
+        finally:
+            server.shutdown()
+            thread.join()
+            server.server_close()
+
+    print(f"{args.functions} functions")
+    print(f"cold driver.py  {cold_time * 1e3:10.2f} ms")
+    print(f"warm server     {warm_time * 1e3:10.2f} ms  ({cold_time / warm_time:.1f}x faster)")
+    print(f"unchanged file  {unchanged_time * 1e3:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
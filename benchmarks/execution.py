@@ -0,0 +1,82 @@
+"""Cost of running a small program in-process against a JVM round trip.
+
+    python -m benchmarks.execution [--runs 200]
+
+Times pycode.run on an analyzed program: the compile to a code object plus
+the call, and the call alone on a precompiled code object. When java is
+on PATH, the same program is also written with the class file backend and
+run in a fresh JVM. That is the cheapest JVM path, since it skips javac.
+"""
+import argparse
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+import pycode
+from classfile import generate_class_file
+from main import Lexer, Parser, SemanticAnalyzer
+
+source = """
+int square(int x) {
+    return x * x;
+}
+float mean(int a, int b) {
+    float total;
+    total = a + b;
+    return total / 2;
+}
+int main() {
+    int a;
+    int b;
+    a = 12;
+    b = square(a) - 7 % 3;
+    return mean(a, b) > 50 && b != 0;
+}
+"""
+
+
+def median_time(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog="python -m benchmarks.execution")
+    argparser.add_argument("--runs", type=int, default=200)
+    argparser.add_argument("--jvm-runs", type=int, default=5)
+    args = argparser.parse_args(argv)
+
+    tree = Parser(Lexer(source)).parse()
+    SemanticAnalyzer(tree).analyze()
+    code = pycode.compile_program(tree)
+
+    def front_end_and_run():
+        program = Parser(Lexer(source)).parse()
+        SemanticAnalyzer(program).analyze()
+        pycode.run(program, io.StringIO())
+
+    rows = [
+        ("lex to run", median_time(front_end_and_run, args.runs)),
+        ("compile + run", median_time(lambda: pycode.run(tree, io.StringIO()), args.runs)),
+        ("run", median_time(lambda: pycode.run(code, io.StringIO()), args.runs)),
+    ]
+    if shutil.which("java"):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "MainClass.class"), 'wb') as class_file:
+                class_file.write(generate_class_file(tree))
+            rows.append(("java", median_time(lambda: subprocess.run(
+                ["java", "-cp", directory, "MainClass"], check=True, stdout=subprocess.DEVNULL), args.jvm_runs)))
+    for name, seconds in rows:
+        print(f"{name:15}{seconds * 1e6:12.1f} us")
+
+
+if __name__ == "__main__":
+    main()
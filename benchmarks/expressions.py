@@ -0,0 +1,50 @@
+"""Scaling of Parser.parse_expression on pathological expressions.
+
+    python -m benchmarks.expressions [--sizes 1000 10000 100000]
+
+Each shape is parsed at growing sizes; roughly constant time per token
+shows the parse is linear, and the largest sizes go far past Python's
+recursion limit.
+"""
+import argparse
+import time
+
+from emitter import JavaEmitter
+from main import Lexer, Parser
+
+
+shapes = {
+    "nested parentheses": lambda n: "(" * n + "a" + ")" * n,
+    "long chain": lambda n: " + ".join(f"a{i % 7} * {i}" for i in range(n)),
+    "assignment chain": lambda n: " = ".join(f"a{i}" for i in range(n)) + " = 1",
+    "prefix operators": lambda n: "-" * n + "a",
+    "nested calls": lambda n: "f(" * n + "a" + ")" * n,
+}
+
+
+def measure(source):
+    tokens = Lexer(source).tokens
+    start = time.perf_counter()
+    tree = Parser(Lexer.from_tokens(tokens), compact=True).parse_expression()
+    parse_time = time.perf_counter() - start
+    start = time.perf_counter()
+    JavaEmitter().expression(tree)
+    emit_time = time.perf_counter() - start
+    return len(tokens), parse_time, emit_time
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog="python -m benchmarks.expressions")
+    argparser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = argparser.parse_args(argv)
+
+    print(f"{'shape':20}{'size':>9}{'tokens':>10}{'parse ms':>11}{'ns/token':>10}{'emit ms':>10}")
+    for name, build in shapes.items():
+        for size in args.sizes:
+            tokens, parse_time, emit_time = measure(build(size))
+            print(f"{name:20}{size:9}{tokens:10}{parse_time * 1e3:11.2f}"
+                  f"{parse_time / tokens * 1e9:10.0f}{emit_time * 1e3:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
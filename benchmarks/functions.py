@@ -0,0 +1,69 @@
+"""Function-level parallelism within a single large file.
+
+    python -m benchmarks.functions [--functions 4000] [--jobs N] [-O 1] [--runs 3]
+
+Generates one C program with `--functions` functions, parses it once per
+run and times semantic analysis, optimization and Java emission run one
+after another against parallel.generate_java_code on a process pool and a
+thread pool. Parsing stays serial in every variant and is not timed. The
+speedup is bounded by the core count; with the GIL the thread pool mostly
+shows the cost of the split itself.
+"""
+import argparse
+import os
+import statistics
+import time
+
+import ir
+import parallel
+from main import Lexer, Parser, SemanticAnalyzer, generate_java_code
+from optimizer import optimize
+
+from benchmarks.corpus import generate_program
+
+
+def median_time(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog="python -m benchmarks.functions")
+    argparser.add_argument("--functions", type=int, default=4000)
+    argparser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    argparser.add_argument("-O", dest="optimization", type=int, default=1, choices=(0, 1, 2))
+    argparser.add_argument("--runs", type=int, default=3)
+    args = argparser.parse_args(argv)
+
+    source_text = generate_program(args.functions)
+
+    def sequential(tree):
+        SemanticAnalyzer(tree).analyze()
+        tree = optimize(tree, args.optimization)
+        if args.optimization >= 2:
+            tree, _ = ir.lower(tree)
+        return generate_java_code(tree)
+
+    def pooled(executor):
+        return lambda tree: parallel.generate_java_code(tree, None, "MainClass", args.optimization, args.jobs,
+                                                        executor=executor)
+
+    # Parsed up front: every variant starts from a fresh, unanalyzed tree.
+    results = {}
+    for name, compile_tree in (("sequential", sequential), ("processes", pooled("process")),
+                               ("threads", pooled("thread"))):
+        trees = [Parser(Lexer(source_text)).parse() for _ in range(args.runs)]
+        results[name] = median_time(lambda: compile_tree(trees.pop()), args.runs)
+
+    print(f"{args.functions} functions, {len(source_text) / 1e6:.1f} MB, -O{args.optimization}, "
+          f"{args.jobs} jobs on {os.cpu_count()} cores")
+    for name, seconds in results.items():
+        print(f"{name:<12}{seconds * 1e3:10.1f} ms  ({results['sequential'] / seconds:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
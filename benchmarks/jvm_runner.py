@@ -0,0 +1,78 @@
+"""Running many compiled programs: a JVM per program against one JVM.
+
+    python -m benchmarks.jvm_runner [--programs 50] [--runs 3]
+
+Writes `--programs` small generated programs with the class file backend,
+so javac is not part of the timing, then runs all of them once with a
+fresh `java` process each and once through a JvmRunner, counting its JVM
+start. JvmRunner compiles its harness with javac on first use; that is
+done before timing. Needs java and javac on PATH.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+from classfile import generate_class_file
+from jvm_runner import JvmRunner
+from main import Lexer, Parser, SemanticAnalyzer
+
+from benchmarks.corpus import generate_program
+
+
+def median_time(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog="python -m benchmarks.jvm_runner")
+    argparser.add_argument("--programs", type=int, default=50)
+    argparser.add_argument("--functions", type=int, default=5)
+    argparser.add_argument("--runs", type=int, default=3)
+    args = argparser.parse_args(argv)
+
+    if not (shutil.which("java") and shutil.which("javac")):
+        print("java and javac are needed on PATH")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        class_names = []
+        for index in range(args.programs):
+            source_text = generate_program(args.functions, seed=index) + "int main() {\n    return 0;\n}\n"
+            tree = Parser(Lexer(source_text)).parse()
+            SemanticAnalyzer(tree).analyze()
+            class_name = f"Program{index}"
+            with open(os.path.join(directory, class_name + ".class"), 'wb') as class_file:
+                class_file.write(generate_class_file(tree, class_name))
+            class_names.append(class_name)
+
+        def fresh_jvms():
+            for class_name in class_names:
+                subprocess.run(["java", "-cp", directory, class_name], check=True, stdout=subprocess.DEVNULL)
+
+        def one_jvm():
+            with JvmRunner(harness_dir=os.path.join(directory, "harness")) as runner:
+                for result in runner.run_many((class_name, directory) for class_name in class_names):
+                    if not result.ok:
+                        raise RuntimeError(f"{result.class_name}: {result.status}: {result.stderr}")
+
+        JvmRunner(harness_dir=os.path.join(directory, "harness")).harness()
+        fresh_time = median_time(fresh_jvms, args.runs)
+        shared_time = median_time(one_jvm, args.runs)
+
+    print(f"{args.programs} programs")
+    print(f"JVM per program {fresh_time * 1e3:10.1f} ms  ({fresh_time / args.programs * 1e3:.1f} ms/program)")
+    print(f"one JVM         {shared_time * 1e3:10.1f} ms  ({shared_time / args.programs * 1e3:.1f} ms/program, "
+          f"{fresh_time / shared_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
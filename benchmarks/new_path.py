@@ -0,0 +1,11 @@
+# new/ is a directory of scripts that import each other by plain module
+# name (from dict import *), so it has to be on sys.path to be imported.
+# It goes last so new/main.py does not shadow the top-level main.py.
+import os
+import sys
+
+new_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "new")
+if new_dir not in sys.path:
+    sys.path.append(new_dir)
+
+from dict import reserved as reserved_words, ops as operators  # noqa: E402
@@ -0,0 +1,101 @@
+"""Dict AST nodes against the __slots__ classes of Parser(compact=True).
+
+    python -m benchmarks.nodes [--functions 20000]
+
+Builds the tree of a synthetic program both ways from the same tokens and
+reports the build time, the memory held by the tree and the time of a walk
+over it.
+"""
+import argparse
+import time
+import tracemalloc
+
+from main import Lexer, Parser
+
+
+function_template = """
+int f{n}(int p{n}, float q{n}) {{
+    int a{n};
+    float b{n};
+    a{n} = {n};
+    b{n} = p{n};
+    return a{n};
+}}
+"""
+
+
+def generate_source(functions):
+    return "".join(function_template.format(n=n) for n in range(functions))
+
+
+def build(tokens, compact):
+    return Parser(Lexer.from_tokens(tokens), compact=compact).parse()
+
+
+def measure_build(tokens, compact):
+    tracemalloc.start()
+    start = time.perf_counter()
+    tree = build(tokens, compact)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tree, elapsed, size
+
+
+def walk_dicts(tree):
+    count = 0
+    for function in tree["body"]:
+        count += len(function["name"])
+        for statement in function["body"]:
+            if statement["type"] == "AssignmentExpression":
+                count += len(statement["left"]["name"])
+    return count
+
+
+def walk_nodes(tree):
+    count = 0
+    for function in tree.body:
+        count += len(function.name)
+        for statement in function.body:
+            if type(statement).__name__ == "AssignmentExpression":
+                count += len(statement.left.name)
+    return count
+
+
+def time_walk(walk, tree, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        walk(tree)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog="python -m benchmarks.nodes")
+    argparser.add_argument("--functions", type=int, default=20000)
+    args = argparser.parse_args(argv)
+    functions = args.functions
+    # Tokens are materialised once so only tree construction is measured.
+    tokens = Lexer(generate_source(functions)).tokens
+
+    dict_tree, dict_time, dict_size = measure_build(tokens, compact=False)
+    del dict_tree
+    node_tree, node_time, node_size = measure_build(tokens, compact=True)
+    del node_tree
+
+    dict_tree = build(tokens, compact=False)
+    node_tree = build(tokens, compact=True)
+    assert node_tree.to_dict() == dict_tree
+    dict_walk = time_walk(walk_dicts, dict_tree)
+    node_walk = time_walk(walk_nodes, node_tree)
+
+    print(f"{functions} functions, {len(tokens)} tokens")
+    print(f"{'':8}{'build (s)':>12}{'memory (MB)':>14}{'walk (ms)':>12}")
+    print(f"{'dict':8}{dict_time:12.3f}{dict_size / 1e6:14.1f}{dict_walk * 1e3:12.2f}")
+    print(f"{'slots':8}{node_time:12.3f}{node_size / 1e6:14.1f}{node_walk * 1e3:12.2f}")
+    print(f"memory ratio: {dict_size / node_size:.2f}x, walk speedup: {dict_walk / node_walk:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Effect of -O1 on generated programs.
+
+    python -m benchmarks.optimization [--statements 2000] [--runs 5]
+
+Compiles a synthetic program at -O0 and -O1 and reports the statements and
+bytes of Java emitted. When javac and java are on PATH the generated
+classes are also compiled and run, and the median run time is reported.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+from emitter import generate_java_code
+from main import Lexer, Parser, SemanticAnalyzer
+from optimizer import optimize
+
+
+def generate_program(statements):
+    """A main() full of constant arithmetic, stores that are overwritten
+    before being read, and code after the return."""
+    lines = ["int helper(int x) {", "    return x * 2;", "}", "int main() {", "    int t0;", "    t0 = 1;"]
+    for i in range(1, statements):
+        lines.append(f"    int t{i};")
+        if i % 3 == 0:
+            lines.append(f"    t{i} = helper(t{i - 1}) + {i} * 2;")
+        elif i % 3 == 1:
+            lines.append(f"    t{i} = t{i - 1} * 3 + {i} - {i} / 2;")
+        else:
+            lines.append(f"    t{i} = {i};")
+            lines.append(f"    t{i} = t{i - 1} % 1000 + ({i} + 1) * 0;")
+    lines.append(f"    return t{statements - 1};")
+    lines.extend(f"    t0 = {i};" for i in range(statements // 10))
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def count_statements(tree):
+    return sum(len([s for s in function["body"] if s is not None]) for function in tree["body"])
+
+
+def run_java(java_source, runs):
+    if not (shutil.which("javac") and shutil.which("java")):
+        return None
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "MainClass.java"), 'w') as java_file:
+            java_file.write(java_source)
+        subprocess.run(["javac", "MainClass.java"], cwd=directory, check=True)
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run(["java", "MainClass"], cwd=directory, check=True, stdout=subprocess.DEVNULL)
+            times.append(time.perf_counter() - start)
+        return statistics.median(times)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog="python -m benchmarks.optimization")
+    argparser.add_argument("--statements", type=int, default=2000)
+    argparser.add_argument("--runs", type=int, default=5)
+    args = argparser.parse_args(argv)
+
+    source = generate_program(args.statements)
+    print(f"{'level':6}{'statements':>12}{'java bytes':>12}{'optimize ms':>13}{'run ms':>10}")
+    for level in (0, 1):
+        tree = Parser(Lexer(source)).parse()
+        SemanticAnalyzer(tree).analyze()
+        start = time.perf_counter()
+        optimize(tree, level)
+        elapsed = time.perf_counter() - start
+        java_source = generate_java_code(tree)
+        run_time = run_java(java_source, args.runs)
+        run = f"{run_time * 1e3:10.1f}" if run_time is not None else f"{'n/a':>10}"
+        print(f"-O{level:<4}{count_statements(tree):12}{len(java_source):12}{elapsed * 1e3:13.2f}{run}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Per-pass cost and effect of the IR pipeline.
+
+    python -m benchmarks.passes [--functions 200] [--runs 5]
+
+Lowers a synthetic program to IR and runs the default passes, reporting
+the median time of each pass and the number of instructions left after
+the whole pipeline.
+"""
+import argparse
+import statistics
+
+import ir
+from main import Lexer, Parser, SemanticAnalyzer
+
+from benchmarks.corpus import generate_program
+
+
+def count_instructions(module):
+    return sum(len(block.instructions) for function in module.functions for block in function.blocks)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog="python -m benchmarks.passes")
+    argparser.add_argument("--functions", type=int, default=200)
+    argparser.add_argument("--runs", type=int, default=5)
+    args = argparser.parse_args(argv)
+
+    tree = Parser(Lexer(generate_program(args.functions))).parse()
+    SemanticAnalyzer(tree).analyze()
+    samples = {}
+    for _ in range(args.runs):
+        module = ir.build(tree)
+        before = count_instructions(module)
+        manager = ir.PassManager()
+        manager.run(module)
+        for name, seconds in manager.timings.items():
+            samples.setdefault(name, []).append(seconds)
+    print(f"{args.functions} functions, {before} instructions before, {count_instructions(module)} after")
+    for name, times in samples.items():
+        print(f"{name:20}{statistics.median(times) * 1e3:10.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
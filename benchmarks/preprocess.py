@@ -0,0 +1,61 @@
+"""Cost of shared headers with and without the parsed-header cache.
+
+    python -m benchmarks.preprocess [--files 50] [--functions 200] [--runs 3]
+
+Writes one header of synthetic functions behind an include guard and
+`--files` small C files that include it, then preprocesses and parses
+every file with a fresh HeaderCache per file (each header read, lexed and
+parsed once per file) and with one HeaderCache shared by the batch.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import preprocessor
+
+from benchmarks.corpus import generate_program
+
+
+def median_time(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog="python -m benchmarks.preprocess")
+    argparser.add_argument("--files", type=int, default=50)
+    argparser.add_argument("--functions", type=int, default=200)
+    argparser.add_argument("--runs", type=int, default=3)
+    args = argparser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "shared.h"), 'w') as header:
+            header.write("#ifndef SHARED_H\n#define SHARED_H\n" + generate_program(args.functions) + "#endif\n")
+        sources = []
+        for index in range(args.files):
+            path = os.path.join(directory, f"unit{index}.c")
+            sources.append((path, f'#include "shared.h"\nint main() {{\n    return {index};\n}}\n'))
+
+        def batch(shared):
+            cache = preprocessor.HeaderCache()
+            for path, source_text in sources:
+                preprocessor.preprocess(source_text, path, (), cache).parse(cache)
+                if not shared:
+                    cache = preprocessor.HeaderCache()
+
+        fresh_time = median_time(lambda: batch(False), args.runs)
+        shared_time = median_time(lambda: batch(True), args.runs)
+
+    print(f"{args.files} files including a header of {args.functions} functions")
+    print(f"per-file cache  {fresh_time * 1e3:10.2f} ms")
+    print(f"shared cache    {shared_time * 1e3:10.2f} ms  ({fresh_time / shared_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+from .corpus import generate_program, generate_wide_program
+from . import new_path  # noqa: F401  (puts new/ on sys.path for utils)
+
+
+def best_time(function, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_allocation(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def stages(source, wide_source):
+    """(name, callable, token count) for every benchmarked stage. Each
+    stage gets the previous stage's output prepared in advance, so only
+    that stage is timed."""
+    from emitter import generate_java_code
+    from main import Lexer, Parser, SemanticAnalyzer, TokenBuffer
+    from utils import Utils
+
+    tokens = Lexer(source).tokens
+    tree = Parser(Lexer.from_tokens(tokens)).parse()
+    count = len(tokens)
+
+    def lex():
+        return sum(1 for _ in Lexer("", streaming=True).tokenize(source))
+
+    encoded = source.encode()
+
+    def lex_buffer():
+        return len(TokenBuffer(encoded))
+
+    def parse():
+        return Parser(Lexer.from_tokens(tokens)).parse()
+
+    def analyze():
+        SemanticAnalyzer(tree).analyze()
+
+    def codegen():
+        return generate_java_code(tree)
+
+    def utils_chain():
+        analyser = Utils(None)
+        programa = wide_source
+        with contextlib.redirect_stdout(io.StringIO()):
+            for rule in analyser.rules():
+                programa = rule(programa)
+        return analyser
+
+    def utils_scan():
+        analyser = Utils(None)
+        analyser.scan(wide_source)
+        return analyser
+
+    wide_encoded = wide_source.encode()
+
+    def utils_scan_buffer():
+        analyser = Utils(None)
+        analyser.scan_buffer(wide_encoded)
+        return analyser
+
+    probe = Utils(None)
+    probe.scan(wide_source)
+    wide_count = len(probe.element_list)
+
+    return [
+        ("lexer.tokenize", lex, count),
+        ("lexer.token_buffer", lex_buffer, count),
+        ("parser.parse", parse, count),
+        ("semantic.analyze", analyze, count),
+        ("codegen.generate_java_code", codegen, count),
+        ("utils.rule_chain", utils_chain, wide_count),
+        ("utils.scan", utils_scan, wide_count),
+        ("utils.scan_buffer", utils_scan_buffer, wide_count),
+    ]
+
+
+def run(functions, statements, seed, repeat, memory=True):
+    source = generate_program(functions, statements, seed)
+    wide_source = generate_wide_program(functions, statements, seed)
+    results = {}
+    for name, function, tokens in stages(source, wide_source):
+        seconds, _ = best_time(function, repeat)
+        results[name] = {
+            "seconds": seconds,
+            "tokens": tokens,
+            "tokens_per_sec": tokens / seconds if seconds else None,
+        }
+        if memory:
+            results[name]["peak_alloc_bytes"] = peak_allocation(function)
+    return {
+        "corpus": {"functions": functions, "statements": statements, "seed": seed,
+                   "bytes": len(source), "wide_bytes": len(wide_source)},
+        "python": platform.python_version(),
+        "repeat": repeat,
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == "darwin" else 1),
+        "stages": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Stages whose throughput dropped by more than `threshold` (a fraction)
+    relative to `baseline`."""
+    regressions = []
+    for name, current in report["stages"].items():
+        previous = baseline["stages"].get(name)
+        if not previous or not previous["tokens_per_sec"] or not current["tokens_per_sec"]:
+            continue
+        change = current["tokens_per_sec"] / previous["tokens_per_sec"] - 1
+        if change < -threshold:
+            regressions.append((name, previous["tokens_per_sec"], current["tokens_per_sec"], change))
+    return regressions
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog="python -m benchmarks", description="Per-stage compiler throughput benchmarks.")
+    argparser.add_argument("--functions", type=int, default=500)
+    argparser.add_argument("--statements", type=int, default=20)
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--repeat", type=int, default=3)
+    argparser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak measurement")
+    argparser.add_argument("-o", "--output", help="write the JSON report to this file")
+    argparser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a saved report")
+    argparser.add_argument("--threshold", type=float, default=0.10, help="allowed throughput drop (default 0.10)")
+    args = argparser.parse_args(argv)
+
+    report = run(args.functions, args.statements, args.seed, args.repeat, not args.no_memory)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+    for name, stage in report["stages"].items():
+        peak = f"{stage['peak_alloc_bytes'] / 1e6:8.1f} MB" if "peak_alloc_bytes" in stage else ""
+        print(f"{name:28} {stage['seconds'] * 1e3:10.2f} ms {stage['tokens_per_sec']:14,.0f} tokens/s {peak}")
+    print(f"peak RSS: {report['peak_rss_kb'] / 1024:.1f} MB")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline["corpus"] != report["corpus"]:
+            print("warning: baseline was measured on a different corpus", file=sys.stderr)
+        regressions = compare(report, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before:,.0f} -> {after:,.0f} tokens/s ({change:+.1%})", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
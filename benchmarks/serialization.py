@@ -0,0 +1,65 @@
+"""Size and load time of the binary AST format against pickle and JSON.
+
+    python -m benchmarks.serialization [--functions 200] [--runs 5]
+
+Serializes the dict AST of a synthetic program each way, then times:
+- loading the whole tree back
+- a lazy mmap load that touches only the root
+- walking every node after that lazy load
+"""
+import argparse
+import json
+import os
+import pickle
+import statistics
+import tempfile
+import time
+
+import ast_binary
+import profiling
+from main import Lexer, Parser
+
+from benchmarks.corpus import generate_program
+
+
+def median_time(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog="python -m benchmarks.serialization")
+    argparser.add_argument("--functions", type=int, default=200)
+    argparser.add_argument("--runs", type=int, default=5)
+    args = argparser.parse_args(argv)
+
+    tree = Parser(Lexer(generate_program(args.functions))).parse()
+    nodes = profiling.count_nodes(tree)
+    formats = [
+        ("pickle", lambda: pickle.dumps(tree, pickle.HIGHEST_PROTOCOL), pickle.loads),
+        ("json", lambda: json.dumps(tree).encode(), json.loads),
+        ("binary", lambda: ast_binary.dumps(tree), lambda data: ast_binary.loads(data, lazy=False)),
+    ]
+    print(f"{nodes} nodes")
+    print(f"{'format':16}{'bytes':>10}{'dump ms':>10}{'load ms':>10}")
+    for name, dump, load in formats:
+        data = dump()
+        dump_time = median_time(dump, args.runs)
+        load_time = median_time(lambda: load(data), args.runs)
+        print(f"{name:16}{len(data):10}{dump_time * 1e3:10.2f}{load_time * 1e3:10.2f}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tree.bin")
+        ast_binary.dump(tree, path)
+        lazy_time = median_time(lambda: ast_binary.load(path), args.runs)
+        walk_time = median_time(lambda: profiling.count_nodes(ast_binary.load(path)), args.runs)
+        print(f"{'binary mmap':16}{os.path.getsize(path):10}{'':10}{lazy_time * 1e3:10.2f}  (lazy, root only)")
+        print(f"{'binary mmap':16}{os.path.getsize(path):10}{'':10}{walk_time * 1e3:10.2f}  (lazy, every node)")
+
+
+if __name__ == "__main__":
+    main()
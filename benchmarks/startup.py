@@ -0,0 +1,75 @@
+"""Process startup: wall time from a fresh interpreter to the first token.
+
+    python -m benchmarks.startup [--runs 20] [--top 10]
+
+Starts a new interpreter per run for each scenario and takes the median
+wall time: the bare interpreter, `import main` plus lexing a one-line
+program, and importing the driver CLI. Bytecode caching is switched back on
+for the children even when PYTHONDONTWRITEBYTECODE is set, as it is for an
+installed compiler. The first-token run is repeated once under
+`python -X importtime` to list the modules that cost the most, by their own
+import time. The target for the first token is 50 ms.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+target = 0.050
+
+scenarios = [
+    ("interpreter", "pass"),
+    ("first token", "import main; main.Lexer('int main() { return 0; }').tokens[0]"),
+    ("import driver", "import driver"),
+]
+
+
+def median_time(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    argparser.add_argument("--runs", type=int, default=20)
+    argparser.add_argument("--top", type=int, default=10)
+    args = argparser.parse_args(argv)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {name: value for name, value in os.environ.items() if name != "PYTHONDONTWRITEBYTECODE"}
+
+    def start(code, *options):
+        return subprocess.run([sys.executable, *options, "-c", code], cwd=root, env=env, check=True,
+                              capture_output=True, text=True)
+
+    results = {}
+    for name, code in scenarios:
+        start(code)  # writes the .pyc files on the first run
+        results[name] = median_time(lambda: start(code), args.runs)
+
+    # importtime lines: "import time: <self us> | <cumulative us> | <module>".
+    report = start(scenarios[1][1], "-X", "importtime").stderr.splitlines()[1:]
+    modules = []
+    for line in report:
+        own, cumulative, module = line.split(":", 1)[1].split("|")
+        modules.append((int(own), int(cumulative), module.strip()))
+    modules.sort(reverse=True)
+
+    for name, seconds in results.items():
+        print(f"{name:15}{seconds * 1e3:8.1f} ms")
+    first_token = results["first token"]
+    print(f"first token over the bare interpreter: {(first_token - results['interpreter']) * 1e3:.1f} ms; "
+          f"target {target * 1e3:.0f} ms {'met' if first_token <= target else 'missed'}")
+    print("\nlargest imports (self / cumulative, us):")
+    for own, cumulative, module in modules[:args.top]:
+        print(f"{own:8} {cumulative:8}  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import functools
+import hashlib
+import os
+import pickle
+import shutil
+
+import ast_binary
+
+
+# Modules whose code affects any cached artifact; editing one of them
+# changes the compiler version and so every cache key.
+pipeline_modules = ["main.py", "ast_nodes.py", "symbol_table.py", "visitor.py", "emitter.py", "optimizer.py",
+                    "ir.py", "classfile.py", "pycode.py", "ast_binary.py", "preprocessor.py", "driver.py",
+                    "javac_batch.py", "parallel.py"]
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_version():
+    digest = hashlib.sha256()
+    base = os.path.dirname(os.path.abspath(__file__))
+    for module in pipeline_modules:
+        with open(os.path.join(base, module), 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()[:16]
+
+
+class BuildCache:
+    """On-disk cache of pipeline artifacts keyed by a hash of the source text
+    and the compiler version.
+
+    Each entry is a directory holding one file per artifact (tokens, ast.bin,
+    <Class>.java, <Class>.class). Reading an entry touches it, and evict()
+    removes the least recently used entries until the cache fits in
+    `max_bytes`; callers run it once per build rather than per write.
+    """
+
+    def __init__(self, root=".compilador-cache", max_bytes=256 * 1024 * 1024, version=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.version = version or compiler_version()
+
+    def key(self, source_text, options=""):
+        # `options` covers flags that change the artifacts, such as -O.
+        digest = hashlib.sha256(self.version.encode())
+        digest.update(b"\0" + options.encode() + b"\0")
+        digest.update(source_text.encode())
+        return digest.hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key, artifact):
+        path = os.path.join(self.entry(key), artifact)
+        try:
+            with open(path, 'rb') as cached:
+                data = cached.read()
+        except FileNotFoundError:
+            return None
+        os.utime(self.entry(key))
+        return data
+
+    def put(self, key, artifact, data):
+        entry = self.entry(key)
+        os.makedirs(entry, exist_ok=True)
+        temporary = os.path.join(entry, artifact + ".tmp")
+        with open(temporary, 'wb') as cached:
+            cached.write(data)
+        os.replace(temporary, os.path.join(entry, artifact))
+        os.utime(entry)
+
+    def load(self, key, artifact):
+        data = self.get(key, artifact)
+        return None if data is None else pickle.loads(data)
+
+    def store(self, key, artifact, value):
+        self.put(key, artifact, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def load_tree(self, key):
+        """AST saved by store_tree, memory-mapped and decoded lazily."""
+        try:
+            tree = ast_binary.load(os.path.join(self.entry(key), "ast.bin"))
+        except FileNotFoundError:
+            return None
+        os.utime(self.entry(key))
+        return tree
+
+    def store_tree(self, key, tree):
+        self.put(key, "ast.bin", ast_binary.dumps(tree))
+
+    def entries(self):
+        if not os.path.isdir(self.root):
+            return []
+        result = []
+        for prefix in os.listdir(self.root):
+            bucket = os.path.join(self.root, prefix)
+            for key in os.listdir(bucket):
+                entry = os.path.join(bucket, key)
+                size = sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+                result.append((os.path.getmtime(entry), size, entry))
+        return result
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def add_arguments(argparser):
+    argparser.add_argument("--cache-dir", default=".compilador-cache")
+    argparser.add_argument("--no-cache", action="store_true", help="ignore and do not update the build cache")
+    argparser.add_argument("--clear-cache", action="store_true", help="empty the build cache before compiling")
+
+
+def from_arguments(args):
+    """The BuildCache selected by the add_arguments flags, or None."""
+    cache = BuildCache(args.cache_dir)
+    if args.clear_cache:
+        cache.clear()
+    return None if args.no_cache else cache
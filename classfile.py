@@ -0,0 +1,588 @@
+import struct
+
+from visitor import children, node_type
+
+
+# Class file version 52 (Java 8): StackMapTable frames are required, and
+# every current JVM loads it.
+major_version = 52
+
+ACC_PUBLIC = 0x0001
+ACC_STATIC = 0x0008
+ACC_SUPER = 0x0020
+
+descriptors = {"int": "I", "float": "F", "void": "V"}
+
+# Verification type tags used in StackMapTable frames.
+ITEM_TOP = 0
+ITEM_INTEGER = 1
+ITEM_FLOAT = 2
+ITEM_OBJECT = 7
+
+arithmetic_opcodes = {
+    ("int", '+'): 0x60, ("float", '+'): 0x62,
+    ("int", '-'): 0x64, ("float", '-'): 0x66,
+    ("int", '*'): 0x68, ("float", '*'): 0x6a,
+    ("int", '/'): 0x6c, ("float", '/'): 0x6e,
+    ("int", '%'): 0x70, ("float", '%'): 0x72,
+    ("int", '&'): 0x7e,
+    ("int", '<<'): 0x78, ("int", '>>'): 0x7a, ("int", '^'): 0x82,
+}
+# Operators defined on ints only, like C's.
+bitwise_operators = {'&', '<<', '>>', '^'}
+# Jumps taken when the comparison is false.
+int_compare_false = {'==': 0xa0, '!=': 0x9f, '<': 0xa2, '>=': 0xa1, '>': 0xa4, '<=': 0xa3}
+zero_compare_false = {'==': 0x9a, '!=': 0x99, '<': 0x9c, '>=': 0x9b, '>': 0x9e, '<=': 0x9d}
+comparison_operators = set(int_compare_false)
+IFEQ = 0x99
+IFNE = 0x9a
+GOTO = 0xa7
+
+
+def expression_types(root, local_type, return_type):
+    """Static type of every node below `root`, keyed by id(node) and
+    computed bottom-up with an explicit stack. `local_type(name)` gives the
+    type of a variable and `return_type(name)` that of a function, or None
+    when there is no such function."""
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if node_type(node) == "CallExpression":
+            stack.extend(node["arguments"])
+        else:
+            stack.extend(children(node))
+    types = {}
+    for node in reversed(order):
+        kind = node_type(node)
+        if kind == "Literal":
+            type = "float" if isinstance(node["value"], float) else "int"
+        elif kind == "Identifier":
+            type = local_type(node["name"])
+        elif kind == "BinaryExpression":
+            operator = node["operator"]
+            if operator in comparison_operators or operator in bitwise_operators or operator in ('&&', '||'):
+                type = "int"
+            else:
+                left, right = types[id(node["left"])], types[id(node["right"])]
+                type = "float" if "float" in (left, right) else "int"
+        elif kind == "AssignmentExpression":
+            if node_type(node["left"]) != "Identifier":
+                raise RuntimeError("Only assignments to local variables are supported")
+            type = local_type(node["left"]["name"])
+        elif kind == "UnaryExpression":
+            type = "int" if node["operator"] == '!' else types[id(node["argument"])]
+        elif kind == "UpdateExpression":
+            type = types[id(node["argument"])]
+        elif kind == "CallExpression":
+            callee = node["callee"]
+            type = return_type(callee["name"]) if node_type(callee) == "Identifier" else None
+            if type is None:
+                raise RuntimeError("Only calls to functions of this program are supported")
+        else:
+            raise RuntimeError(f"Cannot generate code for expression {kind}")
+        types[id(node)] = type
+    return types
+
+
+def function_signatures(functions):
+    """{name: (return type, parameter types)} for FunctionDeclarations; C
+    main becomes Java's void entry point."""
+    signatures = {}
+    for function in functions:
+        if function["name"] == "main":
+            signatures["main"] = ("void", [])
+        else:
+            signatures[function["name"]] = (function["returnType"],
+                                            [param["datatype"] for param in function["params"]])
+    return signatures
+
+
+class ConstantPool:
+    def __init__(self):
+        self.entries = []
+        self.index = {}
+
+    def add(self, key, data):
+        if key not in self.index:
+            self.entries.append(data)
+            self.index[key] = len(self.entries)
+        return self.index[key]
+
+    def utf8(self, text):
+        encoded = text.encode("utf-8")
+        return self.add(("utf8", text), struct.pack(">BH", 1, len(encoded)) + encoded)
+
+    def integer(self, value):
+        return self.add(("int", value), struct.pack(">Bi", 3, value))
+
+    def class_ref(self, name):
+        return self.add(("class", name), struct.pack(">BH", 7, self.utf8(name)))
+
+    def name_and_type(self, name, descriptor):
+        return self.add(("nat", name, descriptor),
+                        struct.pack(">BHH", 12, self.utf8(name), self.utf8(descriptor)))
+
+    def field_ref(self, owner, name, descriptor):
+        return self.add(("field", owner, name, descriptor),
+                        struct.pack(">BHH", 9, self.class_ref(owner), self.name_and_type(name, descriptor)))
+
+    def method_ref(self, owner, name, descriptor):
+        return self.add(("method", owner, name, descriptor),
+                        struct.pack(">BHH", 10, self.class_ref(owner), self.name_and_type(name, descriptor)))
+
+    def to_bytes(self):
+        return struct.pack(">H", len(self.entries) + 1) + b"".join(self.entries)
+
+
+class Label:
+    __slots__ = ("offset", "stack")
+
+    def __init__(self):
+        self.offset = None
+        self.stack = None
+
+
+class MethodAssembler:
+    """Bytecode buffer that tracks the operand stack and local variable
+    types as instructions are added, so max_stack, max_locals and the
+    StackMapTable frame at every branch target come out of the same pass."""
+
+    def __init__(self, pool, local_types):
+        self.pool = pool
+        self.code = bytearray()
+        self.stack = []
+        self.max_stack = 0
+        # Verification type per slot: "int", "float" or ("object", class name).
+        self.local_types = list(local_types)
+        self.max_locals = len(self.local_types)
+        self.fixups = []
+        self.frames = {}
+        self.reachable = True
+
+    def emit(self, opcode, operands=b"", pop=0, push=()):
+        self.code.append(opcode)
+        self.code += operands
+        if pop:
+            del self.stack[-pop:]
+        self.stack.extend(push)
+        self.max_stack = max(self.max_stack, len(self.stack))
+
+    def branch(self, opcode, label, pop=0):
+        if pop:
+            del self.stack[-pop:]
+        label.stack = list(self.stack)
+        self.fixups.append((len(self.code), label))
+        self.code += bytes((opcode, 0, 0))
+        if opcode == GOTO:
+            self.reachable = False
+
+    def place(self, label):
+        label.offset = len(self.code)
+        self.stack = list(label.stack)
+        self.frames[label.offset] = (list(self.local_types), list(self.stack))
+        self.reachable = True
+
+    def push_int(self, value):
+        if -1 <= value <= 5:
+            self.emit(0x03 + value, push=["int"])
+        elif -128 <= value <= 127:
+            self.emit(0x10, struct.pack(">b", value), push=["int"])
+        elif -32768 <= value <= 32767:
+            self.emit(0x11, struct.pack(">h", value), push=["int"])
+        else:
+            index = self.pool.integer(value)
+            if index < 256:
+                self.emit(0x12, bytes((index,)), push=["int"])
+            else:
+                self.emit(0x13, struct.pack(">H", index), push=["int"])
+
+    def local_instruction(self, opcode, slot, pop=0, push=()):
+        if slot < 256:
+            self.emit(opcode, bytes((slot,)), pop, push)
+        else:
+            # wide prefix for slots past 255
+            self.code.append(0xc4)
+            self.emit(opcode, struct.pack(">H", slot), pop, push)
+
+    def load(self, slot, type):
+        self.local_instruction(0x15 if type == "int" else 0x17, slot, push=[type])
+
+    def store(self, slot, type):
+        self.local_instruction(0x36 if type == "int" else 0x38, slot, pop=1)
+
+    def convert(self, source, target):
+        if source == target or target == "void":
+            return
+        if source == "int" and target == "float":
+            self.emit(0x86, pop=1, push=["float"])
+        elif source == "float" and target == "int":
+            self.emit(0x8b, pop=1, push=["int"])
+        else:
+            raise RuntimeError(f"Cannot convert {source} to {target}")
+
+    def resolve(self):
+        for position, label in self.fixups:
+            delta = label.offset - position
+            if not -32768 <= delta <= 32767:
+                raise RuntimeError("Method too large: branch offset out of range")
+            self.code[position + 1:position + 3] = struct.pack(">h", delta)
+        if len(self.code) > 65535:
+            raise RuntimeError("Method too large for the JVM")
+
+    def verification_type(self, type):
+        if type == "int":
+            return bytes((ITEM_INTEGER,))
+        if type == "float":
+            return bytes((ITEM_FLOAT,))
+        return struct.pack(">BH", ITEM_OBJECT, self.pool.class_ref(type[1]))
+
+    def stack_map_table(self):
+        # Every frame is written as a full_frame; they are few (one per
+        # branch target) so the compact frame kinds would save little.
+        entries = []
+        previous = -1
+        for offset in sorted(self.frames):
+            local_types, stack = self.frames[offset]
+            entry = struct.pack(">BHH", 255, offset - previous - 1, len(local_types))
+            entry += b"".join(self.verification_type(type) for type in local_types)
+            entry += struct.pack(">H", len(stack))
+            entry += b"".join(self.verification_type(type) for type in stack)
+            entries.append(entry)
+            previous = offset
+        return struct.pack(">H", len(entries)) + b"".join(entries)
+
+    def code_attribute(self):
+        self.resolve()
+        attributes = []
+        if self.frames:
+            table = self.stack_map_table()
+            attributes.append(struct.pack(">HI", self.pool.utf8("StackMapTable"), len(table)) + table)
+        body = struct.pack(">HHI", self.max_stack, self.max_locals, len(self.code)) + bytes(self.code)
+        body += struct.pack(">H", 0)  # exception table
+        body += struct.pack(">H", len(attributes)) + b"".join(attributes)
+        return struct.pack(">HI", self.pool.utf8("Code"), len(body)) + body
+
+
+class ClassFileGenerator:
+    """Writes a JVM class file straight from the AST, with each C function
+    as a static method of `class_name` and C main as the Java entry point.
+    The generated class behaves like the Java source JavaEmitter produces
+    for the same tree, without going through javac."""
+
+    def __init__(self, class_name="MainClass", source_file=None):
+        self.class_name = class_name
+        self.source_file = source_file
+        self.pool = ConstantPool()
+        self.signatures = {}
+
+    def generate(self, tree):
+        functions = [element for element in tree["body"] if node_type(element) == "FunctionDeclaration"]
+        if len(functions) != len(tree["body"]):
+            raise RuntimeError("The class file backend only handles programs made of C functions")
+        for function in functions:
+            self.signatures[function["name"]] = self.signature(function)
+        this_class = self.pool.class_ref(self.class_name)
+        super_class = self.pool.class_ref("java/lang/Object")
+        methods = [self.method(function) for function in functions]
+        attributes = []
+        if self.source_file:
+            attributes.append(struct.pack(">HIH", self.pool.utf8("SourceFile"), 2, self.pool.utf8(self.source_file)))
+
+        output = bytearray(struct.pack(">IHH", 0xCAFEBABE, 0, major_version))
+        output += self.pool.to_bytes()
+        output += struct.pack(">HHHHH", ACC_PUBLIC | ACC_SUPER, this_class, super_class, 0, 0)
+        output += struct.pack(">H", len(methods)) + b"".join(methods)
+        output += struct.pack(">H", len(attributes)) + b"".join(attributes)
+        return bytes(output)
+
+    def signature(self, function):
+        if function["name"] == "main":
+            return "([Ljava/lang/String;)V", "void", []
+        param_types = [param["datatype"] for param in function["params"]]
+        for type in param_types + [function["returnType"]]:
+            if type not in descriptors:
+                raise RuntimeError(f"Unsupported type {type}")
+        descriptor = "(" + "".join(descriptors[type] for type in param_types) + ")" + descriptors[function["returnType"]]
+        return descriptor, function["returnType"], param_types
+
+    def method(self, function):
+        descriptor, return_type, param_types = self.signatures[function["name"]]
+        is_main = function["name"] == "main"
+        if is_main:
+            assembler = MethodAssembler(self.pool, [("object", "[Ljava/lang/String;")])
+            slots = {}
+        else:
+            assembler = MethodAssembler(self.pool, param_types)
+            slots = {param["name"]: (index, type) for index, (param, type) in
+                     enumerate(zip(function["params"], param_types))}
+        compiler = FunctionCompiler(self, assembler, slots, return_type, is_main)
+        for statement in function["body"]:
+            if statement is None:
+                continue
+            compiler.statement(statement)
+            if node_type(statement) == "ReturnStatement":
+                break
+        if assembler.reachable:
+            compiler.default_return()
+        code = assembler.code_attribute()
+        return struct.pack(">HHHH", ACC_PUBLIC | ACC_STATIC, self.pool.utf8(function["name"]),
+                           self.pool.utf8(descriptor), 1) + code
+
+
+class FunctionCompiler:
+    def __init__(self, generator, assembler, slots, return_type, is_main):
+        self.generator = generator
+        self.pool = generator.pool
+        self.assembler = assembler
+        self.slots = slots
+        self.return_type = return_type
+        self.is_main = is_main
+
+    def local(self, name):
+        if name not in self.slots:
+            raise RuntimeError(f"Undeclared identifier '{name}'")
+        return self.slots[name]
+
+    def statement(self, node):
+        asm = self.assembler
+        kind = node_type(node)
+        if kind == "VariableDeclaration":
+            type = node["datatype"]
+            if type not in ("int", "float"):
+                raise RuntimeError(f"Unsupported type {type}")
+            slot = len(asm.local_types)
+            self.slots[node["name"]] = (slot, type)
+            # Locals start at zero so reads before the first store verify.
+            if type == "int":
+                asm.push_int(0)
+            else:
+                asm.emit(0x0b, push=["float"])
+            asm.local_types.append(type)
+            asm.max_locals = max(asm.max_locals, len(asm.local_types))
+            asm.store(slot, type)
+        elif kind == "ReturnStatement":
+            argument = node["argument"]
+            if self.is_main:
+                if argument is not None:
+                    asm.emit(0xb2, struct.pack(">H", self.pool.field_ref(
+                        "java/lang/System", "out", "Ljava/io/PrintStream;")),
+                        push=[("object", "java/io/PrintStream")])
+                    type = self.expression(argument)
+                    if type == "void":
+                        raise RuntimeError("Cannot print the result of a void call")
+                    asm.emit(0xb6, struct.pack(">H", self.pool.method_ref(
+                        "java/io/PrintStream", "println", f"({descriptors[type]})V")), pop=2)
+                asm.emit(0xb1)
+            elif self.return_type == "void":
+                if argument is not None:
+                    self.discard(argument)
+                asm.emit(0xb1)
+            else:
+                asm.convert(self.expression(argument), self.return_type)
+                asm.emit(0xac if self.return_type == "int" else 0xae, pop=1)
+            asm.reachable = False
+        elif kind == "AssignmentExpression":
+            self.assignment(node, keep_value=False)
+        elif kind == "ExpressionStatement":
+            self.discard(node["expression"])
+        else:
+            raise RuntimeError(f"Cannot generate bytecode for statement {kind}")
+
+    def default_return(self):
+        # C lets control reach the end of a non-void function; return 0.
+        if self.is_main or self.return_type == "void":
+            self.assembler.emit(0xb1)
+        elif self.return_type == "int":
+            self.assembler.push_int(0)
+            self.assembler.emit(0xac, pop=1)
+        else:
+            self.assembler.emit(0x0b, push=["float"])
+            self.assembler.emit(0xae, pop=1)
+
+    def discard(self, node):
+        kind = node_type(node)
+        if kind == "AssignmentExpression":
+            self.assignment(node, keep_value=False)
+        elif kind == "UpdateExpression":
+            self.update(node, keep_value=False)
+        elif self.expression(node) != "void":
+            self.assembler.emit(0x57, pop=1)
+
+    def assignment(self, node, keep_value):
+        target = node["left"]
+        if node_type(target) != "Identifier":
+            raise RuntimeError("The class file backend only assigns to local variables")
+        slot, type = self.local(target["name"])
+        self.assembler.convert(self.expression(node["right"]), type)
+        if keep_value:
+            self.assembler.emit(0x59, pop=1, push=[type, type])
+        self.assembler.store(slot, type)
+        return type
+
+    def update(self, node, keep_value):
+        asm = self.assembler
+        target = node["argument"]
+        if node_type(target) != "Identifier":
+            raise RuntimeError("The class file backend only updates local variables")
+        slot, type = self.local(target["name"])
+        step = 1 if node["operator"] == '++' else -1
+        if type == "int" and slot < 256:
+            if keep_value and not node["prefix"]:
+                asm.load(slot, type)
+            asm.emit(0x84, struct.pack(">Bb", slot, step))
+            if keep_value and node["prefix"]:
+                asm.load(slot, type)
+            return type
+        asm.load(slot, type)
+        if keep_value and not node["prefix"]:
+            asm.emit(0x59, pop=1, push=[type, type])
+        if type == "int":
+            asm.push_int(step)
+        else:
+            asm.emit(0x0c, push=["float"])
+        opcode = arithmetic_opcodes[(type, '+' if step > 0 or type == "int" else '-')]
+        asm.emit(opcode, pop=2, push=[type])
+        if keep_value and node["prefix"]:
+            asm.emit(0x59, pop=1, push=[type, type])
+        asm.store(slot, type)
+        return type
+
+    def infer_types(self, root):
+        signatures = self.generator.signatures
+        return expression_types(root, lambda name: self.local(name)[1],
+                                lambda name: signatures[name][1] if name in signatures else None)
+
+    def expression(self, root):
+        """Emits code leaving the value of `root` on the stack and returns its
+        type. Nodes expand into actions on an explicit work stack, so deep
+        expressions do not recurse; types are inferred up front so operand
+        conversions can be placed right after each operand."""
+        asm = self.assembler
+        kind = node_type(root)
+        # Most operands are a single variable or constant.
+        if kind == "Identifier":
+            slot, type = self.local(root["name"])
+            asm.load(slot, type)
+            return type
+        if kind == "Literal" and isinstance(root["value"], int):
+            asm.push_int(root["value"])
+            return "int"
+        types = self.infer_types(root)
+        work = [("node", root)]
+        while work:
+            action, argument = work.pop()
+            if action == "node":
+                work.extend(reversed(self.expand(argument, types)))
+            elif action == "convert":
+                asm.convert(*argument)
+            elif action == "emit":
+                argument()
+            elif action == "branch":
+                opcode, label, pop = argument
+                asm.branch(opcode, label, pop)
+            elif action == "place":
+                asm.place(argument)
+        return types[id(root)]
+
+    def as_condition(self, node, types):
+        """Actions leaving `node` on the stack as a value to test against
+        zero with IFEQ/IFNE."""
+        actions = [("node", node)]
+        if types[id(node)] == "float":
+            actions.append(("emit", lambda: self.assembler.emit(0x0b, push=["float"])))
+            actions.append(("emit", lambda: self.assembler.emit(0x95, pop=2, push=["int"])))
+        return actions
+
+    def boolean_result(self, false_label, end_label, true_first=True):
+        """Actions materialising 1/0 after conditional jumps to `false_label`
+        (or to a true label when true_first is False)."""
+        asm = self.assembler
+        first, second = (1, 0) if true_first else (0, 1)
+        return [
+            ("emit", lambda: asm.push_int(first)),
+            ("branch", (GOTO, end_label, 0)),
+            ("place", false_label),
+            ("emit", lambda: asm.push_int(second)),
+            ("place", end_label),
+        ]
+
+    def expand(self, node, types):
+        asm = self.assembler
+        kind = node_type(node)
+        if kind == "Literal":
+            value = node["value"]
+            if isinstance(value, float):
+                raise RuntimeError("Float literals are not supported by the class file backend")
+            return [("emit", lambda: asm.push_int(value))]
+        if kind == "Identifier":
+            slot, type = self.local(node["name"])
+            return [("emit", lambda: asm.load(slot, type))]
+        if kind == "AssignmentExpression":
+            return [("emit", lambda: self.assignment(node, keep_value=True))]
+        if kind == "UpdateExpression":
+            return [("emit", lambda: self.update(node, keep_value=True))]
+        if kind == "CallExpression":
+            name = node["callee"]["name"]
+            descriptor, _, param_types = self.generator.signatures[name]
+            if len(param_types) != len(node["arguments"]):
+                raise RuntimeError(f"'{name}' expects {len(param_types)} arguments")
+            actions = []
+            for argument, type in zip(node["arguments"], param_types):
+                actions.append(("node", argument))
+                actions.append(("convert", (types[id(argument)], type)))
+            result = [] if types[id(node)] == "void" else [types[id(node)]]
+            index = self.pool.method_ref(self.generator.class_name, name, descriptor)
+            actions.append(("emit", lambda: asm.emit(0xb8, struct.pack(">H", index), pop=len(param_types),
+                                                     push=result)))
+            return actions
+        if kind == "UnaryExpression":
+            operator = node["operator"]
+            type = types[id(node["argument"])]
+            if operator == '+':
+                return [("node", node["argument"])]
+            if operator == '-':
+                return [("node", node["argument"]),
+                        ("emit", lambda: asm.emit(0x74 if type == "int" else 0x76, pop=1, push=[type]))]
+            if operator == '!':
+                true_label, end_label = Label(), Label()
+                return (self.as_condition(node["argument"], types)
+                        + [("branch", (IFEQ, true_label, 1))]
+                        + self.boolean_result(true_label, end_label, true_first=False))
+            raise RuntimeError(f"Cannot generate bytecode for unary '{operator}'")
+        if kind == "BinaryExpression":
+            operator = node["operator"]
+            left, right = node["left"], node["right"]
+            if operator in ('&&', '||'):
+                short_label, end_label = Label(), Label()
+                # && jumps to false on the first zero, || to true on the
+                # first non-zero.
+                jump = IFEQ if operator == '&&' else IFNE
+                return (self.as_condition(left, types) + [("branch", (jump, short_label, 1))]
+                        + self.as_condition(right, types) + [("branch", (jump, short_label, 1))]
+                        + self.boolean_result(short_label, end_label, true_first=operator == '&&'))
+            operand_type = "float" if "float" in (types[id(left)], types[id(right)]) else "int"
+            actions = [("node", left), ("convert", (types[id(left)], operand_type)),
+                       ("node", right), ("convert", (types[id(right)], operand_type))]
+            if operator in comparison_operators:
+                false_label, end_label = Label(), Label()
+                if operand_type == "int":
+                    actions.append(("branch", (int_compare_false[operator], false_label, 2)))
+                else:
+                    # fcmpg makes NaN compare greater, so < and <= are false.
+                    compare = 0x96 if operator in ('<', '<=') else 0x95
+                    actions.append(("emit", lambda: asm.emit(compare, pop=2, push=["int"])))
+                    actions.append(("branch", (zero_compare_false[operator], false_label, 1)))
+                return actions + self.boolean_result(false_label, end_label)
+            if (operand_type, operator) not in arithmetic_opcodes:
+                raise RuntimeError(f"Cannot generate bytecode for {operand_type} '{operator}'")
+            opcode = arithmetic_opcodes[(operand_type, operator)]
+            actions.append(("emit", lambda: asm.emit(opcode, pop=2, push=[operand_type])))
+            return actions
+        raise RuntimeError(f"Cannot generate bytecode for expression {kind}")
+
+
+def generate_class_file(ast, class_name="MainClass", source_file=None):
+    """Returns the bytes of a JVM class file for `ast`."""
+    return ClassFileGenerator(class_name, source_file).generate(ast)
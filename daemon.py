@@ -0,0 +1,328 @@
+import argparse
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+default_socket = ".compilador.sock"
+
+# Small program compiled once at startup so the first real request does not
+# pay for imports and first-call setup.
+warm_up_source = """int f(int a, float b) {
+    int c;
+    c = a * 2 + 1;
+    return c;
+}
+int main() {
+    return f(1, 2);
+}
+"""
+
+
+class CompilerService:
+    """Compiles C files in the current process, so the compiler modules,
+    compiled regexes and caches stay loaded between requests.
+
+    The digest of the source behind each output is remembered; a file whose
+    bytes did not change, whose included headers did not change and whose
+    output still exists is not compiled again. Requests are serialized by a
+    lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.outputs = {}
+        self.compiled = 0
+        self.reused = 0
+        self.started = time.time()
+
+    def warm_up(self):
+        import ir
+        from classfile import generate_class_file
+        from main import Lexer, Parser, SemanticAnalyzer, generate_java_code
+        from optimizer import optimize
+
+        tree = Parser(Lexer(warm_up_source)).parse()
+        SemanticAnalyzer(tree).analyze()
+        generate_class_file(tree)
+        generate_java_code(ir.lower(optimize(tree, 2))[0])
+
+    def compile(self, sources, output_dir, optimization=0, backend="java", javac=False, force=False,
+                include_paths=()):
+        """Returns one result dict per source: file, output, error, cached
+        and timings (seconds per stage)."""
+        from driver import compile_file, split_collisions
+        from preprocessor import header_cache
+
+        sources, collisions = split_collisions(sources)
+        results = [{"file": c_path, "output": None, "error": error, "cached": False, "timings": {}}
+                   for c_path, error in collisions]
+        fresh = []
+        with self.lock:
+            os.makedirs(output_dir, exist_ok=True)
+            for c_path in sources:
+                # Outputs compiled without javac have no .class file to reuse.
+                key = (c_path, output_dir, optimization, backend, javac and backend == "java", tuple(include_paths))
+                try:
+                    with open(c_path, 'rb') as source:
+                        digest = hashlib.sha256(source.read()).digest()
+                except OSError as e:
+                    self.outputs.pop(key, None)
+                    results.append({"file": c_path, "output": None, "error": f"read: {e}", "cached": False,
+                                    "timings": {}})
+                    continue
+                previous = self.outputs.get(key)
+                if (not force and previous is not None and previous[0] == digest and os.path.exists(previous[1])
+                        and header_cache.up_to_date(c_path)):
+                    self.reused += 1
+                    results.append({"file": c_path, "output": previous[1], "error": None, "cached": True,
+                                    "timings": {}})
+                    continue
+                _, output_path, error, timings, _ = compile_file(c_path, output_dir, False, optimization, backend,
+                                                                 include_paths)
+                self.compiled += 1
+                if error is None:
+                    self.outputs[key] = (digest, output_path)
+                    fresh.append(c_path)
+                else:
+                    self.outputs.pop(key, None)
+                results.append({"file": c_path, "output": output_path, "error": error, "cached": False,
+                                "timings": timings})
+            if javac and fresh and backend == "java":
+                self.run_javac(fresh, output_dir, results)
+        return results
+
+    def run_javac(self, c_paths, output_dir, results):
+        from javac_batch import JavacBatch
+
+        batch = JavacBatch(output_dir)
+        for c_path in c_paths:
+            batch.register(c_path)
+        by_file = {result["file"]: result for result in results}
+        try:
+            diagnostics = batch.compile()
+        except RuntimeError as e:
+            for c_path in c_paths:
+                by_file[c_path]["error"] = f"javac: {e}"
+            diagnostics = {}
+        for c_path, found in diagnostics.items():
+            errors = [f"{d.kind}: {d.message}" for d in found if d.kind == "error"]
+            if errors:
+                by_file[c_path]["error"] = "javac: " + "\n".join(errors)
+                # Not reusable: the next request has to run javac again.
+                for key in [key for key in self.outputs if key[0] == c_path and key[1] == output_dir]:
+                    del self.outputs[key]
+
+    def stats(self):
+        return {"pid": os.getpid(), "uptime": time.time() - self.started, "compiled": self.compiled,
+                "reused": self.reused, "outputs": len(self.outputs)}
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    # One JSON request per line and one JSON response line for each, so an
+    # editor can keep a connection open for many requests.
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            # Compile errors come back in the per-file results; only a
+            # malformed request or a failure of the server itself is an error.
+            try:
+                response = self.server.dispatch(json.loads(line))
+            except ValueError as e:
+                response = {"error": f"bad request: {e}"}
+            except Exception as e:
+                response = {"error": f"server error: {type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class CompilerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """CompilerService behind a Unix socket. Requests carry absolute paths
+    since the server's working directory need not be the client's."""
+
+    daemon_threads = True
+
+    def __init__(self, path=default_socket, service=None):
+        if os.path.exists(path):
+            if ping(path):
+                raise RuntimeError(f"A compiler server is already listening on {path}")
+            os.unlink(path)
+        self.service = service or CompilerService()
+        super().__init__(path, RequestHandler)
+
+    def dispatch(self, request):
+        """Response for one decoded request; raises ValueError when the
+        request itself is malformed."""
+        if not isinstance(request, dict):
+            raise ValueError("expected a JSON object")
+        command = request.get("command", "compile")
+        if command == "compile":
+            missing = [field for field in ("files", "output_dir") if field not in request]
+            if missing:
+                raise ValueError(f"missing {', '.join(missing)}")
+            start = time.perf_counter()
+            results = self.service.compile(request["files"], request["output_dir"], request.get("optimization", 0),
+                                           request.get("backend", "java"), request.get("javac", False),
+                                           request.get("force", False), request.get("include_paths", ()))
+            return {"results": results, "seconds": time.perf_counter() - start}
+        if command == "stats":
+            return self.service.stats()
+        if command == "shutdown":
+            # shutdown() waits for serve_forever to return, so not from here.
+            threading.Thread(target=self.shutdown).start()
+            return {"stopping": True}
+        return {"error": f"unknown command {command!r}"}
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def watch(service, paths, output_dir, optimization=0, backend="java", javac=False, interval=0.5, stop=None,
+          report=None, include_paths=()):
+    """Polls the .c files under `paths`, and the headers they included,
+    every `interval` seconds. A file is recompiled when its modification
+    time or that of one of its headers changed. Runs until `stop` (a
+    threading.Event) is set; `report` is called with the results of every
+    round that compiled something."""
+    from driver import find_sources
+    from preprocessor import header_cache
+
+    stop = stop or threading.Event()
+    report = report or print_results
+    mtimes = {}
+    while not stop.is_set():
+        current = {}
+        changed = []
+        for c_path in find_sources(paths):
+            watched = [c_path] + [path for path, _ in header_cache.dependencies.get(c_path, ())]
+            for path in watched:
+                if path not in current:
+                    try:
+                        current[path] = os.stat(path).st_mtime_ns
+                    except OSError:
+                        current[path] = None
+            # Headers seen for the first time were just read by a compile.
+            if c_path not in mtimes or any(path in mtimes and mtimes[path] != current[path] for path in watched):
+                changed.append(c_path)
+        mtimes = current
+        if changed:
+            start = time.perf_counter()
+            results = service.compile(changed, output_dir, optimization, backend, javac, include_paths=include_paths)
+            report(results, time.perf_counter() - start)
+        stop.wait(interval)
+
+
+def request(message, path=default_socket, timeout=None):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(path)
+        client.sendall(json.dumps(message).encode() + b"\n")
+        with client.makefile('rb') as reply:
+            line = reply.readline()
+    if not line:
+        raise RuntimeError("The compiler server closed the connection")
+    return json.loads(line)
+
+
+def ping(path=default_socket):
+    try:
+        request({"command": "stats"}, path, timeout=1)
+    except OSError:
+        return False
+    return True
+
+
+def print_results(results, seconds):
+    errors = [result for result in results if result["error"] is not None]
+    cached = sum(1 for result in results if result["cached"])
+    for result in errors:
+        print(f"{result['file']}: {result['error']}", file=sys.stderr)
+    print(f"{len(results)} files, {len(results) - len(errors) - cached} compiled, {cached} unchanged, "
+          f"{len(errors)} errors in {seconds * 1e3:.1f}ms")
+    return 1 if errors else 0
+
+
+def add_compile_arguments(argparser):
+    import optimizer
+    import preprocessor
+
+    argparser.add_argument("-d", "--output-dir", default="build")
+    argparser.add_argument("--backend", choices=("java", "classfile"), default="java")
+    argparser.add_argument("--javac", action="store_true", help="also compile the generated Java with javac")
+    optimizer.add_arguments(argparser)
+    preprocessor.add_arguments(argparser)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description="Long-running compiler server and its client.")
+    argparser.add_argument("--socket", default=default_socket)
+    commands = argparser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="compile requests from the socket until stopped")
+    serve.add_argument("--watch", nargs="+", metavar="PATH", help="also recompile C files under PATH as they change")
+    serve.add_argument("--interval", type=float, default=0.5)
+    add_compile_arguments(serve)
+    watching = commands.add_parser("watch", help="recompile C files under PATH as they change, without a socket")
+    watching.add_argument("paths", nargs="+")
+    watching.add_argument("--interval", type=float, default=0.5)
+    add_compile_arguments(watching)
+    client = commands.add_parser("compile", help="send files to a running server")
+    client.add_argument("files", nargs="+")
+    client.add_argument("--force", action="store_true", help="recompile even unchanged files")
+    add_compile_arguments(client)
+    commands.add_parser("stats", help="print counters of a running server")
+    commands.add_parser("stop", help="stop a running server")
+    args = argparser.parse_args(argv)
+
+    if args.command == "compile":
+        response = request({"command": "compile", "files": [os.path.abspath(path) for path in args.files],
+                            "output_dir": os.path.abspath(args.output_dir), "optimization": args.optimization,
+                            "backend": args.backend, "javac": args.javac, "force": args.force,
+                            "include_paths": [os.path.abspath(path) for path in args.include_paths]}, args.socket)
+        if "error" in response:
+            print(f"server: {response['error']}", file=sys.stderr)
+            return 1
+        return print_results(response["results"], response["seconds"])
+    if args.command in ("stats", "stop"):
+        print(json.dumps(request({"command": "stats" if args.command == "stats" else "shutdown"}, args.socket)))
+        return 0
+
+    service = CompilerService()
+    service.warm_up()
+    output_dir = os.path.abspath(args.output_dir)
+    include_paths = [os.path.abspath(path) for path in args.include_paths]
+    if args.command == "watch":
+        try:
+            watch(service, args.paths, output_dir, args.optimization, args.backend, args.javac, args.interval,
+                  include_paths=include_paths)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    server = CompilerServer(args.socket, service)
+    stop = threading.Event()
+    if args.watch:
+        threading.Thread(target=watch, args=(service, args.watch, output_dir, args.optimization, args.backend,
+                                             args.javac, args.interval, stop, None, include_paths),
+                         daemon=True).start()
+    print(f"Listening on {args.socket} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+import argparse
+import os
+import sys
+import time
+
+
+def find_sources(paths):
+    """Expands directories into the .c files they contain, in sorted order."""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                sources.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".c"))
+        else:
+            sources.append(path)
+    return sources
+
+
+def split_collisions(sources):
+    """Sources whose class name is already taken by an earlier one would
+    overwrite its output (x/a.c and y/a.c both make A). Returns the sources
+    to compile and (c_path, error) for the others."""
+    from javac_batch import class_name_for
+
+    owners = {}
+    kept = []
+    errors = []
+    for c_path in sources:
+        class_name = class_name_for(c_path)
+        owner = owners.setdefault(class_name, c_path)
+        if owner is c_path:
+            kept.append(c_path)
+        else:
+            errors.append((c_path, f"output: class {class_name} is already generated from {owner}"))
+    return kept, errors
+
+
+def compile_file(c_path, output_dir, profile=False, optimization=0, backend="java", include_paths=(),
+                 function_jobs=1, cache_dir=None):
+    """Runs the whole front end and code generation for one file. Executed in
+    a worker process; returns (c_path, output_path, error, timings, records)
+    where records holds the profiling phases when `profile` is set. The
+    "classfile" backend writes a .class file directly instead of Java source.
+    Files with directives or comments are preprocessed first, sharing the
+    process-wide header cache. With `function_jobs` other than 1 the Java
+    backend analyzes, optimizes and emits the functions on a pool of that
+    many processes (None: all cores), in a single "functions" stage.
+    With `cache_dir` the output is looked up in the BuildCache there first,
+    keyed like javac_batch's entries, and stored after a compile."""
+    import ir
+    import parallel
+    import preprocessor
+    import profiling
+    from javac_batch import class_name_for
+    from main import Lexer, Parser, SemanticAnalyzer, generate_java_code
+    from optimizer import Optimizer
+
+    # Stage timings for -v come from the same collector --profile uses; the
+    # tracemalloc part is only switched on when profiling.
+    collector = profiling.ProfileCollector(trace_memory=profile)
+    stage = "read"
+    output_path = None
+    error = None
+    try:
+        with collector.phase("read"):
+            with open(c_path) as source:
+                source_text = source.read()
+        class_name = class_name_for(c_path)
+        cache = preprocessor.header_cache
+        unit = None
+        options = f"-O{optimization}" + (" classfile" if backend == "classfile" else "")
+        if preprocessor.needs_preprocessing(source_text):
+            stage = "preprocess"
+            with collector.phase("preprocess") as phase:
+                unit = preprocessor.preprocess(source_text, c_path, include_paths, cache)
+                cache.record(c_path, unit.dependencies)
+                phase.count(tokens=sum(len(part.tokens) for part in unit.parts), headers=len(unit.dependencies))
+            options += " " + unit.digest()
+        else:
+            cache.record(c_path, ())
+        artifacts = key = None
+        if cache_dir is not None:
+            from build_cache import BuildCache
+            artifacts = BuildCache(cache_dir)
+            key = artifacts.key(source_text, options)
+            artifact = class_name + (".class" if backend == "classfile" else ".java")
+            stage = "cache"
+            with collector.phase("cache"):
+                cached = artifacts.get(key, artifact)
+                if cached is not None:
+                    output_path = os.path.join(output_dir, artifact)
+                    with open(output_path, 'wb') as output:
+                        output.write(cached)
+            if cached is not None:
+                return finish(c_path, output_path, None, collector, profile)
+        if unit is not None:
+            stage = "parse"
+            with collector.phase("parse") as phase:
+                tree = unit.parse(cache)
+        else:
+            stage = "lex"
+            with collector.phase("lex") as phase:
+                lexer = Lexer(source_text)
+                phase.count(tokens=len(lexer.tokens))
+            stage = "parse"
+            with collector.phase("parse") as phase:
+                tree = Parser(lexer).parse()
+        if profile:
+            phase.count(nodes=profiling.count_nodes(tree))
+        if function_jobs != 1 and backend == "java":
+            stage = "functions"
+            with collector.phase("functions") as phase:
+                output_path = os.path.join(output_dir, class_name + ".java")
+                with open(output_path, 'w') as java_file:
+                    parallel.generate_java_code(tree, java_file, class_name, optimization, function_jobs)
+                phase.count(functions=len(tree["body"]))
+            store_output(artifacts, key, output_path)
+            return finish(c_path, output_path, None, collector, profile)
+        stage = "analyze"
+        with collector.phase("analyze") as phase:
+            analyzer = SemanticAnalyzer(tree)
+            analyzer.analyze()
+            phase.count(symbols=len(analyzer.symbols))
+        if optimization:
+            stage = "optimize"
+            with collector.phase("optimize"):
+                Optimizer(optimization).optimize(tree)
+        if optimization >= 2 and backend == "java":
+            stage = "ir"
+            with collector.phase("ir"):
+                tree, _ = ir.lower(tree, collector=collector)
+        stage = "codegen"
+        with collector.phase("codegen"):
+            if backend == "classfile":
+                from classfile import generate_class_file
+                class_bytes = generate_class_file(tree, class_name, os.path.basename(c_path))
+                output_path = os.path.join(output_dir, class_name + ".class")
+                with open(output_path, 'wb') as class_file:
+                    class_file.write(class_bytes)
+            else:
+                output_path = os.path.join(output_dir, class_name + ".java")
+                with open(output_path, 'w') as java_file:
+                    generate_java_code(tree, java_file, class_name)
+        store_output(artifacts, key, output_path)
+    except (OSError, RuntimeError) as e:
+        output_path = None
+        error = f"{stage}: {e}"
+    except Exception as e:
+        # Malformed input can still trip the front end on something other
+        # than a RuntimeError; that fails this file, not the whole run.
+        output_path = None
+        error = f"{stage}: {type(e).__name__}: {e}"
+    return finish(c_path, output_path, error, collector, profile)
+
+
+def store_output(artifacts, key, output_path):
+    if artifacts is not None:
+        with open(output_path, 'rb') as output:
+            artifacts.put(key, os.path.basename(output_path), output.read())
+
+
+def finish(c_path, output_path, error, collector, profile):
+    records = collector.records()
+    timings = {record["name"]: record["wall"] for record in records}
+    for record in records:
+        record["file"] = c_path
+    return c_path, output_path, error, timings, records if profile else None
+
+
+def compile_files(sources, output_dir, jobs=None, profile=False, optimization=0, backend="java", include_paths=(),
+                  function_jobs=None, cache_dir=None):
+    """Compiles `sources` on a process pool and yields results in input order.
+    Each worker keeps its own header cache across the files it compiles.
+    A single file has nothing to share the pool with, so by default its
+    functions are spread over the `jobs` processes instead."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    os.makedirs(output_dir, exist_ok=True)
+    if function_jobs is None:
+        function_jobs = jobs if len(sources) == 1 else 1
+    if jobs == 1 or len(sources) == 1:
+        for c_path in sources:
+            yield compile_file(c_path, output_dir, profile, optimization, backend, include_paths, function_jobs,
+                               cache_dir)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        chunksize = max(1, len(sources) // ((jobs or os.cpu_count() or 1) * 4))
+        count = len(sources)
+        yield from pool.map(compile_file, sources, [output_dir] * count, [profile] * count, [optimization] * count,
+                            [backend] * count, [include_paths] * count, [function_jobs] * count,
+                            [cache_dir] * count, chunksize=chunksize)
+
+
+def run_programs(compiled, output_dir, timeout, errors):
+    """Runs the classes compiled from `compiled` in one JVM, printing each
+    program's output under its file name; failures go to `errors`."""
+    import profiling
+    from javac_batch import class_name_for
+    from jvm_runner import JvmRunner
+
+    failed = {c_path for c_path, _ in errors}
+    with JvmRunner(timeout=timeout) as runner, profiling.phase("run") as phase:
+        for c_path in compiled:
+            if c_path in failed:
+                continue
+            try:
+                result = runner.run(class_name_for(c_path), output_dir)
+            except RuntimeError as e:
+                errors.append(("run", str(e)))
+                return
+            print(f"==> {c_path} <==")
+            sys.stdout.write(result.stdout)
+            if not result.ok:
+                errors.append((c_path, f"run: {result.status}: {result.stderr.strip()}"))
+        phase.count(programs=len(compiled), jvms=runner.started)
+
+
+def main(argv=None):
+    # Imported here so that importing the driver for compile_file stays cheap.
+    import build_cache
+    import optimizer
+    import parallel
+    import preprocessor
+    import profiling
+
+    argparser = argparse.ArgumentParser(description="Compile C files or directories of C files to Java.")
+    argparser.add_argument("paths", nargs="+")
+    argparser.add_argument("-d", "--output-dir", default="build")
+    argparser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    argparser.add_argument("--javac", action="store_true", help="compile the generated Java with one batched javac")
+    argparser.add_argument("--chunk-size", type=int, default=None)
+    argparser.add_argument("--backend", choices=("java", "classfile"), default="java",
+                           help="emit Java source, or .class files directly without javac")
+    argparser.add_argument("-v", "--verbose", action="store_true", help="print per-file timings")
+    argparser.add_argument("--run", action="store_true",
+                           help="run the compiled programs one after another in a single JVM "
+                                "(with the java backend, needs --javac)")
+    argparser.add_argument("--run-timeout", type=float, default=10.0, help="seconds per program with --run")
+    build_cache.add_arguments(argparser)
+    optimizer.add_arguments(argparser)
+    preprocessor.add_arguments(argparser)
+    parallel.add_arguments(argparser)
+    profiling.add_arguments(argparser)
+    args = argparser.parse_args(argv)
+    if args.run and args.backend == "java" and not args.javac:
+        argparser.error("--run with the java backend needs --javac")
+
+    sources = find_sources(args.paths)
+    start = time.perf_counter()
+    unique, errors = split_collisions(sources)
+    compiled = []
+    records = []
+    profile = bool(args.profile)
+    if profile:
+        profiling.enable()
+    cache = build_cache.from_arguments(args)
+    outcomes = compile_files(unique, args.output_dir, args.jobs, profile, args.optimization, args.backend,
+                             args.include_paths, args.function_jobs, cache.root if cache is not None else None)
+    for c_path, output_path, error, timings, file_records in outcomes:
+        if file_records:
+            records.extend(file_records)
+        if error is not None:
+            errors.append((c_path, error))
+        else:
+            compiled.append(c_path)
+        if args.verbose and timings:
+            stages = " ".join(f"{name}={seconds * 1e3:.2f}ms" for name, seconds in timings.items())
+            print(f"{c_path}: {stages}")
+    elapsed = time.perf_counter() - start
+
+    if args.javac and compiled and args.backend == "java":
+        from javac_batch import JavacBatch
+        batch = JavacBatch(args.output_dir, args.chunk_size)
+        for c_path in compiled:
+            batch.register(c_path)
+        try:
+            with profiling.phase("javac") as phase:
+                results = batch.compile()
+                phase.count(files=len(compiled))
+        except RuntimeError as e:
+            errors.append(("javac", str(e)))
+            results = {}
+        for c_path, diagnostics in results.items():
+            errors.extend((c_path, f"javac: {d.kind}: {d.message}") for d in diagnostics if d.kind == "error")
+
+    if cache is not None:
+        cache.evict()
+
+    if args.run and compiled:
+        run_programs(compiled, args.output_dir, args.run_timeout, errors)
+
+    if profile:
+        records.extend(profiling.collector.records())
+        profiling.write(args.profile, args.profile_format, records)
+
+    for c_path, error in errors:
+        print(f"{c_path}: {error}", file=sys.stderr)
+    print(f"{len(sources)} files, {len(compiled)} compiled, {len(errors)} errors in {elapsed:.2f}s "
+          f"({len(sources) / elapsed if elapsed else 0:.1f} files/s)")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+import sys
+
+from visitor import node_type
+
+
+class JavaEmitter:
+    """Writes Java source for an AST as a sequence of fragments.
+
+    Fragments are collected in a list and joined once, so generation is
+    linear in the size of the output. When a file-like `sink` is given the
+    buffer is written out after every method and class, which bounds memory
+    to the largest method instead of the whole program.
+    """
+
+    def __init__(self, sink=None, class_name="MainClass", indent="    "):
+        self.sink = sink
+        self.class_name = class_name
+        self.indent = indent
+        self.level = 0
+        self.parts = []
+        self.in_main = False
+        # C types of the current function's locals and the signatures of
+        # the program's functions, for conversions C makes implicitly.
+        self.locals = {}
+        self.return_type = None
+        self.signatures = {}
+        self.statements = {
+            "Program": self.emit_Program,
+            "ClassDeclaration": self.emit_ClassDeclaration,
+            "MethodDeclaration": self.emit_MethodDeclaration,
+            "FunctionDeclaration": self.emit_FunctionDeclaration,
+            "VariableDeclaration": self.emit_VariableDeclaration,
+            "AssignmentExpression": self.emit_AssignmentExpression,
+            "ReturnStatement": self.emit_ReturnStatement,
+            "ExpressionStatement": self.emit_ExpressionStatement,
+        }
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def line(self, text):
+        self.parts.append(self.indent * self.level + text + "\n")
+
+    def flush(self):
+        if self.sink is not None and self.parts:
+            self.sink.write("".join(self.parts))
+            self.parts.clear()
+
+    def getvalue(self):
+        return "".join(self.parts)
+
+    def emit(self, node):
+        if node is None:
+            return
+        self.statements[node_type(node)](node)
+
+    def expression(self, node, target_type=None):
+        """Java text for an expression. Nodes are expanded in place on an
+        explicit stack into text fragments joined once at the end, so the
+        cost is linear and long operator chains do not recurse. Compound
+        operands are parenthesized, which keeps C's grouping without a
+        precedence table; call arguments and assignment values are already
+        delimited and are left bare.
+
+        C's int-valued comparisons, !, && and || become Java conditions
+        turned back into 0 or 1, as ir_statement does for the IR, and a
+        float stored into an int (or returned as one, with `target_type`)
+        gets a cast."""
+        types = self.types_of(node)
+        parts = []
+        stack = [node]
+        if target_type == "int" and types.get(id(node)) == "float":
+            stack = ["(int) "] + grouped(node)
+            stack.reverse()
+        while stack:
+            item = stack.pop()
+            if type(item) is str:
+                parts.append(item)
+                continue
+            if item is None:
+                parts.append("null")
+                continue
+            if type(item) is Condition:
+                stack.extend(reversed(condition_pieces(item.node)))
+                continue
+            kind = node_type(item)
+            if kind == "Identifier":
+                parts.append(item["name"])
+            elif kind == "Literal":
+                value = item["value"]
+                parts.append(repr(value) + "f" if type(value) is float else str(value))
+            else:
+                stack.extend(reversed(self.expression_pieces(item, kind, types)))
+        return "".join(parts)
+
+    def types_of(self, node):
+        """C types of the nodes of an expression, keyed by id(node). Trees
+        built by hand may use Java constructs the C typing does not know;
+        they get no conversions."""
+        if node is None:
+            return {}
+        from classfile import expression_types
+        try:
+            return expression_types(node, self.locals.get, self.return_type_of)
+        except RuntimeError:
+            return {}
+
+    def return_type_of(self, name):
+        signature = self.signatures.get(name)
+        return signature[0] if signature else None
+
+    def expression_pieces(self, node, kind, types):
+        if kind == "BinaryExpression":
+            if is_condition(node):
+                return [Condition(node), " ? 1 : 0"]
+            return grouped(node["left"]) + [f" {node['operator']} "] + grouped(node["right"])
+        if kind == "AssignmentExpression":
+            if types.get(id(node["left"])) == "int" and types.get(id(node["right"])) == "float":
+                return [node["left"], " = (int) "] + grouped(node["right"])
+            return [node["left"], " = ", node["right"]]
+        if kind == "UnaryExpression":
+            if node["operator"] == "&":
+                raise RuntimeError("Cannot generate Java for the address-of operator")
+            if node["operator"] == "!":
+                return [Condition(node), " ? 1 : 0"]
+            return [node["operator"]] + grouped(node["argument"])
+        if kind == "UpdateExpression":
+            if node["prefix"]:
+                return [node["operator"]] + grouped(node["argument"])
+            return grouped(node["argument"]) + [node["operator"]]
+        if kind == "CallExpression":
+            callee = node["callee"]
+            param_types = ()
+            if node_type(callee) == "Identifier" and callee["name"] in self.signatures:
+                param_types = self.signatures[callee["name"]][1]
+            pieces = grouped(callee) + ["("]
+            for index, argument in enumerate(node["arguments"]):
+                if index:
+                    pieces.append(", ")
+                if (index < len(param_types) and param_types[index] == "int"
+                        and types.get(id(argument)) == "float"):
+                    pieces.append("(int) ")
+                    pieces.extend(grouped(argument))
+                else:
+                    pieces.append(argument)
+            pieces.append(")")
+            return pieces
+        if kind == "MemberExpression":
+            return grouped(node["object"]) + ["." + node["property"]]
+        raise RuntimeError(f"Cannot generate Java for expression {kind}")
+
+    def emit_Program(self, node):
+        body = node["body"]
+        # A Program straight from the Parser holds C functions; they become
+        # static methods of a single class.
+        functions = [element for element in body if node_type(element) == "FunctionDeclaration"]
+        if functions:
+            from classfile import function_signatures
+            self.signatures.update(function_signatures(functions))
+            self.open_class(self.class_name)
+            for element in body:
+                self.emit(element)
+            self.close_class()
+        else:
+            for element in body:
+                self.emit(element)
+
+    def open_class(self, name):
+        self.line(f"public class {name} {{")
+        self.level += 1
+
+    def close_class(self):
+        self.level -= 1
+        self.line("}")
+        self.flush()
+
+    def emit_ClassDeclaration(self, node):
+        self.open_class(node["name"])
+        for member in node["body"]:
+            self.emit(member)
+        self.close_class()
+
+    def emit_method(self, return_type, name, params, body):
+        self.line(f"public static {return_type} {name}({params}) {{")
+        self.level += 1
+        for statement in body:
+            self.emit(statement)
+        self.level -= 1
+        self.line("}")
+        self.flush()
+
+    def emit_MethodDeclaration(self, node):
+        params = ", ".join(f"{param['type']} {param['name']}" for param in node["params"])
+        self.in_main = node["name"] == "main"
+        self.locals = {param["name"]: param["type"] for param in node["params"]}
+        self.return_type = node["returnType"]
+        self.emit_method(node["returnType"], node["name"], params, node["body"])
+
+    def emit_FunctionDeclaration(self, node):
+        # C's "int main()" maps to Java's entry point.
+        self.in_main = node["name"] == "main"
+        self.locals = {param["name"]: param["datatype"] for param in node["params"]}
+        self.return_type = node["returnType"]
+        if self.in_main:
+            return_type, params = "void", "String[] args"
+        else:
+            return_type = node["returnType"]
+            params = ", ".join(f"{param['datatype']} {param['name']}" for param in node["params"])
+        self.emit_method(return_type, node["name"], params, node["body"])
+
+    def emit_VariableDeclaration(self, node):
+        self.locals[node["name"]] = node["datatype"]
+        self.line(f"{node['datatype']} {node['name']};")
+
+    def emit_AssignmentExpression(self, node):
+        self.line(f"{self.expression(node)};")
+
+    def emit_ExpressionStatement(self, node):
+        self.line(f"{self.expression(node['expression'])};")
+
+    def emit_ReturnStatement(self, node):
+        if node["argument"] is None:
+            self.line("return;")
+        elif self.in_main:
+            argument = self.expression(node["argument"])
+            # The value returned by main is the program's output.
+            self.line(f"System.out.println({argument});")
+            self.line("return;")
+        else:
+            self.line(f"return {self.expression(node['argument'], self.return_type)};")
+
+
+    def emit_module(self, module):
+        """Java for an IR Module. Blocks are laid out as nested if/else:
+        the code after a branch continues at the block where its two paths
+        join, so no gotos or dispatch loops are needed."""
+        self.open_class(self.class_name)
+        for function in module.functions:
+            self.emit_ir_function(function)
+        self.close_class()
+
+    def emit_ir_function(self, function):
+        import ir
+        self.in_main = function.is_main
+        if function.is_main:
+            return_type, params = "void", "String[] args"
+        else:
+            return_type = function.return_type
+            params = ", ".join(f"{type} {name}" for name, type in function.params)
+        self.line(f"public static {return_type} {function.name}({params}) {{")
+        self.level += 1
+        # Java insists on definite assignment; C locals start at zero here.
+        for name in function.variables():
+            self.line(f"{function.types[name]} {name} = 0;")
+        joins = ir.immediate_postdominators(function)
+        work = [("region", function.blocks[0], None)]
+        while work:
+            item = work.pop()
+            if item[0] == "line":
+                self.line(item[1])
+            elif item[0] == "level":
+                self.level += item[1]
+            else:
+                self.emit_region(item[1], item[2], joins, work, function.types)
+        self.level -= 1
+        self.line("}")
+        self.flush()
+
+    def emit_region(self, block, stop, joins, work, types):
+        """Emits blocks from `block` until `stop`. A branch pushes its two
+        arms and the code after the join onto `work` instead of recursing."""
+        while block is not None and block is not stop:
+            for instruction in block.instructions[:-1]:
+                self.line(f"{ir_statement(instruction, types)};")
+            terminator = block.terminator
+            if terminator.op == "jump":
+                block = terminator.targets[0]
+            elif terminator.op == "branch":
+                join = joins[block.label]
+                taken, not_taken = terminator.targets
+                self.line(f"if ({java_operand(terminator.args[0])} != 0) {{")
+                self.level += 1
+                work.extend([("region", join, stop), ("line", "}"), ("level", -1),
+                             ("region", not_taken, join), ("level", 1), ("line", "} else {"),
+                             ("level", -1), ("region", taken, join)])
+                return
+            else:
+                if terminator.args and self.in_main:
+                    # The value returned by main is the program's output.
+                    self.line(f"System.out.println({java_operand(terminator.args[0])});")
+                    self.line("return;")
+                elif terminator.args:
+                    self.line(f"return {java_operand(terminator.args[0])};")
+                else:
+                    self.line("return;")
+                return
+
+
+def java_operand(operand):
+    if type(operand) is str:
+        return operand
+    text = repr(operand) + ("f" if type(operand) is float else "")
+    return f"({text})" if operand < 0 else text
+
+
+def ir_statement(instruction, types):
+    import ir
+    args = [java_operand(arg) for arg in instruction.args]
+    op = instruction.op
+    if op == "copy":
+        value = args[0]
+    elif op == "binary":
+        operator = instruction.operator
+        value = f"{args[0]} {operator} {args[1]}"
+        # Comparisons give Java booleans; the IR wants C's 0 or 1.
+        if operator in ir.comparison_operators:
+            value = f"({value}) ? 1 : 0"
+    elif op == "unary":
+        value = f"({args[0]} == 0) ? 1 : 0" if instruction.operator == '!' else f"-{args[0]}"
+    elif op == "convert":
+        value = f"({types[instruction.target]}) {args[0]}"
+    elif op == "call":
+        value = f"{instruction.operator}({', '.join(args)})"
+    else:
+        raise RuntimeError(f"Cannot emit IR instruction {op}")
+    return value if instruction.target is None else f"{instruction.target} = {value}"
+
+
+compound_expressions = {"BinaryExpression", "AssignmentExpression", "UnaryExpression", "UpdateExpression"}
+condition_operators = {'<', '>', '<=', '>=', '==', '!=', '&&', '||'}
+
+
+class Condition:
+    """Stack item standing for the Java boolean form of a C expression."""
+    __slots__ = ("node",)
+
+    def __init__(self, node):
+        self.node = node
+
+
+def is_condition(node):
+    kind = node_type(node)
+    return ((kind == "BinaryExpression" and node["operator"] in condition_operators)
+            or (kind == "UnaryExpression" and node["operator"] == "!"))
+
+
+def condition_pieces(node):
+    """Pieces of a parenthesized Java boolean that is true when the C value
+    of `node` is nonzero."""
+    if is_condition(node):
+        operator = node["operator"]
+        if operator == "!":
+            argument = node["argument"]
+            if is_condition(argument):
+                return ["!", Condition(argument)]
+            return ["("] + grouped(argument) + [" == 0)"]
+        if operator in ('&&', '||'):
+            return ["(", Condition(node["left"]), f" {operator} ", Condition(node["right"]), ")"]
+        return ["("] + grouped(node["left"]) + [f" {operator} "] + grouped(node["right"]) + [")"]
+    return ["("] + grouped(node) + [" != 0)"]
+
+
+def grouped(node):
+    if node is not None and node_type(node) in compound_expressions:
+        return ["(", node, ")"]
+    return [node]
+
+
+def generate_java_code(ast, sink=None, class_name="MainClass"):
+    """Returns the Java source for `ast` (an AST or an ir.Module), or writes
+    it to `sink` and returns an empty string when a file-like sink is given."""
+    # ir pulls in the other backends; plain AST callers never need it, and
+    # anyone holding an ir.Module has imported it already.
+    ir = sys.modules.get("ir")
+    emitter = JavaEmitter(sink, class_name)
+    if ir is not None and isinstance(ast, ir.Module):
+        emitter.emit_module(ast)
+    else:
+        emitter.emit(ast)
+    emitter.flush()
+    return emitter.getvalue()
@@ -0,0 +1,566 @@
+import time
+
+import profiling
+from classfile import bitwise_operators, comparison_operators, expression_types, function_signatures
+from optimizer import writes
+from pycode import to_float, to_int
+from visitor import node_type
+
+
+# Operands are plain values: a str names a variable (C locals keep their
+# names, temporaries are "$t<n>", which no C identifier can clash with) and
+# an int or float is a constant.
+
+class Instruction:
+    """One three-address instruction. `op` is one of
+
+        copy      target = args[0]
+        binary    target = args[0] <operator> args[1]  (operands of one type)
+        unary     target = <operator> args[0]          ('-' or '!')
+        convert   target = (type of target) args[0]
+        call      target = <operator>(*args)            (target None if unused)
+        return    return args[0], or nothing for ()
+        jump      continue at targets[0]
+        branch    targets[0] if args[0] != 0 else targets[1]
+    """
+    __slots__ = ("op", "target", "args", "operator", "targets")
+
+    def __init__(self, op, target=None, args=(), operator=None, targets=()):
+        self.op = op
+        self.target = target
+        self.args = args
+        self.operator = operator
+        self.targets = targets
+
+    def __repr__(self):
+        args = [format_operand(arg) for arg in self.args]
+        if self.op == "copy":
+            text = args[0]
+        elif self.op == "binary":
+            text = f"{args[0]} {self.operator} {args[1]}"
+        elif self.op == "unary":
+            text = f"{self.operator}{args[0]}"
+        elif self.op == "convert":
+            text = f"convert {args[0]}"
+        elif self.op == "call":
+            text = f"call {self.operator}({', '.join(args)})"
+        elif self.op == "jump":
+            return f"jump {self.targets[0].label}"
+        elif self.op == "branch":
+            return f"branch {args[0]} {self.targets[0].label} {self.targets[1].label}"
+        else:
+            return " ".join([self.op] + args)
+        return f"{self.target} = {text}" if self.target is not None else text
+
+
+terminators = {"return", "jump", "branch"}
+
+
+class BasicBlock:
+    __slots__ = ("label", "instructions", "live_in", "live_out")
+
+    def __init__(self, label):
+        self.label = label
+        self.instructions = []
+        self.live_in = set()
+        self.live_out = set()
+
+    @property
+    def terminator(self):
+        return self.instructions[-1]
+
+    @property
+    def successors(self):
+        return self.instructions[-1].targets
+
+
+class Function:
+    def __init__(self, name, return_type, params):
+        self.name = name
+        self.return_type = return_type
+        # (name, type) pairs; C main takes none and returns nothing, and its
+        # return value is the program's output.
+        self.params = params
+        self.is_main = name == "main"
+        self.types = dict(params)
+        self.blocks = []
+
+    def variables(self):
+        """Locals and temporaries still used by some instruction, in order
+        of first appearance, parameters excluded."""
+        seen = {name for name, _ in self.params}
+        names = []
+        for block in self.blocks:
+            for instruction in block.instructions:
+                for operand in (instruction.target,) + tuple(instruction.args):
+                    if type(operand) is str and operand not in seen:
+                        seen.add(operand)
+                        names.append(operand)
+        return names
+
+    def __repr__(self):
+        params = ", ".join(f"{type} {name}" for name, type in self.params)
+        lines = [f"function {self.return_type} {self.name}({params})"]
+        for block in self.blocks:
+            lines.append(f"  {block.label}:")
+            lines.extend(f"    {instruction!r}" for instruction in block.instructions)
+        return "\n".join(lines)
+
+
+class Module:
+    def __init__(self, functions):
+        self.functions = functions
+
+    def __repr__(self):
+        return "\n".join(repr(function) for function in self.functions)
+
+
+def format_operand(operand):
+    return operand if type(operand) is str else repr(operand)
+
+
+def uses(instruction):
+    return [arg for arg in instruction.args if type(arg) is str]
+
+
+def convert_constant(value, target):
+    return to_float(value) if target == "float" else to_int(value)
+
+
+class FunctionBuilder:
+    """Lowers one C function to basic blocks. Expressions are flattened on
+    an explicit work stack, as in the class file and Python backends; &&
+    and || become a branch with one block per outcome and a join block."""
+
+    def __init__(self, signatures, function):
+        self.signatures = signatures
+        is_main = function["name"] == "main"
+        return_type, param_types = signatures[function["name"]]
+        params = [] if is_main else [(param["name"], type) for param, type in zip(function["params"], param_types)]
+        self.function = Function(function["name"], return_type, params)
+        self.source = function
+        self.temporaries = 0
+        self.block = self.new_block()
+
+    def new_block(self):
+        block = BasicBlock(f"b{len(self.function.blocks)}")
+        self.function.blocks.append(block)
+        return block
+
+    def add(self, op, target=None, args=(), operator=None, targets=()):
+        self.block.instructions.append(Instruction(op, target, args, operator, targets))
+
+    def temporary(self, type):
+        self.temporaries += 1
+        name = f"$t{self.temporaries}"
+        self.function.types[name] = type
+        return name
+
+    def local_type(self, name):
+        if name not in self.function.types or name.startswith("$"):
+            raise RuntimeError(f"Undeclared identifier '{name}'")
+        return self.function.types[name]
+
+    def return_type_of(self, name):
+        signature = self.signatures.get(name)
+        return signature[0] if signature else None
+
+    def build(self):
+        returned = False
+        for statement in self.source["body"]:
+            if statement is None:
+                continue
+            self.statement(statement)
+            if node_type(statement) == "ReturnStatement":
+                returned = True
+                break
+        if not returned:
+            # C lets control reach the end of a non-void function; return 0.
+            if self.function.is_main or self.function.return_type == "void":
+                self.add("return")
+            else:
+                self.add("return", args=(convert_constant(0, self.function.return_type),))
+        return self.function
+
+    def statement(self, node):
+        kind = node_type(node)
+        if kind == "VariableDeclaration":
+            if node["datatype"] not in ("int", "float"):
+                raise RuntimeError(f"Unsupported type {node['datatype']}")
+            self.function.types[node["name"]] = node["datatype"]
+        elif kind == "ReturnStatement":
+            argument = node["argument"]
+            if argument is None:
+                self.add("return")
+                return
+            value, type = self.expression(argument)
+            if self.function.is_main and type == "void":
+                raise RuntimeError("Cannot print the result of a void call")
+            if not self.function.is_main:
+                if self.function.return_type == "void":
+                    self.add("return")
+                    return
+                value = self.convert(value, type, self.function.return_type)
+            self.add("return", args=(value,))
+        elif kind == "AssignmentExpression":
+            self.expression(node)
+        elif kind == "ExpressionStatement":
+            value, _ = self.expression(node["expression"])
+            # A call whose result is dropped keeps no target.
+            last = self.block.instructions[-1] if self.block.instructions else None
+            if last is not None and last.op == "call" and last.target == value:
+                last.target = None
+        else:
+            raise RuntimeError(f"Cannot lower statement {kind}")
+
+    def convert(self, operand, source, target):
+        if source == target or target == "void":
+            return operand
+        if type(operand) is not str:
+            return convert_constant(operand, target)
+        result = self.temporary(target)
+        self.add("convert", result, (operand,))
+        return result
+
+    def store(self, name, value):
+        """Assigns `value` to `name`, writing straight into the variable
+        when `value` is the temporary the previous instruction just made."""
+        last = self.block.instructions[-1] if self.block.instructions else None
+        if (type(value) is str and value.startswith("$") and last is not None
+                and last.target == value and last.op != "call"):
+            last.target = name
+        else:
+            self.add("copy", name, (value,))
+
+    def expression(self, root):
+        """Emits the instructions computing `root` and returns (operand,
+        type)."""
+        types = expression_types(root, self.local_type, self.return_type_of)
+        # Reads of a variable the expression also writes are copied first,
+        # so later writes do not change operands already evaluated. The
+        # store of an assignment at the root happens last and does not count.
+        written = writes(root["right"] if node_type(root) == "AssignmentExpression" else root)
+        values = []
+        work = [("node", root)]
+        while work:
+            action, argument = work.pop()
+            if action == "node":
+                work.extend(reversed(self.expand(argument, types, written)))
+            else:
+                action(values, *argument)
+        return values.pop(), types[id(root)]
+
+    def expand(self, node, types, written):
+        kind = node_type(node)
+        if kind == "Literal":
+            value = node["value"]
+            return [(lambda values: values.append(value), ())]
+        if kind == "Identifier":
+            name = node["name"]
+            self.local_type(name)
+
+            def read(values):
+                if name in written:
+                    copy = self.temporary(self.function.types[name])
+                    self.add("copy", copy, (name,))
+                    values.append(copy)
+                else:
+                    values.append(name)
+            return [(read, ())]
+        if kind == "AssignmentExpression":
+            name = node["left"]["name"]
+            target_type = types[id(node)]
+            right_type = types[id(node["right"])]
+
+            def assign(values):
+                self.store(name, self.convert(values.pop(), right_type, target_type))
+                if name in written:
+                    copy = self.temporary(target_type)
+                    self.add("copy", copy, (name,))
+                    values.append(copy)
+                else:
+                    values.append(name)
+            return [("node", node["right"]), (assign, ())]
+        if kind == "UpdateExpression":
+            name = node["argument"]["name"]
+            type = types[id(node)]
+            operator = '+' if node["operator"] == '++' else '-'
+
+            def update(values):
+                if not node["prefix"]:
+                    old = self.temporary(type)
+                    self.add("copy", old, (name,))
+                self.add("binary", name, (name, convert_constant(1, type)), operator)
+                if node["prefix"]:
+                    new = self.temporary(type)
+                    self.add("copy", new, (name,))
+                    values.append(new)
+                else:
+                    values.append(old)
+            return [(update, ())]
+        if kind == "CallExpression":
+            name = node["callee"]["name"]
+            return_type, param_types = self.signatures[name]
+            arguments = node["arguments"]
+            if len(param_types) != len(arguments):
+                raise RuntimeError(f"'{name}' expects {len(param_types)} arguments")
+            argument_types = [types[id(argument)] for argument in arguments]
+
+            def call(values):
+                operands = values[len(values) - len(arguments):]
+                del values[len(values) - len(arguments):]
+                operands = tuple(self.convert(operand, source, target) for operand, source, target in
+                                 zip(operands, argument_types, param_types))
+                result = None if return_type == "void" else self.temporary(return_type)
+                self.add("call", result, operands, name)
+                values.append(result)
+            return [("node", argument) for argument in arguments] + [(call, ())]
+        if kind == "UnaryExpression":
+            operator = node["operator"]
+            type = types[id(node)]
+            if operator == '+':
+                return [("node", node["argument"])]
+            if operator not in ('-', '!'):
+                raise RuntimeError(f"Cannot lower unary '{operator}'")
+
+            def unary(values):
+                result = self.temporary(type)
+                self.add("unary", result, (values.pop(),), operator)
+                values.append(result)
+            return [("node", node["argument"]), (unary, ())]
+        if kind == "BinaryExpression":
+            operator = node["operator"]
+            left, right = node["left"], node["right"]
+            if operator in ('&&', '||'):
+                return self.short_circuit(operator, left, right, types)
+            left_type, right_type = types[id(left)], types[id(right)]
+            operand_type = "float" if "float" in (left_type, right_type) else "int"
+            if operator in bitwise_operators and operand_type != "int":
+                raise RuntimeError(f"Cannot lower float '{operator}'")
+
+            def binary(values):
+                right_value = self.convert(values.pop(), right_type, operand_type)
+                left_value = self.convert(values.pop(), left_type, operand_type)
+                result = self.temporary(types[id(node)])
+                self.add("binary", result, (left_value, right_value), operator)
+                values.append(result)
+            return [("node", left), ("node", right), (binary, ())]
+        raise RuntimeError(f"Cannot lower expression {kind}")
+
+    def short_circuit(self, operator, left, right, types):
+        result = self.temporary("int")
+        right_type = types[id(right)]
+        blocks = {}
+
+        def open_branch(values):
+            condition = values.pop()
+            evaluate, skip = self.new_block(), self.new_block()
+            blocks["join"] = self.new_block()
+            if operator == '&&':
+                self.add("branch", args=(condition,), targets=(evaluate, skip))
+            else:
+                self.add("branch", args=(condition,), targets=(skip, evaluate))
+            # The skipped side already knows the answer.
+            self.block = skip
+            self.add("copy", result, (0 if operator == '&&' else 1,))
+            self.add("jump", targets=(blocks["join"],))
+            self.block = evaluate
+
+        def close_branch(values):
+            zero = convert_constant(0, right_type)
+            self.add("binary", result, (values.pop(), zero), '!=')
+            self.add("jump", targets=(blocks["join"],))
+            self.block = blocks["join"]
+            values.append(result)
+        return [("node", left), (open_branch, ()), ("node", right), (close_branch, ())]
+
+
+def build(tree, signatures=None):
+    """Lowers a Program of C functions to a Module. `signatures` covers
+    functions called but not in `tree`, as when a program is lowered a few
+    functions at a time; by default it comes from the tree itself."""
+    functions = [element for element in tree["body"] if node_type(element) == "FunctionDeclaration"]
+    if len(functions) != len(tree["body"]):
+        raise RuntimeError("Only programs made of C functions can be lowered to IR")
+    if signatures is None:
+        signatures = function_signatures(functions)
+    return Module([FunctionBuilder(signatures, function).build() for function in functions])
+
+
+# Passes. Each takes a Function and rewrites it in place.
+
+commutative = {'+', '*', '==', '!=', '&', '^'}
+
+
+def propagate_copies(function):
+    """Within each block, replaces uses of a variable copied from another
+    operand by that operand, as long as neither side is redefined."""
+    for block in function.blocks:
+        copies = {}
+        for instruction in block.instructions:
+            if copies and instruction.args:
+                instruction.args = tuple(copies.get(arg, arg) if type(arg) is str else arg
+                                         for arg in instruction.args)
+            target = instruction.target
+            if target is None:
+                continue
+            if target in copies or target in copies.values():
+                copies = {name: value for name, value in copies.items() if name != target and value != target}
+            if instruction.op == "copy" and instruction.args[0] != target:
+                copies[target] = instruction.args[0]
+
+
+def eliminate_common_subexpressions(function):
+    """Local value numbering: an operation already computed in the block,
+    from operands not redefined since, becomes a copy of the earlier
+    result. Calls are left alone."""
+    for block in function.blocks:
+        available = {}
+        for index, instruction in enumerate(block.instructions):
+            op = instruction.op
+            key = None
+            if op in ("binary", "unary", "convert"):
+                args = instruction.args
+                if op == "binary" and instruction.operator in commutative:
+                    args = tuple(sorted(args, key=repr))
+                key = (op, instruction.operator, args, function.types[instruction.target])
+                if key in available:
+                    block.instructions[index] = Instruction("copy", instruction.target, (available[key],))
+            target = instruction.target
+            if target is None:
+                continue
+            if available:
+                available = {existing: value for existing, value in available.items()
+                             if value != target and target not in existing[2]}
+            if key is not None and target not in key[2]:
+                available[key] = target
+
+
+def analyze_liveness(function):
+    """Sets live_in and live_out on every block: the variables whose value
+    may still be read on some path from that point."""
+    gen_kill = {}
+    for block in function.blocks:
+        used, defined = set(), set()
+        for instruction in block.instructions:
+            used.update(arg for arg in uses(instruction) if arg not in defined)
+            if instruction.target is not None:
+                defined.add(instruction.target)
+        gen_kill[block.label] = (used, defined)
+        block.live_in = set()
+        block.live_out = set()
+    changed = True
+    while changed:
+        changed = False
+        for block in reversed(function.blocks):
+            live_out = set()
+            for successor in block.successors:
+                live_out |= successor.live_in
+            used, defined = gen_kill[block.label]
+            live_in = used | (live_out - defined)
+            if live_in != block.live_in or live_out != block.live_out:
+                block.live_in, block.live_out = live_in, live_out
+                changed = True
+
+
+def removable(instruction, function):
+    if instruction.op == "binary" and instruction.operator in ('/', '%') \
+            and function.types[instruction.target] == "int":
+        # Integer division by zero throws, so it stays unless the divisor
+        # is a non-zero constant.
+        divisor = instruction.args[1]
+        return type(divisor) is not str and divisor != 0
+    return instruction.op in ("copy", "binary", "unary", "convert")
+
+
+def remove_dead_code(function):
+    """Drops instructions whose result is never read, using liveness.
+    Calls are kept for their effects and only lose their target."""
+    analyze_liveness(function)
+    for block in function.blocks:
+        live = set(block.live_out)
+        kept = []
+        for instruction in reversed(block.instructions):
+            target = instruction.target
+            if target is not None and target not in live:
+                if removable(instruction, function):
+                    continue
+                if instruction.op == "call":
+                    instruction.target = None
+            if target is not None:
+                live.discard(target)
+            live.update(uses(instruction))
+            kept.append(instruction)
+        kept.reverse()
+        block.instructions = kept
+
+
+default_passes = [
+    ("copy-propagation", propagate_copies),
+    ("cse", eliminate_common_subexpressions),
+    ("copy-propagation", propagate_copies),
+    ("dead-code", remove_dead_code),
+    ("liveness", analyze_liveness),
+]
+
+
+class PassManager:
+    """Runs function passes over a Module in order. Time spent per pass
+    name is summed in `timings` (seconds) and each run is also a profiling
+    phase named "ir:<pass>"."""
+
+    def __init__(self, passes=None, collector=None):
+        self.passes = list(default_passes if passes is None else passes)
+        self.collector = collector
+        self.timings = {}
+
+    def run(self, module):
+        collector = self.collector or profiling.collector
+        for name, function_pass in self.passes:
+            with collector.phase("ir:" + name):
+                start = time.perf_counter()
+                for function in module.functions:
+                    function_pass(function)
+                self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+        return module
+
+
+def immediate_postdominators(function):
+    """Maps each block that branches to the block where its two paths meet
+    again. The graphs built here have no loops, so one pass in postorder
+    suffices."""
+    order = []
+    visited = set()
+    stack = [(function.blocks[0], False)]
+    while stack:
+        block, expanded = stack.pop()
+        if expanded:
+            order.append(block)
+            continue
+        if block.label in visited:
+            continue
+        visited.add(block.label)
+        stack.append((block, True))
+        stack.extend((successor, False) for successor in block.successors)
+    postdominators = {}
+    for block in order:
+        successors = block.successors
+        common = set.intersection(*(postdominators[successor.label] for successor in successors)) \
+            if successors else set()
+        postdominators[block.label] = common | {block.label}
+    by_label = {block.label: block for block in function.blocks}
+    joins = {}
+    for block in order:
+        if block.terminator.op == "branch":
+            candidates = postdominators[block.label] - {block.label}
+            joins[block.label] = by_label[max(candidates, key=lambda label: len(postdominators[label]))]
+    return joins
+
+
+def lower(tree, passes=None, collector=None, signatures=None):
+    """Builds the IR for `tree` and runs `passes` (the default pipeline
+    when None); returns (module, pass manager)."""
+    module = build(tree, signatures)
+    manager = PassManager(passes, collector)
+    manager.run(module)
+    return module, manager
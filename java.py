@@ -1,5 +1,3 @@
-import subprocess
-
 # Simplified example AST (normally produced by your semantic analyzer)
 ast = {
     "type": "Program",
@@ -24,63 +22,54 @@ ast = {
     ]
 }
 
-# Code generation function to convert AST to Java code
-def generate_java_code(ast):
-    code = ""
-    if ast["type"] == "Program":
-        for element in ast["body"]:
-            code += generate_java_code(element)
-    elif ast["type"] == "ClassDeclaration":
-        code += f"public class {ast['name']} {{\n"
-        for member in ast["body"]:
-            code += generate_java_code(member)
-        code += "}\n"
-    elif ast["type"] == "MethodDeclaration":
-        params = ", ".join([f"{param['type']} {param['name']}" for param in ast["params"]])
-        code += f"public static {ast['returnType']} {ast['name']}({params}) {{\n"
-        for statement in ast["body"]:
-            code += generate_java_code(statement)
-        code += "}\n"
-    elif ast["type"] == "VariableDeclaration":
-        code += f"{ast['datatype']} {ast['name']};\n"
-    elif ast["type"] == "AssignmentExpression":
-        left = generate_java_code(ast["left"])
-        right = generate_java_code(ast["right"])
-        code += f"{left} = {right};\n"
-    elif ast["type"] == "Identifier":
-        code += ast["name"]
-    elif ast["type"] == "Literal":
-        code += str(ast["value"])
-    elif ast["type"] == "ReturnStatement":
-        argument = generate_java_code(ast["argument"])
-        code += f"System.out.println({argument});\nreturn;\n"
-    elif ast is None:
-        code += "null"
-    return code
+def main(argv=None):
+    import argparse
+    import subprocess
+
+    import profiling
+    from emitter import generate_java_code
+
+    argparser = argparse.ArgumentParser(description="Generate, compile and run the example Java program.")
+    profiling.add_arguments(argparser)
+    args = argparser.parse_args(argv)
+    if args.profile:
+        profiling.enable()
+
+    # Generate the Java code from the AST
+    with profiling.phase("codegen") as phase:
+        generated_java_code = generate_java_code(ast)
+    if profiling.collector.enabled:
+        phase.count(nodes=profiling.count_nodes(ast))
+
+    # Debug: Print the generated Java code for verification
+    print("Generated Java Code:\n", generated_java_code)
+
+    # Save the generated Java code to a file
+    java_file_path = 'MainClass.java'
+    with open(java_file_path, 'w') as java_file:
+        java_file.write(generated_java_code)
 
-# Generate the Java code from the AST
-generated_java_code = generate_java_code(example_ast)
+    # Compile the generated Java code using javac
+    compile_command = ['javac', java_file_path]
+    try:
+        with profiling.phase("javac"):
+            subprocess.run(compile_command, check=True)
+        print("Compilation successful!")
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        print(f"Compilation failed: {e}")
 
-# Debug: Print the generated Java code for verification
-print("Generated Java Code:\n", generated_java_code)
+    # Run the compiled Java program
+    run_command = ['java', 'MainClass']
+    try:
+        with profiling.phase("java"):
+            subprocess.run(run_command, check=True)
+        print("Execution successful!")
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        print(f"Execution failed: {e}")
 
-# Save the generated Java code to a file
-java_file_path = 'MainClass.java'
-with open(java_file_path, 'w') as java_file:
-    java_file.write(generated_java_code)
+    if args.profile:
+        profiling.write(args.profile, args.profile_format)
 
-# Compile the generated Java code using javac
-compile_command = ['javac', java_file_path]
-try:
-    subprocess.run(compile_command, check=True)
-    print("Compilation successful!")
-except subprocess.CalledProcessError as e:
-    print(f"Compilation failed: {e}")
 
-# Run the compiled Java program
-run_command = ['java', 'MainClass']
-try:
-    subprocess.run(run_command, check=True)
-    print("Execution successful!")
-except subprocess.CalledProcessError as e:
-    print(f"Execution failed: {e}")
+if __name__ == "__main__":
+    main()
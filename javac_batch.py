@@ -0,0 +1,230 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+from emitter import generate_java_code
+
+
+diagnostic_pattern = re.compile(r'^(?P<path>.+?\.java):(?P<line>\d+): (?P<kind>error|warning): (?P<message>.*)$')
+summary_pattern = re.compile(r'^\d+ (errors?|warnings?)$')
+separator_pattern = re.compile(r'[^A-Za-z0-9]+')
+
+
+def class_name_for(c_path):
+    """Java class name derived from a C file name: teste1.c -> Teste1."""
+    stem = os.path.splitext(os.path.basename(c_path))[0]
+    name = "".join(part[:1].upper() + part[1:] for part in separator_pattern.split(stem) if part)
+    if not name or name[0].isdigit():
+        name = "C" + name
+    return name
+
+
+class Diagnostic:
+    __slots__ = ("source", "java_path", "line", "kind", "message")
+
+    def __init__(self, source, java_path, line, kind, message):
+        self.source = source
+        self.java_path = java_path
+        self.line = line
+        self.kind = kind
+        self.message = message
+
+    def __repr__(self):
+        return f"{self.source}: {self.kind}: {self.message} ({os.path.basename(self.java_path)}:{self.line})"
+
+
+class JavacBatch:
+    """Collects generated Java classes and compiles them with as few javac
+    processes as possible: one for the whole batch, or one per `chunk_size`
+    files. Each class is named after its C file so they can share a
+    directory, and javac diagnostics are mapped back to that C file."""
+
+    def __init__(self, output_dir, chunk_size=None, javac="javac"):
+        self.output_dir = output_dir
+        self.chunk_size = chunk_size
+        self.javac = javac
+        self.sources = {}
+        self.class_names = {}
+
+    def claim(self, c_path):
+        """Reserves the class name of `c_path`; RuntimeError if another file
+        already maps to it."""
+        class_name = class_name_for(c_path)
+        if class_name in self.class_names:
+            raise RuntimeError(f"{c_path} and {self.class_names[class_name]} both map to class {class_name}")
+        self.class_names[class_name] = c_path
+        return class_name
+
+    def register(self, c_path):
+        class_name = self.claim(c_path)
+        os.makedirs(self.output_dir, exist_ok=True)
+        java_path = os.path.join(self.output_dir, class_name + ".java")
+        self.sources[os.path.abspath(java_path)] = c_path
+        return class_name, java_path
+
+    def add(self, c_path, ast):
+        class_name, java_path = self.register(c_path)
+        with open(java_path, 'w') as java_file:
+            generate_java_code(ast, java_file, class_name)
+        return java_path
+
+    def add_source(self, c_path, java_source):
+        class_name, java_path = self.register(c_path)
+        with open(java_path, 'w') as java_file:
+            java_file.write(java_source)
+        return java_path
+
+    def class_path(self, c_path):
+        return os.path.join(self.output_dir, class_name_for(c_path) + ".class")
+
+    def chunks(self):
+        java_paths = list(self.sources)
+        size = self.chunk_size or len(java_paths)
+        for start in range(0, len(java_paths), size):
+            yield java_paths[start:start + size]
+
+    def compile(self):
+        """Returns {c_path: [Diagnostic, ...]} for every file in the batch;
+        an empty list means the file compiled cleanly."""
+        diagnostics = {c_path: [] for c_path in self.sources.values()}
+        for chunk in self.chunks():
+            command = [self.javac, "-d", self.output_dir] + chunk
+            try:
+                result = subprocess.run(command, capture_output=True, text=True)
+            except FileNotFoundError:
+                raise RuntimeError(f"{self.javac} not found") from None
+            for diagnostic in self.parse_diagnostics(result.stderr):
+                diagnostics[diagnostic.source].append(diagnostic)
+            if result.returncode != 0 and not any(diagnostics[self.sources[path]] for path in chunk):
+                raise RuntimeError(f"javac failed: {result.stderr.strip()}")
+        return diagnostics
+
+    def parse_diagnostics(self, output):
+        current = None
+        for line in output.splitlines():
+            mo = diagnostic_pattern.match(line)
+            if mo is not None:
+                java_path = os.path.abspath(mo.group("path"))
+                if java_path in self.sources:
+                    if current is not None:
+                        yield current
+                    current = Diagnostic(self.sources[java_path], java_path, int(mo.group("line")),
+                                         mo.group("kind"), mo.group("message"))
+                    continue
+            if current is not None and not summary_pattern.match(line):
+                # Source excerpt and caret lines belong to the previous diagnostic.
+                current.message += "\n" + line
+        if current is not None:
+            yield current
+
+
+def build(c_path, source_text, batch, cache=None, optimization=0, include_paths=()):
+    """Feeds one C file into `batch`, reusing whatever artifacts the cache
+    already holds. Returns the cache key (None without a cache) and whether
+    the compiled class came straight from the cache. Included headers are
+    part of the key, so editing one rebuilds the files that include it."""
+    import preprocessor
+    from ir import lower
+    from main import Lexer, Parser, SemanticAnalyzer
+    from optimizer import optimize
+
+    class_name = class_name_for(c_path)
+    unit = None
+    options = f"-O{optimization}"
+    if preprocessor.needs_preprocessing(source_text):
+        unit = preprocessor.preprocess(source_text, c_path, include_paths, preprocessor.header_cache)
+        options += " " + unit.digest()
+    if cache is None:
+        tree = unit.parse(preprocessor.header_cache) if unit is not None else Parser(Lexer(source_text)).parse()
+        SemanticAnalyzer(tree).analyze()
+        tree = optimize(tree, optimization)
+        batch.add(c_path, lower(tree)[0] if optimization >= 2 else tree)
+        return None, False
+
+    key = cache.key(source_text, options)
+    compiled = cache.get(key, class_name + ".class")
+    if compiled is not None:
+        batch.claim(c_path)
+        os.makedirs(batch.output_dir, exist_ok=True)
+        with open(batch.class_path(c_path), 'wb') as class_file:
+            class_file.write(compiled)
+        return key, True
+
+    java_source = cache.get(key, class_name + ".java")
+    if java_source is not None:
+        batch.add_source(c_path, java_source.decode())
+        return key, False
+
+    tree = cache.load_tree(key)
+    if tree is None:
+        if unit is not None:
+            tree = unit.parse(preprocessor.header_cache)
+        else:
+            tokens = cache.load(key, "tokens")
+            if tokens is None:
+                tokens = Lexer(source_text).tokens
+                cache.store(key, "tokens", tokens)
+            tree = Parser(Lexer.from_tokens(tokens)).parse()
+        SemanticAnalyzer(tree).analyze()
+        tree = optimize(tree, optimization)
+        cache.store_tree(key, tree)
+    java_path = batch.add(c_path, lower(tree)[0] if optimization >= 2 else tree)
+    with open(java_path, 'rb') as java_file:
+        cache.put(key, class_name + ".java", java_file.read())
+    return key, False
+
+
+def main(argv=None):
+    import build_cache
+    import optimizer
+    import preprocessor
+
+    argparser = argparse.ArgumentParser(description="Compile many C files with batched javac invocations.")
+    argparser.add_argument("files", nargs="+")
+    argparser.add_argument("-d", "--output-dir", default="build")
+    argparser.add_argument("--chunk-size", type=int, default=None)
+    build_cache.add_arguments(argparser)
+    optimizer.add_arguments(argparser)
+    preprocessor.add_arguments(argparser)
+    args = argparser.parse_args(argv)
+
+    cache = build_cache.from_arguments(args)
+
+    batch = JavacBatch(args.output_dir, args.chunk_size)
+    keys = {}
+    failed = False
+    for c_path in args.files:
+        # Unreadable files and class-name collisions are reported like
+        # compile errors, one line per file.
+        try:
+            with open(c_path) as source:
+                key, cached = build(c_path, source.read(), batch, cache, args.optimization, args.include_paths)
+        except (OSError, RuntimeError) as e:
+            print(f"{c_path}: {e}", file=sys.stderr)
+            failed = True
+            continue
+        if not cached:
+            keys[c_path] = key
+
+    try:
+        results = batch.compile() if batch.sources else {}
+    except RuntimeError as e:
+        print(f"javac: {e}", file=sys.stderr)
+        return 1
+    for c_path, diagnostics in results.items():
+        for diagnostic in diagnostics:
+            print(diagnostic, file=sys.stderr)
+        if any(d.kind == "error" for d in diagnostics):
+            failed = True
+        elif cache is not None and os.path.exists(batch.class_path(c_path)):
+            with open(batch.class_path(c_path), 'rb') as class_file:
+                cache.put(keys[c_path], class_name_for(c_path) + ".class", class_file.read())
+    if cache is not None:
+        cache.evict()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
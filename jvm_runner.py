@@ -0,0 +1,266 @@
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import threading
+
+harness_class = "CompiladorBatchRunner"
+
+# The Java side of JvmRunner, compiled with javac the first time it is
+# needed. One request per stdin line: "<timeout ms>\t<class path>\t<class>".
+# One response per request on stdout: "<status> <millis> <stdout bytes>
+# <stderr bytes>\n" followed by the program's captured stdout and stderr.
+# Status is ok, error (main threw), missing (no such class or main) or
+# timeout. A timed-out program cannot be stopped safely, so the harness
+# answers and then halts; the next request starts a fresh JVM.
+harness_source = r"""import java.io.*;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.util.concurrent.*;
+
+public class CompiladorBatchRunner {
+    public static void main(String[] args) throws Exception {
+        PrintStream protocol = new PrintStream(new FileOutputStream(FileDescriptor.out), false);
+        PrintStream originalOut = System.out;
+        PrintStream originalErr = System.err;
+        BufferedReader requests = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        // Requests arrive on stdin, so programs get an empty one.
+        System.setIn(new ByteArrayInputStream(new byte[0]));
+        // Programs see the platform classes but not the harness.
+        ClassLoader parent = ClassLoader.getSystemClassLoader().getParent();
+        String line;
+        while ((line = requests.readLine()) != null) {
+            String[] fields = line.split("\t", 3);
+            long timeout = Long.parseLong(fields[0]);
+            String[] entries = fields[1].split(File.pathSeparator);
+            URL[] urls = new URL[entries.length];
+            for (int i = 0; i < entries.length; i++) {
+                urls[i] = new File(entries[i]).toURI().toURL();
+            }
+            String className = fields[2];
+            ByteArrayOutputStream out = new ByteArrayOutputStream();
+            ByteArrayOutputStream err = new ByteArrayOutputStream();
+            PrintStream programOut = new PrintStream(out, true);
+            PrintStream programErr = new PrintStream(err, true);
+            URLClassLoader loader = new URLClassLoader(urls, parent);
+            FutureTask<Void> task = new FutureTask<Void>(() -> {
+                // Loaded on the program thread so static initializers count
+                // against the timeout too.
+                Class<?> program = Class.forName(className, true, loader);
+                Method main = program.getMethod("main", String[].class);
+                main.invoke(null, (Object) new String[0]);
+                return null;
+            });
+            Thread thread = new Thread(task, className);
+            thread.setDaemon(true);
+            thread.setContextClassLoader(loader);
+            String status = "ok";
+            long start = System.nanoTime();
+            System.setOut(programOut);
+            System.setErr(programErr);
+            thread.start();
+            try {
+                task.get(timeout, TimeUnit.MILLISECONDS);
+            } catch (TimeoutException e) {
+                status = "timeout";
+                thread.interrupt();
+            } catch (ExecutionException e) {
+                Throwable cause = e.getCause();
+                if (cause instanceof ClassNotFoundException || cause instanceof NoSuchMethodException
+                        || cause instanceof NoClassDefFoundError) {
+                    status = "missing";
+                    programErr.println(cause);
+                } else {
+                    status = "error";
+                    if (cause instanceof InvocationTargetException) {
+                        cause = cause.getCause();
+                    }
+                    cause.printStackTrace(programErr);
+                }
+            } finally {
+                System.setOut(originalOut);
+                System.setErr(originalErr);
+            }
+            long millis = (System.nanoTime() - start) / 1000000;
+            programOut.flush();
+            programErr.flush();
+            byte[] outBytes = out.toByteArray();
+            byte[] errBytes = err.toByteArray();
+            protocol.print(status + " " + millis + " " + outBytes.length + " " + errBytes.length + "\n");
+            protocol.write(outBytes);
+            protocol.write(errBytes);
+            protocol.flush();
+            if (status.equals("timeout")) {
+                Runtime.getRuntime().halt(0);
+            }
+            loader.close();
+        }
+    }
+}
+"""
+
+
+class RunResult:
+    __slots__ = ("class_name", "status", "stdout", "stderr", "seconds")
+
+    def __init__(self, class_name, status, stdout="", stderr="", seconds=0.0):
+        self.class_name = class_name
+        self.status = status
+        self.stdout = stdout
+        self.stderr = stderr
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.status == "ok"
+
+    def __repr__(self):
+        return f"RunResult({self.class_name!r}, {self.status!r}, {self.seconds * 1e3:.1f}ms)"
+
+
+class JvmRunner:
+    """Runs compiled programs one after another in a single JVM, so a batch
+    of N programs pays for one JVM startup instead of N.
+
+    Each program is loaded by its own class loader from its own class path,
+    so programs that share a class name (every MainClass) do not see each
+    other, and static state starts fresh. stdout and stderr are captured
+    per program. A program that exceeds its timeout is reported as such and
+    takes its JVM down with it; the next run starts another one, as does a
+    run after the JVM died (a program calling System.exit, say).
+    """
+
+    def __init__(self, java="java", javac="javac", timeout=10.0, harness_dir=None):
+        self.java = java
+        self.javac = javac
+        self.timeout = timeout
+        digest = hashlib.sha256(harness_source.encode()).hexdigest()[:16]
+        self.harness_dir = harness_dir or os.path.join(".compilador-cache", "runner", digest)
+        self.process = None
+        self.started = 0
+
+    def harness(self):
+        """Directory holding the compiled harness, built on first use."""
+        if not os.path.exists(os.path.join(self.harness_dir, harness_class + ".class")):
+            os.makedirs(self.harness_dir, exist_ok=True)
+            java_path = os.path.join(self.harness_dir, harness_class + ".java")
+            with open(java_path, 'w') as java_file:
+                java_file.write(harness_source)
+            try:
+                result = subprocess.run([self.javac, "-d", self.harness_dir, java_path], capture_output=True,
+                                        text=True)
+            except FileNotFoundError:
+                raise RuntimeError(f"{self.javac} not found") from None
+            if result.returncode != 0:
+                raise RuntimeError(f"javac failed on the runner harness: {result.stderr.strip()}")
+        return self.harness_dir
+
+    def command(self):
+        return [self.java, "-cp", self.harness(), harness_class]
+
+    def start(self):
+        try:
+            self.process = subprocess.Popen(self.command(), stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        except FileNotFoundError:
+            raise RuntimeError(f"{self.java} not found") from None
+        self.started += 1
+
+    def run(self, class_name, class_path=".", timeout=None):
+        """Runs `class_name`'s main from `class_path` (a directory, or several
+        joined with os.pathsep) and returns a RunResult."""
+        timeout = self.timeout if timeout is None else timeout
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+        process = self.process
+        class_path = os.pathsep.join(os.path.abspath(entry) for entry in class_path.split(os.pathsep))
+        request = f"{int(timeout * 1000)}\t{class_path}\t{class_name}\n"
+        # The harness enforces the timeout; this only catches a JVM that
+        # stopped answering altogether.
+        watchdog = threading.Timer(timeout + 10, process.kill)
+        watchdog.start()
+        try:
+            process.stdin.write(request.encode())
+            process.stdin.flush()
+            header = process.stdout.readline().split()
+            stdout = stderr = b""
+            if len(header) == 4:
+                status, millis, out_size, err_size = header[0].decode(), int(header[1]), int(header[2]), int(header[3])
+                stdout = process.stdout.read(out_size)
+                stderr = process.stdout.read(err_size)
+                if len(stdout) + len(stderr) != out_size + err_size:
+                    header = ()
+        except OSError:
+            header = ()
+        finally:
+            watchdog.cancel()
+        if len(header) != 4:
+            self.stop()
+            return RunResult(class_name, "crashed", stderr=f"JVM exited with status {process.returncode}")
+        if status == "timeout":
+            self.stop()
+        return RunResult(class_name, status, stdout.decode(errors="replace"), stderr.decode(errors="replace"),
+                         millis / 1000)
+
+    def run_many(self, programs, timeout=None):
+        """RunResults for (class name, class path) pairs, in order."""
+        return [self.run(class_name, class_path, timeout) for class_name, class_path in programs]
+
+    def stop(self):
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description="Run compiled programs in one JVM. Class names come from the "
+                                                    "arguments, or one per line on stdin.")
+    argparser.add_argument("classes", nargs="*")
+    argparser.add_argument("-cp", "--class-path", default=".")
+    argparser.add_argument("--timeout", type=float, default=10.0, help="seconds per program")
+    argparser.add_argument("--java", default="java")
+    argparser.add_argument("--javac", default="javac")
+    args = argparser.parse_args(argv)
+
+    class_names = args.classes or [line.strip() for line in sys.stdin if line.strip()]
+    failed = 0
+    with JvmRunner(args.java, args.javac, args.timeout) as runner:
+        for class_name in class_names:
+            try:
+                result = runner.run(class_name, args.class_path)
+            except RuntimeError as e:
+                print(e, file=sys.stderr)
+                return 1
+            sys.stdout.write(result.stdout)
+            sys.stderr.write(result.stderr)
+            if not result.ok:
+                failed += 1
+                print(f"{class_name}: {result.status}", file=sys.stderr)
+        print(f"{len(class_names)} programs, {failed} failed, {runner.started} JVM starts", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
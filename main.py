@@ -1,57 +1,237 @@
+import mmap
+import os
 import re
-import subprocess
+from array import array
+from bisect import bisect_right
+from collections import deque
+
+import ast_nodes
+# Binary AST serialization for what Parser.parse returns: dump(tree, file)
+# and load(file) memory-maps and decodes nodes on first access.
+from ast_binary import dump, dumps, load, loads
+from emitter import generate_java_code
+from symbol_table import SymbolTable
+from visitor import NodeVisitor, node_type, walk
+
+# Binding powers follow C precedence for the operators of new/dict.py's ops
+# table. Assignments are right associative; everything else binds left.
+binary_binding_power = {
+    '||': 4,
+    '&&': 6,
+    '&': 10,
+    '==': 12, '!=': 12,
+    '<': 14, '>': 14, '<=': 14, '>=': 14,
+    '+': 18, '-': 18,
+    '*': 20, '/': 20, '%': 20,
+}
+assignment_operators = {'=', '+=', '-=', '*=', '/=', '%=', '<<=', '>>=', '&=', '^='}
+assignment_binding_power = 2
+prefix_operators = {'-', '+', '!', '&', '++', '--'}
+prefix_binding_power = 22
+
+# '=' alone stays an ASSIGN token; the other operators are OP tokens, longest
+# first so '<<=' is not read as '<'.
+operator_pattern = '|'.join(re.escape(op) for op in sorted(
+    (set(binary_binding_power) | assignment_operators | prefix_operators | {'->'}) - {'='},
+    key=len, reverse=True))
+token_specification = [
+    ('NUMBER',   r'\d+'),
+    ('TYPE',     r'\bint\b|\bfloat\b|\bvoid\b'),
+    ('RETURN',   r'\breturn\b'),
+    ('ID',       r'[A-Za-z_][A-Za-z0-9_]*'),
+    ('OP',       operator_pattern),
+    ('ASSIGN',   r'='),
+    ('SEMICOLON',r';'),
+    ('LPAREN',   r'\('),
+    ('RPAREN',   r'\)'),
+    ('LBRACE',   r'\{'),
+    ('RBRACE',   r'\}'),
+    ('COMMA',    r','),
+    ('SKIP',     r'[ \t\n]+'), # skip whitespace
+    ('MISMATCH', r'.'),        # any other character
+]
+# Compiled once at import; tokenize() used to rebuild it on every call.
+token_regex = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in token_specification))
+
+
+class TokenBuffer:
+    """Tokens of a bytes-like source (bytes or an mmap) stored column-wise:
+    one byte of kind and two offsets per token, plus the offset of every
+    line start. Token text is sliced out of the source only when a token is
+    read, so lexing copies nothing.
+
+    Indexing and iteration give the same (kind, value, line, column) tuples
+    as Lexer.tokenize, so a buffer can stand in for Lexer.tokens.
+    """
+
+    kinds = [name for name, _ in token_specification if name not in ('SKIP', 'MISMATCH')] + ['EOF']
+    kind_codes = {name: code for code, name in enumerate(kinds)}
+    pattern = re.compile(token_regex.pattern.encode())
+
+    def __init__(self, source):
+        self.source = source
+        # 'I' offsets address 4 GB; larger sources need 8-byte offsets.
+        offset_type = 'I' if len(source) < 1 << 32 else 'Q'
+        self.token_kinds = array('B')
+        self.starts = array(offset_type)
+        self.ends = array(offset_type)
+        self.line_starts = array(offset_type, [0])
+        self.scan()
+
+    @classmethod
+    def from_file(cls, path):
+        """Buffer over a memory-mapped file; close() releases the mapping."""
+        with open(path, 'rb') as source:
+            if os.fstat(source.fileno()).st_size == 0:
+                return cls(b"")
+            return cls(mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def scan(self):
+        source = self.source
+        kind_codes = self.kind_codes
+        append_kind = self.token_kinds.append
+        append_start = self.starts.append
+        append_end = self.ends.append
+        line_starts = self.line_starts
+        for mo in self.pattern.finditer(source):
+            kind = mo.lastgroup
+            start, end = mo.span()
+            if kind == 'SKIP':
+                newline = source.find(b'\n', start, end)
+                while newline >= 0:
+                    line_starts.append(newline + 1)
+                    newline = source.find(b'\n', newline + 1, end)
+            elif kind == 'MISMATCH':
+                # A non-ASCII character spans several bytes; it is reported
+                # whole, at its column in characters as Lexer does.
+                while end < len(source) and 0x80 <= source[end] < 0xc0:
+                    end += 1
+                line, _ = self.location(start)
+                column = len(str(source[self.line_starts[line - 1]:start], 'utf-8', 'replace')) + 1
+                raise RuntimeError(f'{str(source[start:end], "utf-8", "replace")!r} unexpected on line {line}, column {column}')
+            else:
+                append_kind(kind_codes[kind])
+                append_start(start)
+                append_end(end)
+        append_kind(kind_codes['EOF'])
+        append_start(len(source))
+        append_end(len(source))
+
+    def location(self, offset):
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def text(self, index):
+        if self.token_kinds[index] == self.kind_codes['EOF']:
+            return 'EOF'
+        return str(self.source[self.starts[index]:self.ends[index]], 'utf-8')
+
+    def __len__(self):
+        return len(self.token_kinds)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.token_kinds)
+        kind = self.kinds[self.token_kinds[index]]
+        value = self.text(index)
+        return (kind, int(value) if kind == 'NUMBER' else value) + self.location(self.starts[index])
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self.token_kinds)))
+
+    def nbytes(self):
+        """Memory held by the token columns, not counting the source."""
+        return sum(column.itemsize * len(column)
+                   for column in (self.token_kinds, self.starts, self.ends, self.line_starts))
+
+    def close(self):
+        if isinstance(self.source, mmap.mmap):
+            self.source.close()
+
 
 class Lexer:
-    def __init__(self, input_code):
-        self.tokens = self.tokenize(input_code)
+    def __init__(self, input_code, streaming=False, lookahead=2):
+        # In streaming mode tokens are pulled from the tokenize() generator on
+        # demand, so only the lookahead buffer is kept in memory.
+        if streaming:
+            self.tokens = None
+            self.source = self.tokenize(input_code)
+        else:
+            self.tokens = list(self.tokenize(input_code))
+            self.source = iter(self.tokens)
+        self.lookahead = lookahead
+        self.buffer = deque()
         self.current_token_index = 0
+        self.line_num = 1
+        self.column = 1
         #print (self.tokens)
 
+    @classmethod
+    def from_file(cls, path):
+        # Lexes a memory-mapped file into a TokenBuffer instead of a list of
+        # tuples, for sources too big to hold as text and token objects.
+        return cls.from_tokens(TokenBuffer.from_file(path))
+
+    @classmethod
+    def from_tokens(cls, tokens):
+        # Rebuilds a lexer over tokens produced earlier, e.g. from a cache.
+        lexer = cls("")
+        lexer.tokens = tokens
+        lexer.source = iter(tokens)
+        return lexer
+
     def tokenize(self, input_code):
-        token_specification = [
-            ('NUMBER',   r'\d+'),
-            ('TYPE',     r'\bint\b|\bfloat\b|\bvoid\b'),
-            ('ID',       r'[A-Za-z_][A-Za-z0-9_]*'),
-            ('ASSIGN',   r'='),
-            ('SEMICOLON',r';'),
-            ('LPAREN',   r'\('),
-            ('RPAREN',   r'\)'),
-            ('LBRACE',   r'\{'),
-            ('RBRACE',   r'\}'),
-            ('COMMA',    r','),
-            ('RETURN',   r'\breturn\b'),
-            ('SKIP',     r'[ \t\n]+'), # skip whitespace
-            ('MISMATCH', r'.'),        # any other character
-        ]
-        tok_regex = '|'.join(f'(?P<{pair[0]}>{pair[1]})' for pair in token_specification)
-        get_token = re.compile(tok_regex).match
+        get_token = token_regex.match
         line_num = 1
         line_start = 0
-        tokens = []
         mo = get_token(input_code)
         while mo is not None:
             kind = mo.lastgroup
             value = mo.group(kind)
+            column = mo.start() - line_start + 1
             if kind == 'NUMBER':
-                value = int(value)
+                yield (kind, int(value), line_num, column)
             elif kind == 'SKIP':
-                pass
+                newlines = value.count('\n')
+                if newlines:
+                    line_num += newlines
+                    line_start = mo.start() + value.rindex('\n') + 1
             elif kind == 'MISMATCH':
-                raise RuntimeError(f'{value!r} unexpected on line {line_num}')
+                raise RuntimeError(f'{value!r} unexpected on line {line_num}, column {column}')
             else:
-                tokens.append((kind, value))
+                yield (kind, value, line_num, column)
             mo = get_token(input_code, mo.end())
-        tokens.append(('EOF', 'EOF'))
-        return tokens
+        yield ('EOF', 'EOF', line_num, len(input_code) - line_start + 1)
+
+    def fill(self, count):
+        # Pulls tokens until the buffer holds `count` of them; once the source
+        # is exhausted the EOF token is repeated.
+        while len(self.buffer) < count:
+            token = next(self.source, None)
+            if token is None:
+                token = self.buffer[-1] if self.buffer else self.last_token
+            self.buffer.append(token)
 
     def next_token(self):
+        self.fill(1)
+        self.last_token = self.buffer.popleft()
         self.current_token_index += 1
+        self.fill(1)
+        self.line_num, self.column = self.buffer[0][2:]
 
-    def peek_token(self):
-        return self.tokens[self.current_token_index]
+    def peek_token(self, offset=0):
+        if offset >= self.lookahead:
+            raise RuntimeError(f"Lookahead of {offset + 1} tokens exceeds buffer size {self.lookahead}")
+        self.fill(offset + 1)
+        token = self.buffer[offset]
+        return token[0], token[1]
 
     def current_token(self):
-        return self.tokens[self.current_token_index]
+        return self.peek_token()
+
+    def position(self):
+        self.fill(1)
+        return self.buffer[0][2:]
 
     def match(self, expected_type):
         token_type, token_value = self.current_token()
@@ -63,23 +243,29 @@ class Lexer:
             #raise RuntimeError(f"Expected token {expected_type} but got {token_type}")
 
 class Parser:
-    def __init__(self, lexer):
+    def __init__(self, lexer, compact=False):
         self.lexer = lexer
+        # compact=True builds the __slots__ classes from ast_nodes instead of
+        # dicts; both expose the same keys.
+        self.compact = compact
+
+    def node(self, node_type, **fields):
+        if self.compact:
+            return ast_nodes.node_classes[node_type](**fields)
+        return {"type": node_type, **fields}
 
     def parse(self):
         return self.parse_program()
 
     def parse_program(self):
-        program_node = {
-            "type": "Program",
-            "body": []
-        }
+        body = []
         while self.lexer.peek_token()[0] != 'EOF':
-            program_node["body"].append(self.parse_function_declaration())
-        return program_node
+            body.append(self.parse_function_declaration())
+        return self.node("Program", body=body)
 
     def parse_function_declaration(self):
         return_type = self.lexer.match('TYPE')
+        line, column = self.lexer.position()
         function_name = self.lexer.match('ID')
         self.lexer.match('LPAREN')
         params = self.parse_parameters()
@@ -87,21 +273,17 @@ class Parser:
         self.lexer.match('LBRACE')
         body = self.parse_block()
         self.lexer.match('RBRACE')
-        return {
-            "type": "FunctionDeclaration",
-            "name": function_name,
-            "returnType": return_type,
-            "params": params,
-            "body": body
-        }
+        return self.node("FunctionDeclaration", name=function_name, returnType=return_type,
+                         params=params, body=body, line=line, column=column)
 
     def parse_parameters(self):
         params = []
         if self.lexer.peek_token()[0] != 'RPAREN':
             while True:
                 param_type = self.lexer.match('TYPE')
+                line, column = self.lexer.position()
                 param_name = self.lexer.match('ID')
-                params.append({"datatype": param_type, "name": param_name})
+                params.append({"datatype": param_type, "name": param_name, "line": line, "column": column})
                 if self.lexer.peek_token()[0] == 'COMMA':
                     self.lexer.match('COMMA')
                 else:
@@ -118,8 +300,8 @@ class Parser:
         token_type, token_value = self.lexer.peek_token()
         if token_type == 'TYPE':
             return self.parse_variable_declaration()
-        elif token_type == 'ID':
-            return self.parse_assignment()
+        elif token_type in ('ID', 'NUMBER', 'OP', 'LPAREN'):
+            return self.parse_expression_statement()
         elif token_type == 'RETURN':
             return self.parse_return_statement()
         elif token_type == 'SEMICOLON':
@@ -130,184 +312,209 @@ class Parser:
 
     def parse_variable_declaration(self):
         datatype = self.lexer.match('TYPE')
+        line, column = self.lexer.position()
         var_name = self.lexer.match('ID')
         self.lexer.match('SEMICOLON')
-        return {
-            "type": "VariableDeclaration",
-            "datatype": datatype,
-            "name": var_name
-        }
+        return self.node("VariableDeclaration", datatype=datatype, name=var_name, line=line, column=column)
 
-    def parse_assignment(self):
-        var_name = self.lexer.match('ID')
-        self.lexer.match('ASSIGN')
-        value = self.parse_expression()
-#        if value is None:
-#           raise RuntimeError(f"Expected an expression after assignment but got {self.lexer.peek_token()}")
+    def parse_expression_statement(self):
+        expression = self.parse_expression()
         self.lexer.match('SEMICOLON')
-        return {
-            "type": "AssignmentExpression",
-            "left": {
-                "type": "Identifier",
-                "name": var_name
-            },
-            "right": value
-        }
+        if self.node_type(expression) == "AssignmentExpression":
+            return expression
+        return self.node("ExpressionStatement", expression=expression)
 
     def parse_return_statement(self):
         self.lexer.match('RETURN')
         argument = self.parse_expression()
         self.lexer.match('SEMICOLON')
-        return {
-            "type": "ReturnStatement",
-            "argument": argument
-        }
+        return self.node("ReturnStatement", argument=argument)
+
+    def node_type(self, node):
+        return type(node).__name__ if self.compact else node["type"]
 
     def parse_expression(self):
-        token_type, token_value = self.lexer.peek_token()
-        if token_type == 'NUMBER':
-            self.lexer.match('NUMBER')
-            return {
-                "type": "Literal",
-                "value": token_value
-            }
-        elif token_type == 'ID':
-            var_name = self.lexer.match('ID')
-            return {
-                "type": "Identifier",
-                "name": var_name
-            }
-        else:
-            return None
-        
-class SemanticAnalyzer:
+        """Operator-precedence parse of one expression using explicit operand
+        and operator stacks, so neither long operator chains nor deep
+        parenthesis nesting recurse. Each token is shifted once and each
+        operator reduced once, so the parse is linear with no backtracking.
+        Returns None when the next token cannot start an expression."""
+        lexer = self.lexer
+        operands = []
+        # Entries are (kind, operator, binding power); kind is 'binary',
+        # 'prefix', '(' or 'call'. A call entry carries its callee and
+        # argument list instead of an operator.
+        operators = []
+        expect_operand = True
+        while True:
+            token_type, token_value = lexer.peek_token()
+            if expect_operand:
+                if token_type == 'NUMBER':
+                    lexer.next_token()
+                    operands.append(self.node("Literal", value=token_value))
+                    expect_operand = False
+                elif token_type == 'ID':
+                    line, column = lexer.position()
+                    lexer.next_token()
+                    operands.append(self.node("Identifier", name=token_value, line=line, column=column))
+                    expect_operand = False
+                elif token_type == 'LPAREN':
+                    lexer.next_token()
+                    operators.append(('(', None, 0))
+                elif token_type == 'OP' and token_value in prefix_operators:
+                    lexer.next_token()
+                    operators.append(('prefix', token_value, prefix_binding_power))
+                elif token_type == 'RPAREN' and operators and operators[-1][0] == 'call' and not operators[-1][2]:
+                    # f() with no arguments
+                    lexer.next_token()
+                    _, callee, arguments = operators.pop()
+                    operands.append(self.node("CallExpression", callee=callee, arguments=arguments))
+                    expect_operand = False
+                elif not operands and not operators:
+                    return None
+                else:
+                    raise RuntimeError(f"Expected an expression but got {token_type} {token_value!r}")
+                continue
+
+            if token_type == 'ASSIGN' or (token_type == 'OP' and token_value in assignment_operators):
+                self.reduce(operands, operators, assignment_binding_power, right_associative=True)
+                operators.append(('binary', token_value, assignment_binding_power))
+            elif token_type == 'OP' and token_value in binary_binding_power:
+                power = binary_binding_power[token_value]
+                self.reduce(operands, operators, power)
+                operators.append(('binary', token_value, power))
+            elif token_type == 'OP' and token_value in ('++', '--'):
+                lexer.next_token()
+                operands.append(self.node("UpdateExpression", operator=token_value, argument=operands.pop(),
+                                          prefix=False))
+                continue
+            elif token_type == 'OP' and token_value == '->':
+                lexer.next_token()
+                member = lexer.match('ID')
+                if member is None:
+                    raise RuntimeError("Expected a member name after '->'")
+                operands.append(self.node("MemberExpression", object=operands.pop(), property=member))
+                continue
+            elif token_type == 'LPAREN':
+                lexer.next_token()
+                operators.append(('call', operands.pop(), []))
+                expect_operand = True
+                continue
+            elif token_type in ('COMMA', 'RPAREN') and self.reduce(operands, operators, 0):
+                # reduce() stopped at an open '(' or call.
+                lexer.next_token()
+                kind, callee, arguments = operators[-1]
+                if kind == 'call':
+                    arguments.append(operands.pop())
+                    if token_type == 'RPAREN':
+                        operators.pop()
+                        operands.append(self.node("CallExpression", callee=callee, arguments=arguments))
+                    else:
+                        expect_operand = True
+                elif token_type == 'RPAREN':
+                    operators.pop()
+                else:
+                    raise RuntimeError("Unexpected ',' inside parentheses")
+                continue
+            else:
+                if self.reduce(operands, operators, 0):
+                    raise RuntimeError(f"Unclosed '(' before {token_type} {token_value!r}")
+                return operands.pop()
+            lexer.next_token()
+            expect_operand = True
+
+    def reduce(self, operands, operators, power, right_associative=False):
+        """Pops operators binding tighter than `power` into nodes. Returns True
+        if it stopped at an open parenthesis or call."""
+        while operators:
+            kind, operator, top_power = operators[-1]
+            if kind in ('(', 'call'):
+                return True
+            if top_power < power or (right_associative and top_power == power):
+                return False
+            operators.pop()
+            if kind == 'prefix':
+                argument = operands.pop()
+                if operator in ('++', '--'):
+                    operands.append(self.node("UpdateExpression", operator=operator, argument=argument, prefix=True))
+                else:
+                    operands.append(self.node("UnaryExpression", operator=operator, argument=argument))
+                continue
+            right = operands.pop()
+            left = operands.pop()
+            if operator in assignment_operators:
+                if self.node_type(left) not in ("Identifier", "MemberExpression"):
+                    raise RuntimeError(f"Invalid assignment target {self.node_type(left)}")
+                if operator != '=':
+                    # a op= b is represented as a = a op b, with its own
+                    # node for the read of a.
+                    read = left
+                    if self.node_type(left) == "Identifier":
+                        read = self.node("Identifier", name=left["name"], line=left["line"],
+                                         column=left["column"])
+                    right = self.node("BinaryExpression", operator=operator[:-1], left=read, right=right)
+                operands.append(self.node("AssignmentExpression", left=left, right=right))
+            else:
+                operands.append(self.node("BinaryExpression", operator=operator, left=left, right=right))
+        return False
+
+def position(node):
+    """' at line:column' for nodes that carry a source position."""
+    line = node.get("line")
+    return f" at {line}:{node.get('column')}" if line is not None else ""
+
+
+class SemanticAnalyzer(NodeVisitor):
     def __init__(self, syntax_tree):
         self.syntax_tree = syntax_tree
+        self.symbols = SymbolTable()
         self.successful = False  # Flag to track successful analysis
 
-    def analyze(self):
-        self.visit(self.syntax_tree)
+    def analyze(self, *passes):
+        # Extra NodeVisitor passes run in the same traversal as the analyzer.
+        walk(self.syntax_tree, (self,) + passes)
         self.successful = True  # Mark analysis as successful at the end
 
     def visit(self, node):
-        if node is None:
-            return  # Handle None nodes gracefully
-        method_name = f"visit_{node['type']}"
-        visit_method = getattr(self, method_name, self.generic_visit)
-        return visit_method(node)
-
-    def generic_visit(self, node):
-        # Default handling if no specific visit method is defined
-        if isinstance(node, dict):
-            for key, value in node.items():
-                if isinstance(value, dict):
-                    self.visit(value)
-                elif isinstance(value, list):
-                    for item in value:
-                        self.visit(item)
+        walk(node, (self,))
 
     def visit_Program(self, node):
+        # Functions are visible throughout the file, so a call may come
+        # before the definition; the grammar has no prototypes.
         for element in node.get("body", []):
-            self.visit(element)
+            if node_type(element) == "FunctionDeclaration":
+                self.symbols.declare(element["name"], "function", element.get("returnType"),
+                                     element.get("line"), element.get("column"))
 
     def visit_FunctionDeclaration(self, node):
-        for statement in node.get("body", []):
-            self.visit(statement)
+        self.symbols.declare(node["name"], "function", node.get("returnType"), node.get("line"), node.get("column"))
+        self.symbols.enter_scope("function", node["name"])
+        for param in node.get("params", []):
+            self.symbols.declare(param["name"], "parameter", param["datatype"], param.get("line"), param.get("column"))
+
+    def leave_FunctionDeclaration(self, node):
+        self.symbols.exit_scope()
+
+    def visit_VariableDeclaration(self, node):
+        if self.symbols.is_declared_locally(node["name"]):
+            previous = self.symbols.lookup(node["name"])
+            raise RuntimeError(f"Redeclaration of '{node['name']}'{position(node)}"
+                               + (f", first declared at {previous.line}:{previous.column}"
+                                  if previous.line is not None else ""))
+        self.symbols.declare(node["name"], "variable", node["datatype"], node.get("line"), node.get("column"))
 
     def visit_AssignmentExpression(self, node):
-        left_type = self.visit(node.get("left"))
-        right_type = self.visit(node.get("right"))
         # Further semantic analysis logic for assignments
+        pass
 
     def visit_Identifier(self, node):
-        # Semantic analysis for identifier nodes
-        pass
+        if self.symbols.lookup(node["name"]) is None:
+            raise RuntimeError(f"Undeclared identifier '{node['name']}'{position(node)}")
 
     def visit_Literal(self, node):
         # Semantic analysis for literal nodes
         pass
 
-# Example usage
-input_code = """
-int main() {
-    int a;
-    a = 5;
-    return a;
-}
-"""
-
-lexer = Lexer(input_code)
-parser = Parser(lexer)
-syntax_tree = parser.parse()
-
-analyzer = SemanticAnalyzer(syntax_tree)
-analyzer.analyze()
-ast = analyzer.syntax_tree
-print(ast)
-
-import subprocess
-
-# Simplified example AST (normally produced by your semantic analyzer)
-example_ast = {
-    "type": "Program",
-    "body": [
-        {
-            "type": "ClassDeclaration",
-            "name": "MainClass",
-            "body": [
-                {
-                    "type": "MethodDeclaration",
-                    "name": "main",
-                    "returnType": "void",
-                    "params": [{"type": "String[]", "name": "args"}],
-                    "body": [
-                        {"type": "VariableDeclaration", "datatype": "int", "name": "a"},
-                        {"type": "AssignmentExpression", "left": {"type": "Identifier", "name": "a"}, "right": {"type": "Literal", "value": 5}},
-                        {"type": "ReturnStatement", "argument": {"type": "Identifier", "name": "a"}}
-                    ]
-                }
-            ]
-        }
-    ]
-}
-
-# Code generation function to convert AST to Java code
-def generate_java_code(ast):
-    code = ""
-    if ast["type"] == "Program":
-        for element in ast["body"]:
-            code += generate_java_code(element)
-    elif ast["type"] == "ClassDeclaration":
-        code += f"public class {ast['name']} {{\n"
-        for member in ast["body"]:
-            code += generate_java_code(member)
-        code += "}\n"
-    elif ast["type"] == "MethodDeclaration":
-        params = ", ".join([f"{param['type']} {param['name']}" for param in ast["params"]])
-        code += f"public static {ast['returnType']} {ast['name']}({params}) {{\n"
-        for statement in ast["body"]:
-            code += generate_java_code(statement)
-        code += "}\n"
-    elif ast["type"] == "VariableDeclaration":
-        code += f"{ast['datatype']} {ast['name']};\n"
-    elif ast["type"] == "AssignmentExpression":
-        left = generate_java_code(ast["left"])
-        right = generate_java_code(ast["right"])
-        code += f"{left} = {right};\n"
-    elif ast["type"] == "Identifier":
-        code += ast["name"]
-    elif ast["type"] == "Literal":
-        code += str(ast["value"])
-    elif ast["type"] == "ReturnStatement":
-        argument = generate_java_code(ast["argument"])
-        code += f"System.out.println({argument});\nreturn;\n"
-    elif ast is None:
-        code += "null"
-    return code
-
-# Generate the Java code from the AST
-import subprocess
-
 # Simplified example AST (normally produced by your semantic analyzer)
 example_ast = {
     "type": "Program",
@@ -332,64 +539,93 @@ example_ast = {
     ]
 }
 
-# Code generation function to convert AST to Java code
-def generate_java_code(ast):
-    code = ""
-    if ast["type"] == "Program":
-        for element in ast["body"]:
-            code += generate_java_code(element)
-    elif ast["type"] == "ClassDeclaration":
-        code += f"public class {ast['name']} {{\n"
-        for member in ast["body"]:
-            code += generate_java_code(member)
-        code += "}\n"
-    elif ast["type"] == "MethodDeclaration":
-        params = ", ".join([f"{param['type']} {param['name']}" for param in ast["params"]])
-        code += f"public static {ast['returnType']} {ast['name']}({params}) {{\n"
-        for statement in ast["body"]:
-            code += generate_java_code(statement)
-        code += "}\n"
-    elif ast["type"] == "VariableDeclaration":
-        code += f"{ast['datatype']} {ast['name']};\n"
-    elif ast["type"] == "AssignmentExpression":
-        left = generate_java_code(ast["left"])
-        right = generate_java_code(ast["right"])
-        code += f"{left} = {right};\n"
-    elif ast["type"] == "Identifier":
-        code += ast["name"]
-    elif ast["type"] == "Literal":
-        code += str(ast["value"])
-    elif ast["type"] == "ReturnStatement":
-        argument = generate_java_code(ast["argument"])
-        code += f"System.out.println({argument});\nreturn;\n"
-    elif ast is None:
-        code += "null"
-    return code
-
-# Generate the Java code from the AST
-generated_java_code = generate_java_code(ast)
-print(generate_java_code)
-
-# Save the generated Java code to a file
-java_file_path = 'MainClass.java'
-with open(java_file_path, 'w') as java_file:
-    java_file.write(generated_java_code)
-
-# Compile the generated Java code using javac
-compile_command = ['javac', java_file_path]
-try:
-    subprocess.run(compile_command, check=True)
-    print("Compilation successful!")
-except subprocess.CalledProcessError as e:
-    print(f"Compilation failed: {e}")
-
-# Run the compiled Java program
-run_command = ['java', 'MainClass']
-try:
-    subprocess.run(run_command, check=True)
-    print("Execution successful!")
-except subprocess.CalledProcessError as e:
-    print(f"Execution failed: {e}")
-
-# Print the generated Java code for verification
-print("Generated Java Code:\n", generated_java_code)
+def main(argv=None):
+    import argparse
+    import subprocess
+
+    import optimizer
+    import profiling
+
+    argparser = argparse.ArgumentParser(description="Compile the example C program to Java and run it.")
+    optimizer.add_arguments(argparser)
+    profiling.add_arguments(argparser)
+    argparser.add_argument("--run", action="store_true",
+                           help="execute the program in-process instead of compiling it with javac")
+    args = argparser.parse_args(argv)
+    if args.profile:
+        profiling.enable()
+
+    # Example usage
+    input_code = """
+    int main() {
+        int a;
+        a = 5;
+        return a;
+    }
+    """
+
+    with profiling.phase("lex") as phase:
+        lexer = Lexer(input_code)
+        phase.count(tokens=len(lexer.tokens))
+    with profiling.phase("parse") as phase:
+        parser = Parser(lexer)
+        syntax_tree = parser.parse()
+    if profiling.collector.enabled:
+        phase.count(nodes=profiling.count_nodes(syntax_tree))
+
+    with profiling.phase("analyze") as phase:
+        analyzer = SemanticAnalyzer(syntax_tree)
+        analyzer.analyze()
+        phase.count(symbols=len(analyzer.symbols))
+    with profiling.phase("optimize"):
+        ast = optimizer.optimize(analyzer.syntax_tree, args.optimization)
+    print(ast)
+
+    if args.run:
+        # Execute in-process instead of going through javac and the JVM
+        import pycode
+        try:
+            with profiling.phase("run"):
+                pycode.run(ast)
+        except RuntimeError as e:
+            print(f"Execution failed: {e}")
+    else:
+        if args.optimization >= 2:
+            import ir
+            with profiling.phase("ir"):
+                ast, _ = ir.lower(ast)
+            print(ast)
+
+        # Generate the Java code from the AST straight into the file
+        java_file_path = 'MainClass.java'
+        with profiling.phase("codegen"), open(java_file_path, 'w') as java_file:
+            generate_java_code(ast, java_file)
+
+        # Compile the generated Java code using javac
+        compile_command = ['javac', java_file_path]
+        try:
+            with profiling.phase("javac"):
+                subprocess.run(compile_command, check=True)
+            print("Compilation successful!")
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            print(f"Compilation failed: {e}")
+
+        # Run the compiled Java program
+        run_command = ['java', 'MainClass']
+        try:
+            with profiling.phase("java"):
+                subprocess.run(run_command, check=True)
+            print("Execution successful!")
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            print(f"Execution failed: {e}")
+
+        # Print the generated Java code for verification
+        with open(java_file_path) as java_file:
+            print("Generated Java Code:\n", java_file.read())
+
+    if args.profile:
+        profiling.write(args.profile, args.profile_format)
+
+
+if __name__ == "__main__":
+    main()
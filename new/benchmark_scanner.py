@@ -0,0 +1,76 @@
+import contextlib
+import io
+import os
+import sys
+import time
+
+# utils usa módulos da raiz do repositório (profiling, symbol_table); quem
+# executa o script é que põe a raiz no caminho, não a biblioteca.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from utils import Utils
+
+
+# Trecho repetido para gerar entradas de vários megabytes.
+trecho = """
+int funcao_%(n)d(int a, float b) {
+    int x%(n)d, y%(n)d;
+    x%(n)d = a * 2 + 15;
+    y%(n)d += x%(n)d - 3.5;
+    x%(n)d <<= 2;
+    if (x%(n)d >= y%(n)d && a != 0 || b <= 1.25) {
+        printf("resultado %%d", x%(n)d);
+        return x%(n)d;
+    }
+    return y%(n)d %% 7;
+}
+"""
+
+
+def gerar_programa(tamanho):
+    partes = []
+    total = 0
+    n = 0
+    while total < tamanho:
+        parte = trecho % {'n': n % 1000}
+        partes.append(parte)
+        total += len(parte)
+        n += 1
+    return "".join(partes)
+
+
+def medir(funcao, programa):
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        analisador = funcao(programa)
+    return time.perf_counter() - inicio, analisador
+
+
+def cadeia(programa):
+    analisador = Utils(None)
+    for rule in analisador.rules():
+        programa = rule(programa)
+    return analisador
+
+
+def passada_unica(programa):
+    analisador = Utils(None)
+    analisador.scan(programa)
+    return analisador
+
+
+def main():
+    tamanhos = [int(arg) for arg in sys.argv[1:]] or [1 << 20, 4 << 20]
+    for tamanho in tamanhos:
+        programa = gerar_programa(tamanho)
+        tempo_cadeia, antigo = medir(cadeia, programa)
+        tempo_scan, novo = medir(passada_unica, programa)
+        iguais = (sorted(map(tuple, antigo.element_list)) == sorted(map(tuple, novo.element_list))
+                  and [s.name for s in antigo.tabela_de_simbolos] == [s.name for s in novo.tabela_de_simbolos])
+        print(f"{len(programa) / 1e6:.1f} MB | cadeia: {tempo_cadeia:.3f}s | "
+              f"passada única: {tempo_scan:.3f}s | speedup: {tempo_cadeia / tempo_scan:.1f}x | "
+              f"mesmos tokens: {iguais}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,28 @@
+import argparse
+import os
+import sys
+
+# utils usa módulos da raiz do repositório (profiling, symbol_table); quem
+# executa o script é que põe a raiz no caminho, não a biblioteca.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
 from utils import *
 from dict import *
 
 
 def main():
-    analyser = Utils()
+    argparser = argparse.ArgumentParser(description="Analisador léxico.")
+    argparser.add_argument("arquivo", nargs="?")
+    argparser.add_argument("--cadeia", action="store_true", help="usa a cadeia de regras em vez da passada única")
+    argparser.add_argument("--buffer", action="store_true",
+                           help="mapeia o arquivo na memória e guarda os tokens em colunas (arquivos grandes)")
+    profiling.add_arguments(argparser)
+    args = argparser.parse_args()
+    if args.profile:
+        profiling.enable()
+    analyser = Utils(args.arquivo or arquivo_exemplo, not args.cadeia, args.buffer)
+    if args.profile:
+        profiling.write(args.profile, args.profile_format)
 
 if __name__ == "__main__":
     print("----------------- Programa Iniciado -----------------")
@@ -1,24 +1,243 @@
 from dict import *
+from array import array
+import mmap
+import os
 import re
+import shutil
 import sys
 
+import profiling
+from symbol_table import SymbolTable
+
+
+reservadas = frozenset(reserved)
+
+# Padrões da cadeia de regras, compilados uma vez para todas as chamadas.
+operadores_por_tamanho = sorted(ops, key=len, reverse=True)
+padrao_reservadas = re.compile(r"\b(" + "|".join(reserved) + r")\b")
+padrao_operadores = re.compile(r"(\s+|)(%s)(\s+|)" % "|".join(map(re.escape, operadores_por_tamanho)))
+padrao_numerais = re.compile(regex['numerais'])
+padrao_constantes = re.compile(regex['constantes_textuais'])
+padrao_delimitadores = re.compile(regex['delimitadores'])
+padrao_identificadores = re.compile(regex['identificadores'])
+padrao_alfanumerico = re.compile(r'\b(\d+[a-zA-Z0-9_]*)\b')
+
+# Arquivo de exemplo analisado por main.py quando nenhum é informado.
+arquivo_exemplo = os.path.join(os.path.dirname(os.path.abspath(__file__)), "teste1.c")
+
+
+def caractere_permitido(caractere):
+    return caractere in ops or caractere in blank or any(
+        re.findall(padrao, caractere) for padrao in regex.values())
+
+
+# Tabela de caracteres válidos calculada uma única vez a partir de dict.py.
+# Fora do Latin-1 só dígitos (\d) são aceitos pelas regras, daí o \d na classe.
+caracteres_permitidos = frozenset(chr(codigo) for codigo in range(256) if caractere_permitido(chr(codigo)))
+alternativa_ilegal = r'(?P<ilegal>[^' + "".join(map(re.escape, sorted(caracteres_permitidos))) + r'\d])'
+padrao_ilegal = re.compile(regex['constantes_textuais'] + '|' + alternativa_ilegal)
+
+
+def caracteres_ilegais(programa):
+    """Lista (caractere, linha, coluna) de todos os caracteres não permitidos,
+    ignorando o conteúdo das constantes textuais."""
+    erros = []
+    linha = 1
+    ultima_posicao = 0
+    inicio_linha = 0
+    for mo in padrao_ilegal.finditer(programa):
+        if mo.lastgroup != 'ilegal':
+            continue
+        posicao = mo.start()
+        quebras = programa.count('\n', ultima_posicao, posicao)
+        if quebras:
+            linha += quebras
+            inicio_linha = programa.rindex('\n', 0, posicao) + 1
+        ultima_posicao = posicao
+        erros.append((mo.group('ilegal'), linha, posicao - inicio_linha + 1))
+    return erros
+
+
+# Scanner de passada única: cada alternativa corresponde a uma das regras da
+# cadeia antiga, na mesma ordem de prioridade. Operadores mais longos vêm
+# primeiro para que "<<=" não seja lido como "<". Um caractere que nenhuma
+# regra aceita é "ilegal" na própria varredura, sem uma passada de validação.
+alternativas_scanner = [
+    r'(?P<constante>' + regex['constantes_textuais'] + r')',
+    r'(?P<invalida>\b\d+[a-zA-Z_][a-zA-Z0-9_]*\b)',
+    r'(?P<numero>\b\d+\.?\d*\b)',
+    r'(?P<palavra>' + regex['identificadores'] + r')',
+    r'(?P<operador>' + "|".join(map(re.escape, operadores_por_tamanho)) + r')',
+    r'(?P<delimitador>' + regex['delimitadores'] + r')',
+    r'(?P<branco>\s+)',
+]
+padrao_scanner = re.compile("|".join(alternativas_scanner + [alternativa_ilegal, r'(?P<outro>.)']))
+
+
+# Versão em bytes do scanner para o modo buffer, que lê o arquivo mapeado
+# direto: os comentários viram um grupo ignorado em vez de uma passada
+# anterior, e um caractere UTF-8 de vários bytes é um único "outro".
+padrao_scanner_bytes = re.compile(
+    rb'(?P<comentario>//[^\n]*|/\*(?s:.*?)(?:\*/|\Z))|'
+    + "|".join(alternativas_scanner).encode() + rb'|(?P<outro>[\xc0-\xff][\x80-\xbf]*|.)')
+reservadas_bytes = frozenset(palavra.encode() for palavra in reserved)
+bytes_permitidos = frozenset(ord(caractere) for caractere in caracteres_permitidos if caractere.isascii())
+
+tipos_de_token = ['text constant', 'reserved word', 'Integer', 'Float', 'operator', 'delimiter', 'identifier']
+codigo_do_tipo = {tipo: codigo for codigo, tipo in enumerate(tipos_de_token)}
+codigo_por_grupo = {'palavra': codigo_do_tipo['reserved word'], 'operador': codigo_do_tipo['operator'],
+                    'delimitador': codigo_do_tipo['delimiter']}
+
+
+class BufferDeTokens:
+    """Tokens guardados em colunas sobre os bytes do programa: o tipo em um
+    array('B') e o início e o fim de cada um em arrays('I'). O texto só é
+    copiado quando um token é lido, e cada token lido é o mesmo
+    [elemento, tipo] das listas do modo normal."""
+
+    def __init__(self, dados):
+        self.dados = dados
+        tipo_offset = 'I' if len(dados) < 1 << 32 else 'Q'
+        self.tipos = array('B')
+        self.inicios = array(tipo_offset)
+        self.fins = array(tipo_offset)
+
+    def adicionar(self, tipo, inicio, fim):
+        self.tipos.append(tipo)
+        self.inicios.append(inicio)
+        self.fins.append(fim)
+
+    def texto(self, indice):
+        return str(self.dados[self.inicios[indice]:self.fins[indice]], 'utf-8')
+
+    def __len__(self):
+        return len(self.tipos)
+
+    def __getitem__(self, indice):
+        if indice < 0:
+            indice += len(self.tipos)
+        return [self.texto(indice), tipos_de_token[self.tipos[indice]]]
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self.tipos)))
+
+    def nbytes(self):
+        return sum(coluna.itemsize * len(coluna) for coluna in (self.tipos, self.inicios, self.fins))
+
+
+padrao_inicio = re.compile(r"//|/\*|\"|'")
+padrao_literal = {
+    '"': re.compile(r'"(?:\\.|[^"\\\n])*'),
+    "'": re.compile(r"'(?:\\.|[^'\\\n])*"),
+}
+
+
+def remover_comentarios(arquivo, tamanho_bloco=1 << 20):
+    """Lê `arquivo` em blocos e gera o texto sem comentários.
+
+    Comentários de bloco viram um espaço seguido das mesmas quebras de linha
+    que continham, e comentários de linha mantêm a quebra final, então a
+    numeração das linhas é preservada. Literais de texto e de caractere são
+    copiados intactos, mesmo contendo "//" ou "/*". Só o fim de um literal ou
+    uma barra final é carregado entre blocos, então a memória usada não
+    depende do tamanho do arquivo.
+    """
+    pendente = ""
+    em_bloco = False
+    em_linha = False
+    while True:
+        bloco = arquivo.read(tamanho_bloco)
+        fim = not bloco
+        texto = pendente + bloco
+        pendente = ""
+        n = len(texto)
+        saida = []
+        pos = 0
+        while pos < n:
+            if em_bloco:
+                fecha = texto.find("*/", pos)
+                if fecha < 0:
+                    saida.append("\n" * texto.count("\n", pos))
+                    if texto.endswith("*") and not fim:
+                        pendente = "*"
+                    break
+                saida.append("\n" * texto.count("\n", pos, fecha))
+                pos = fecha + 2
+                em_bloco = False
+                continue
+            if em_linha:
+                quebra = texto.find("\n", pos)
+                if quebra < 0:
+                    break
+                pos = quebra
+                em_linha = False
+                continue
+            mo = padrao_inicio.search(texto, pos)
+            if mo is None:
+                if texto.endswith("/") and not fim:
+                    saida.append(texto[pos:n - 1])
+                    pendente = "/"
+                else:
+                    saida.append(texto[pos:])
+                break
+            inicio = mo.start()
+            saida.append(texto[pos:inicio])
+            marca = mo.group()
+            if marca == "//":
+                em_linha = True
+                pos = inicio + 2
+            elif marca == "/*":
+                em_bloco = True
+                saida.append(" ")
+                pos = inicio + 2
+            else:
+                final = padrao_literal[marca].match(texto, inicio).end()
+                if not fim and (final == n or (final == n - 1 and texto[final] == "\\")):
+                    # O literal continua no próximo bloco.
+                    pendente = texto[inicio:]
+                    break
+                if final < n and texto[final] == marca:
+                    final += 1
+                saida.append(texto[inicio:final])
+                pos = final
+        yield "".join(saida)
+        if fim:
+            break
+
 
 class Utils:
-    def __init__(self) -> None:
+    def __init__(self, nome=None, passada_unica=True, buffer=False) -> None:
         self.element_list = []
         self.lista_de_tokens = []
-        self.tabela_de_simbolos = []
+        self.tabela_de_simbolos = SymbolTable()
 
-        nome =  "/workspaces/Compilador-C/new/teste1.c"
-        programa = self.ler_arquivo(nome)
-        original = open(nome, 'r')
-        print(original.read())
+        if nome is None:
+            return
 
+        if buffer:
+            with profiling.phase("mapear_arquivo"):
+                self.arquivo_mapeado = self.mapear_arquivo(nome)
+        else:
+            with profiling.phase("ler_arquivo"):
+                programa = self.ler_arquivo(nome)
+        with open(nome, 'r') as original:
+            shutil.copyfileobj(original, sys.stdout)
+        print()
 
-        rules = [self.find_text_constants, self.Find_reserved, self.find_ops, self.find_numbers, self.find_delimiters, self.find_identifiers]
-        for rule in rules:
-            programa = rule(programa)
-            print('\n-----------------\n' + programa + '\n-----------------\n')
+        if buffer:
+            with profiling.phase("scan_buffer") as fase:
+                self.scan_buffer(self.arquivo_mapeado)
+                fase.count(tokens=len(self.element_list), symbols=len(self.tabela_de_simbolos))
+        elif passada_unica:
+            with profiling.phase("scan") as fase:
+                self.scan(programa)
+                fase.count(tokens=len(self.element_list), symbols=len(self.tabela_de_simbolos))
+        else:
+            for rule in self.rules():
+                with profiling.phase(rule.__name__) as fase:
+                    programa = rule(programa)
+                    fase.count(tokens=len(self.element_list), symbols=len(self.tabela_de_simbolos))
+                print('\n-----------------\n' + programa + '\n-----------------\n')
 
         print("------------------------------------ tokens ----------------------------------------------\n")
         for token in self.lista_de_tokens:
@@ -30,102 +249,197 @@ class Utils:
         for element in self.element_list:
             print(element)
 
+    def rules(self):
+        # A validação vem primeiro: as regras seguintes reescrevem o programa
+        # e as linhas e colunas dos erros deixariam de ser as do arquivo.
+        return [self.find_illegal_char, self.find_text_constants, self.Find_reserved, self.find_ops, self.find_numbers, self.find_delimiters, self.find_identifiers]
+
+    def scan(self, programa):
+        # Equivalente à cadeia de rules(), mas em uma única varredura linear e
+        # com os tokens na ordem em que aparecem no código fonte.
+        tokens = self.lista_de_tokens
+        simbolos = self.tabela_de_simbolos
+        elementos = self.element_list
+        ilegais = []
+        invalida = None
+        linha = 1
+        inicio_linha = 0
+        for mo in padrao_scanner.finditer(programa):
+            tipo = mo.lastgroup
+            if tipo == 'branco':
+                quebras = mo.group(tipo).count('\n')
+                if quebras:
+                    linha += quebras
+                    inicio_linha = programa.rindex('\n', 0, mo.end()) + 1
+                continue
+            if tipo == 'constante':
+                element, type = mo.group(2), 'text constant'
+            elif tipo == 'palavra':
+                element = mo.group(tipo)
+                if element not in reservadas:
+                    simbolos.declare(element, 'identifier', line=linha, column=mo.start() - inicio_linha + 1)
+                    elementos.append([element, 'identifier'])
+                    continue
+                type = 'reserved word'
+            elif tipo == 'numero':
+                element = mo.group(tipo)
+                type = 'Float' if '.' in element else 'Integer'
+            elif tipo == 'operador':
+                element, type = mo.group(tipo), 'operator'
+            elif tipo == 'delimitador':
+                element, type = mo.group(tipo), 'delimiter'
+            elif tipo == 'invalida':
+                if invalida is None:
+                    invalida = mo.group(tipo)
+                continue
+            elif tipo == 'ilegal':
+                ilegais.append((mo.group(tipo), linha, mo.start() - inicio_linha + 1))
+                continue
+            else:
+                # Caracteres permitidos que não formam token.
+                continue
+            tokens.append([element, type])
+            elementos.append([element, type])
+        # Primeiro todos os caracteres ilegais, depois a primeira palavra
+        # inválida, como na cadeia de regras.
+        self.reportar_erros(ilegais, invalida)
+        return programa
+
+    def scan_buffer(self, dados):
+        """scan() sobre bytes (ou um mmap) sem copiar o programa: os tokens
+        vão para BufferDeTokens e só os identificadores são decodificados,
+        uma vez cada, para a tabela de símbolos. Linhas e colunas são as do
+        arquivo original, com os comentários no lugar."""
+        self.lista_de_tokens = tokens = BufferDeTokens(dados)
+        self.element_list = elementos = BufferDeTokens(dados)
+        simbolos = self.tabela_de_simbolos
+        identificador = codigo_do_tipo['identifier']
+        constante = codigo_do_tipo['text constant']
+        declarados = set()
+        ilegais = []
+        invalida = None
+        linha = 1
+        inicio_linha = 0
+        for mo in padrao_scanner_bytes.finditer(dados):
+            tipo = mo.lastgroup
+            inicio, fim = mo.span()
+            if tipo == 'branco' or tipo == 'comentario':
+                # mmap não tem count(); as quebras são contadas com find().
+                quebra = dados.find(b'\n', inicio, fim)
+                while quebra >= 0:
+                    linha += 1
+                    inicio_linha = quebra + 1
+                    quebra = dados.find(b'\n', inicio_linha, fim)
+                continue
+            if tipo == 'palavra':
+                palavra = dados[inicio:fim]
+                if palavra not in reservadas_bytes:
+                    if palavra not in declarados:
+                        declarados.add(palavra)
+                        simbolos.declare(palavra.decode(), 'identifier', line=linha, column=inicio - inicio_linha + 1)
+                    elementos.adicionar(identificador, inicio, fim)
+                    continue
+                codigo = codigo_por_grupo[tipo]
+            elif tipo == 'constante':
+                # Só o conteúdo entre as aspas, como mo.group(2) em scan().
+                codigo, inicio, fim = constante, inicio + 1, fim - 1
+            elif tipo == 'numero':
+                codigo = codigo_do_tipo['Float' if dados.find(b'.', inicio, fim) >= 0 else 'Integer']
+            elif tipo in codigo_por_grupo:
+                codigo = codigo_por_grupo[tipo]
+            elif tipo == 'invalida':
+                if invalida is None:
+                    invalida = str(dados[inicio:fim], 'utf-8')
+                continue
+            else:
+                if fim - inicio > 1 or dados[inicio] not in bytes_permitidos:
+                    coluna = len(str(dados[inicio_linha:inicio], 'utf-8', 'replace')) + 1
+                    ilegais.append((str(dados[inicio:fim], 'utf-8', 'replace'), linha, coluna))
+                continue
+            tokens.adicionar(codigo, inicio, fim)
+            elementos.adicionar(codigo, inicio, fim)
+        self.reportar_erros(ilegais, invalida)
+        return dados
+
+    def reportar_erros(self, ilegais, invalida):
+        """Erros de scan() e scan_buffer(): primeiro todos os caracteres
+        ilegais, depois a primeira palavra inválida."""
+        for caractere, linha, coluna in ilegais:
+            print(f"Erro: o caractere '{caractere}' não é permitido! (linha {linha}, coluna {coluna})")
+        if ilegais:
+            sys.exit()
+        if invalida is not None:
+            print(f'Erro: "{invalida}" é uma palavra inválida pois começa com um número.')
+            sys.exit()
+
+    def mapear_arquivo(self, nome):
+        with open(nome, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
     def ler_arquivo(self, teste):
-        f = open(teste, 'r')
-        program = ""
-        buffer = ""
-        in_multiline_comment = False
-        for line in f:
-            i = 0
-            while i < len(line):
-                if in_multiline_comment:
-                    # Estamos dentro de um comentário de bloco, ignoramos tudo até encontrar o final do comentário
-                    if line[i:i + 2] == "*/":
-                        in_multiline_comment = False
-                        i += 1
-                else:
-                    # Verifica se há um comentário de linha
-                    if line[i:i + 2] == "//":
-                        break  # ignoramos o restante da linha
-                    elif line[i:i + 2] == "/*":
-                        # Início do comentário de bloco
-                        in_multiline_comment = True
-                        i += 1
-                    else:
-                        program += line[i]  # Adicionamos o caractere à string do programa
-                i += 1
-            # Adicionamos o buffer ao programa se estivermos no estado DEFAULT
-            if not in_multiline_comment:
-                program += buffer
-                buffer = ""
-        f.close()
-        return program
+        with open(teste, 'r') as f:
+            return "".join(remover_comentarios(f))
 
     def Find_reserved(self,programa):
-        padrao = r"\b(" + "|".join(regex) + r")\b"
-        nova_string = re.sub(padrao, lambda match: ' ', programa)
-        regex_encontradas = re.findall(padrao, programa)
+        nova_string = padrao_reservadas.sub(' ', programa)
+        regex_encontradas = padrao_reservadas.findall(programa)
         self.universal_printer(regex_encontradas, 'reserved word')
         return nova_string
 
     def find_ops(self, programa):
-        padrao = r"(\s+|)(%s)(\s+|)" % "|".join(map(re.escape, ops))
-        ops_encontrados = re.findall(padrao, programa)
+        ops_encontrados = padrao_operadores.findall(programa)
         for index, value in enumerate(ops_encontrados):
             ops_encontrados[index] = ops_encontrados[index][1]
         self.universal_printer(ops_encontrados, 'operator')
-        nova_string = re.sub(padrao, lambda match: ' ', programa)
+        nova_string = padrao_operadores.sub(' ', programa)
         return nova_string
 
     def find_numbers(self, programa):
-        padrao = regex['numerais']
-        numeros_encontrados = re.findall(padrao, programa)
+        numeros_encontrados = padrao_numerais.findall(programa)
         inteiros = [num for num in numeros_encontrados if '.' not in num]
         floats = [num for num in numeros_encontrados if '.' in num]
 
         self.universal_printer(inteiros, 'Integer')
         self.universal_printer(floats, 'Float')
 
-        nova_string = re.sub(padrao, lambda match: ' ', programa)
+        nova_string = padrao_numerais.sub(' ', programa)
         return nova_string
 
     def find_text_constants(self,programa):
-        padrao = regex['constantes_textuais']
-        constantes_encontradas = re.findall(padrao, programa)
+        constantes_encontradas = padrao_constantes.findall(programa)
         self.universal_printer(constantes_encontradas, 'text constant')
-        nova_string = re.sub(padrao, lambda match: ' ', programa)
+        nova_string = padrao_constantes.sub(' ', programa)
         return nova_string
 
     def find_delimiters(self,programa):
-        padrao = regex['delimitadores']
-        delimitadores_encontrados = re.findall(padrao, programa)
+        delimitadores_encontrados = padrao_delimitadores.findall(programa)
         self.universal_printer(delimitadores_encontrados, 'delimiter')
-        nova_string = re.sub(padrao, lambda match: ' ', programa)
+        nova_string = padrao_delimitadores.sub(' ', programa)
         return nova_string
 
     def find_identifiers(self, programa):
-        self.find_illegal_char(programa)
         self.find_alphanumerical(programa)
-        padrao = regex['identificadores']
-        caracteres_identificadores = re.findall(padrao, programa)
+        caracteres_identificadores = padrao_identificadores.findall(programa)
         self.universal_printer(caracteres_identificadores, 'identifier')
-        nova_string = re.sub(padrao, lambda match: ' ', programa)
+        nova_string = padrao_identificadores.sub(' ', programa)
         return nova_string
 
     def find_illegal_char(self, programa):
-        for caractere in programa:
-            if caractere not in ops and caractere not in blank and not any(
-                    re.findall(padrao, caractere) for padrao in regex.values()):
-                print(f"Erro: o caractere '{caractere}' não é permitido!")
-                sys.exit()
+        erros = caracteres_ilegais(programa)
+        for caractere, linha, coluna in erros:
+            print(f"Erro: o caractere '{caractere}' não é permitido! (linha {linha}, coluna {coluna})")
+        if erros:
+            sys.exit()
+        return programa
 
     def find_alphanumerical(self, programa):
-        padrao = r'\b(\d+[a-zA-Z0-9_]*)\b'
-        palavras_com_numeros = re.findall(padrao, programa)
-        for palavra in palavras_com_numeros:
-            if re.match('^\d', palavra):
-                print(f'Erro: "{palavra}" é uma palavra inválida pois começa com um número.')
-                sys.exit()
+        # Toda palavra encontrada começa com dígito, então a primeira já é o erro.
+        mo = padrao_alfanumerico.search(programa)
+        if mo is not None:
+            print(f'Erro: "{mo.group(1)}" é uma palavra inválida pois começa com um número.')
+            sys.exit()
 
         return programa
 
@@ -135,8 +449,7 @@ class Utils:
         for element in list:
             #print(f"'{element}' is a {type}.")
             if type == 'identifier':
-                if [element, type] not in self.tabela_de_simbolos:
-                    self.tabela_de_simbolos.append([element, type])
+                self.tabela_de_simbolos.declare(element, type)
             else:
                 self.lista_de_tokens.append([element, type])
             self.element_list.append([element, type])
@@ -0,0 +1,303 @@
+import ast_nodes
+from visitor import children, node_type
+
+
+def new_node(like, node_type_name, **fields):
+    """Builds a node in the same representation (dict or ast_nodes) as `like`."""
+    if isinstance(like, dict):
+        return {"type": node_type_name, **fields}
+    return ast_nodes.node_classes[node_type_name](**fields)
+
+
+def walk_expression(expression):
+    """Nodes of an expression, parents before children, without recursion."""
+    stack = [expression] if expression is not None else []
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(children(node))
+
+
+def has_side_effects(expression):
+    """Whether evaluating `expression` may change state, or may fail: & and
+    -> are rejected by the backends, and removing an unused one would make
+    the diagnostics depend on the optimization level."""
+    for node in walk_expression(expression):
+        kind = node_type(node)
+        if kind in ("AssignmentExpression", "UpdateExpression", "CallExpression", "MemberExpression"):
+            return True
+        if kind == "UnaryExpression" and node["operator"] == "&":
+            return True
+    return False
+
+
+def writes(expression):
+    names = set()
+    for node in walk_expression(expression):
+        kind = node_type(node)
+        if kind == "AssignmentExpression" and node_type(node["left"]) == "Identifier":
+            names.add(node["left"]["name"])
+        elif kind == "UpdateExpression" and node_type(node["argument"]) == "Identifier":
+            names.add(node["argument"]["name"])
+    return names
+
+
+def reads(expression):
+    """Names whose current value `expression` may use. The target of a plain
+    assignment is written, not read, so it is skipped; a op= b reads `a`
+    through the separate node the parser builds in its right-hand side."""
+    names = set()
+    stack = [expression] if expression is not None else []
+    while stack:
+        node = stack.pop()
+        kind = node_type(node)
+        if kind == "Identifier":
+            names.add(node["name"])
+        elif kind == "AssignmentExpression" and node_type(node["left"]) == "Identifier":
+            stack.append(node["right"])
+        else:
+            stack.extend(children(node))
+    return names
+
+
+def address_taken(statements):
+    names = set()
+    for statement in statements:
+        for node in walk_expression(statement):
+            if (node_type(node) == "UnaryExpression" and node["operator"] == "&"
+                    and node_type(node["argument"]) == "Identifier"):
+                names.add(node["argument"]["name"])
+    return names
+
+
+def wrap_int(value):
+    # C int arithmetic on the 32-bit targets the generated Java uses.
+    return (value + 2 ** 31) % 2 ** 32 - 2 ** 31
+
+
+def fold_binary(operator, left, right):
+    """Value of `left operator right` for int constants, or None when it
+    cannot be folded (division by zero, non-int literals)."""
+    if type(left) is not int or type(right) is not int:
+        return None
+    if operator == '+':
+        return wrap_int(left + right)
+    if operator == '-':
+        return wrap_int(left - right)
+    if operator == '*':
+        return wrap_int(left * right)
+    if operator in ('/', '%'):
+        if right == 0:
+            return None
+        # C truncates toward zero; the remainder takes the dividend's sign.
+        quotient = abs(left) // abs(right) * (1 if (left < 0) == (right < 0) else -1)
+        return wrap_int(quotient) if operator == '/' else wrap_int(left - right * quotient)
+    if operator == '&':
+        return wrap_int(left & right)
+    if operator == '^':
+        return wrap_int(left ^ right)
+    # Shift counts use their low five bits, as in Java.
+    if operator == '<<':
+        return wrap_int(left << (right & 31))
+    if operator == '>>':
+        return left >> (right & 31)
+    if operator in ('==', '!=', '<', '>', '<=', '>='):
+        return int({'==': left == right, '!=': left != right, '<': left < right,
+                    '>': left > right, '<=': left <= right, '>=': left >= right}[operator])
+    if operator == '&&':
+        return int(bool(left) and bool(right))
+    if operator == '||':
+        return int(bool(left) or bool(right))
+    return None
+
+
+def fold_unary(operator, value):
+    if type(value) is not int:
+        return None
+    if operator == '-':
+        return wrap_int(-value)
+    if operator == '+':
+        return value
+    if operator == '!':
+        return int(not value)
+    return None
+
+
+# Child fields that hold values read by an expression. Assignment and update
+# targets are left out so they are never replaced by constants, and so is
+# the object of a member access: 3.b is not an expression.
+value_fields = {
+    "BinaryExpression": ("left", "right"),
+    "AssignmentExpression": ("right",),
+    "UnaryExpression": ("argument",),
+    "CallExpression": ("arguments",),
+    "ExpressionStatement": ("expression",),
+    "ReturnStatement": ("argument",),
+}
+
+
+class Optimizer:
+    """Straight-line optimizations over each function body: removal of
+    statements after return, constant propagation and folding, dead-store
+    elimination and removal of declarations left unused.
+
+    Level 0 leaves the tree untouched; level 1 runs every pass. The tree is
+    rewritten in place and also returned.
+    """
+
+    def __init__(self, level=1):
+        self.level = level
+
+    def optimize(self, tree):
+        if self.level < 1 or tree is None:
+            return tree
+        for element in tree["body"]:
+            if node_type(element) in ("FunctionDeclaration", "MethodDeclaration"):
+                element["body"] = self.optimize_body(element["body"], element.get("params", []))
+        return tree
+
+    def optimize_body(self, body, params):
+        body = self.remove_unreachable([statement for statement in body if statement is not None])
+        pinned = address_taken(body)
+        # Constants are int literals; a float variable holding one must keep
+        # its float value, so only int variables are propagated.
+        int_names = {param["name"] for param in params if param.get("datatype", param.get("type")) == "int"}
+        body = self.propagate_constants(body, pinned, int_names)
+        local_names = {param["name"] for param in params}
+        local_names.update(statement["name"] for statement in body
+                           if node_type(statement) == "VariableDeclaration")
+        body = self.remove_dead_stores(body, local_names, pinned)
+        return self.remove_unused_declarations(body, pinned)
+
+    def remove_unreachable(self, body):
+        for index, statement in enumerate(body):
+            if node_type(statement) == "ReturnStatement":
+                return body[:index + 1]
+        return body
+
+    def propagate_constants(self, body, pinned, int_names):
+        constants = {}
+        int_names = set(int_names)
+        for statement in body:
+            kind = node_type(statement)
+            if kind == "VariableDeclaration":
+                constants.pop(statement["name"], None)
+                if statement["datatype"] == "int":
+                    int_names.add(statement["name"])
+                else:
+                    int_names.discard(statement["name"])
+                continue
+            simple_store = kind == "AssignmentExpression" and node_type(statement["left"]) == "Identifier"
+            # The right side of a plain store is evaluated before the store,
+            # so only writes nested inside an expression hide its constants.
+            inner_writes = writes(statement["right"] if simple_store else statement)
+            if inner_writes:
+                visible = {name: value for name, value in constants.items() if name not in inner_writes}
+            else:
+                visible = constants
+            self.fold(statement, visible)
+            for name in inner_writes:
+                constants.pop(name, None)
+            if simple_store:
+                name = statement["left"]["name"]
+                constants.pop(name, None)
+                right = statement["right"]
+                if (name not in pinned and name in int_names and node_type(right) == "Literal"
+                        and not inner_writes):
+                    constants[name] = right["value"]
+        return body
+
+    def fold(self, root, constants):
+        """Replaces known variables by their value and folds constant
+        subexpressions below `root`, bottom-up without recursion."""
+        # Pre-order with parent links; reversed, every node comes after its
+        # descendants, so children are already folded when a parent is.
+        order = []
+        stack = [(root, None, None, None)]
+        while stack:
+            entry = stack.pop()
+            order.append(entry)
+            node = entry[0]
+            for field in value_fields.get(node_type(node), ()):
+                value = node[field]
+                if isinstance(value, list):
+                    for index, item in enumerate(value):
+                        if item is not None:
+                            stack.append((item, node, field, index))
+                elif value is not None:
+                    stack.append((value, node, field, None))
+        for node, parent, field, index in reversed(order):
+            replacement = self.fold_node(node, constants)
+            if replacement is node or parent is None:
+                continue
+            if index is None:
+                parent[field] = replacement
+            else:
+                parent[field][index] = replacement
+
+    def fold_node(self, node, constants):
+        kind = node_type(node)
+        if kind == "Identifier":
+            if node["name"] in constants:
+                return new_node(node, "Literal", value=constants[node["name"]])
+        elif kind == "BinaryExpression":
+            left, right = node["left"], node["right"]
+            if node_type(left) == "Literal":
+                if node_type(right) == "Literal":
+                    value = fold_binary(node["operator"], left["value"], right["value"])
+                    if value is not None:
+                        return new_node(node, "Literal", value=value)
+                elif node["operator"] in ('&&', '||') and type(left["value"]) is int:
+                    # 0 && x is 0 and 1 || x is 1; x is never evaluated.
+                    if bool(left["value"]) == (node["operator"] == '||'):
+                        return new_node(node, "Literal", value=int(bool(left["value"])))
+        elif kind == "UnaryExpression":
+            if node_type(node["argument"]) == "Literal":
+                value = fold_unary(node["operator"], node["argument"]["value"])
+                if value is not None:
+                    return new_node(node, "Literal", value=value)
+        return node
+
+    def remove_dead_stores(self, body, local_names, pinned):
+        # Backward liveness over the straight-line body: locals are dead once
+        # the function returns, so a store nobody reads afterwards goes.
+        live = set(pinned)
+        kept = []
+        for statement in reversed(body):
+            kind = node_type(statement)
+            if kind == "AssignmentExpression" and node_type(statement["left"]) == "Identifier":
+                name = statement["left"]["name"]
+                if name in local_names and name not in live and not has_side_effects(statement["right"]):
+                    continue
+                live.discard(name)
+                live |= reads(statement["right"])
+            elif kind == "ExpressionStatement":
+                if not has_side_effects(statement["expression"]):
+                    continue
+                live |= reads(statement["expression"])
+            elif kind == "ReturnStatement":
+                live |= reads(statement["argument"])
+            elif kind != "VariableDeclaration":
+                live |= reads(statement)
+            kept.append(statement)
+        kept.reverse()
+        return kept
+
+    def remove_unused_declarations(self, body, pinned):
+        used = set(pinned)
+        for statement in body:
+            if node_type(statement) != "VariableDeclaration":
+                used.update(node["name"] for node in walk_expression(statement)
+                            if node_type(node) == "Identifier")
+        return [statement for statement in body
+                if node_type(statement) != "VariableDeclaration" or statement["name"] in used]
+
+
+def optimize(tree, level=1):
+    return Optimizer(level).optimize(tree)
+
+
+def add_arguments(argparser):
+    argparser.add_argument("-O", dest="optimization", type=int, choices=[0, 1, 2], default=0, metavar="LEVEL",
+                           help="-O0 disables optimization, -O1 folds constants and removes dead code, "
+                                "-O2 also generates Java through the three-address IR and its passes")
@@ -0,0 +1,101 @@
+import os
+
+from visitor import node_type
+
+# Programs with fewer functions are compiled on the calling thread; pool
+# startup and pickling the chunks would cost more than they save.
+min_parallel_functions = 64
+
+
+def compile_chunk(functions, declared, signatures, optimization, class_name):
+    """One work item: semantic analysis, optimization and Java emission of
+    consecutive `functions`. `declared` lists (name, return type) of every
+    function in the program, so calls resolve as in a whole-program
+    analysis; `signatures` is classfile.function_signatures of
+    the whole program. Returns the Java text of the chunk's methods."""
+    import ir
+    from emitter import JavaEmitter
+    from main import SemanticAnalyzer
+    from optimizer import Optimizer, new_node
+
+    program = new_node(functions[0], "Program", body=functions)
+    analyzer = SemanticAnalyzer(program)
+    for name, return_type in declared:
+        analyzer.symbols.declare(name, "function", return_type)
+    analyzer.analyze()
+    Optimizer(optimization).optimize(program)
+    # Methods sit one level inside the class the caller writes around them.
+    emitter = JavaEmitter(None, class_name)
+    emitter.level = 1
+    emitter.signatures = signatures
+    if optimization >= 2:
+        module, _ = ir.lower(program, signatures=signatures)
+        for function in module.functions:
+            emitter.emit_ir_function(function)
+    else:
+        for function in program["body"]:
+            emitter.emit(function)
+    return emitter.getvalue()
+
+
+def chunks(functions, jobs, chunk_size=None):
+    """(start, end) ranges splitting `functions` into about four chunks per
+    worker, so a chunk of large functions does not leave the others idle."""
+    size = chunk_size or max(1, -(-len(functions) // (jobs * 4)))
+    return [(start, min(start + size, len(functions))) for start in range(0, len(functions), size)]
+
+
+def generate_java_code(tree, sink=None, class_name="MainClass", optimization=0, jobs=None, chunk_size=None,
+                       executor="process"):
+    """Java source for a parsed Program whose functions are analyzed,
+    optimized and emitted as independent chunks on a pool of `jobs`
+    processes (or threads with executor="thread"), then written out in
+    source order. Output and errors match SemanticAnalyzer, optimize and
+    emitter.generate_java_code run one after another; the first error in
+    source order is raised.
+
+    Worker processes get copies of the functions, so unlike the sequential
+    pipeline `tree` itself is left unoptimized. Returns the source, or
+    writes it to `sink` and returns an empty string.
+    """
+    import ir
+    from classfile import function_signatures
+
+    functions = tree["body"]
+    if not functions or any(node_type(function) != "FunctionDeclaration" for function in functions):
+        # Classes and methods from hand-built trees keep the plain pipeline.
+        from emitter import generate_java_code as generate_sequential
+        from main import SemanticAnalyzer
+        from optimizer import optimize
+        SemanticAnalyzer(tree).analyze()
+        tree = optimize(tree, optimization)
+        if optimization >= 2:
+            tree, _ = ir.lower(tree)
+        return generate_sequential(tree, sink, class_name)
+
+    jobs = jobs or os.cpu_count() or 1
+    signatures = function_signatures(functions)
+    if jobs > 1 and len(functions) >= min_parallel_functions:
+        declared = [(function["name"], function.get("returnType")) for function in functions]
+        arguments = [(functions[start:end], declared, signatures, optimization, class_name)
+                     for start, end in chunks(functions, jobs, chunk_size)]
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        pool_class = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+        with pool_class(max_workers=jobs) as pool:
+            # map yields in submission order, so the first failing chunk
+            # raises before any later one.
+            methods = list(pool.map(compile_chunk, *zip(*arguments)))
+    else:
+        methods = [compile_chunk(functions, [], signatures, optimization, class_name)]
+    parts = [f"public class {class_name} {{\n"] + methods + ["}\n"]
+    if sink is None:
+        return "".join(parts)
+    for part in parts:
+        sink.write(part)
+    return ""
+
+
+def add_arguments(argparser):
+    argparser.add_argument("--function-jobs", type=int, default=None, metavar="N",
+                           help="analyze and generate the functions of a file on N processes "
+                                "(default: all cores when a single file is compiled)")
@@ -0,0 +1,454 @@
+import hashlib
+import os
+import pickle
+import re
+
+from main import Lexer, Parser
+
+
+# Preprocessing runs only on sources that have a directive or a comment;
+# anything else goes straight to the Lexer as before.
+preprocessing_pattern = re.compile(r'^[ \t]*#|/[/*]', re.MULTILINE)
+comment_pattern = re.compile(r'//[^\n]*|/\*.*?(?:\*/|\Z)', re.DOTALL)
+not_newline_pattern = re.compile(r'[^\n]')
+directive_pattern = re.compile(r'^[ \t]*#[ \t]*(?P<name>[A-Za-z_]*)(?P<rest>.*)$', re.MULTILINE)
+include_pattern = re.compile(r'^\s*(?:"(?P<local>[^"]+)"|<(?P<system>[^>]+)>)\s*$')
+define_pattern = re.compile(r'^\s*(?P<name>[A-Za-z_][A-Za-z0-9_]*)(?P<function>\()?')
+name_pattern = re.compile(r'^\s*(?P<name>[A-Za-z_][A-Za-z0-9_]*)\s*$')
+# Token kinds a macro name can lex as; 'int' is a TYPE, not an ID.
+name_kinds = {'ID', 'TYPE', 'RETURN'}
+max_include_depth = 200
+
+
+def needs_preprocessing(source_text):
+    return preprocessing_pattern.search(source_text) is not None
+
+
+def blank_comment(mo):
+    # Same length and newlines, so tokens keep their lines and columns.
+    return not_newline_pattern.sub(' ', mo.group())
+
+
+def tokenize(text, path):
+    lexer = Lexer("", streaming=True)
+    try:
+        tokens = list(lexer.tokenize(text))
+    except RuntimeError as e:
+        raise RuntimeError(f"{path}: {e}") from None
+    tokens.pop()
+    return tokens
+
+
+class TokenRun(list):
+    """Tokens between two directives, with the set of names among them so
+    runs that use no macro are copied without looking at each token."""
+
+    def __init__(self, tokens):
+        super().__init__(tokens)
+        self.names = frozenset(token[1] for token in tokens if token[0] in name_kinds)
+
+
+class Directive:
+    __slots__ = ("name", "rest", "line")
+
+    def __init__(self, name, rest, line):
+        self.name = name
+        self.rest = rest
+        self.line = line
+
+
+class Header:
+    """A file split into directives and the token runs between them, as
+    produced by scan(). `guard` is the macro of an include guard wrapping
+    the whole file, if there is one."""
+
+    __slots__ = ("path", "items", "guard")
+
+    def __init__(self, path, items):
+        self.path = path
+        self.items = items
+        self.guard = None
+        directives = [item for item in items if type(item) is Directive]
+        if (len(directives) >= 3 and type(items[0]) is Directive and type(items[-1]) is Directive
+                and items[0].name == "ifndef" and directives[1].name == "define"
+                and items[-1].name == "endif" and closes_first(directives)):
+            guard = items[0].rest.strip()
+            if define_pattern.match(directives[1].rest).group("name") == guard:
+                self.guard = guard
+
+
+def closes_first(directives):
+    """Whether the last directive is the #endif of the first one."""
+    depth = 0
+    for index, directive in enumerate(directives):
+        if directive.name in ("if", "ifdef", "ifndef"):
+            depth += 1
+        elif directive.name == "endif":
+            depth -= 1
+            if depth == 0:
+                return index == len(directives) - 1
+    return False
+
+
+def scan(text, path):
+    """Splits `text` into a Header of Directive items and token lists.
+    Comments become spaces and directive lines (with their backslash
+    continuations) blank lines before the whole file is lexed once, so
+    every token keeps its real line and column."""
+    text = comment_pattern.sub(blank_comment, text)
+    directives = []
+    lines = text.split('\n')
+    line = 1
+    last = 0
+    consumed = 0
+    for mo in directive_pattern.finditer(text):
+        line += text.count('\n', last, mo.start())
+        last = mo.start()
+        if line <= consumed:
+            # A continuation line of the previous directive.
+            continue
+        end = line - 1
+        rest = mo.group("rest")
+        while lines[end].endswith('\\') and end + 1 < len(lines):
+            end += 1
+            rest = rest[:-1] + lines[end]
+        directives.append(Directive(mo.group("name"), rest, line))
+        for number in range(line - 1, end + 1):
+            lines[number] = ""
+        consumed = end + 1
+    tokens = tokenize('\n'.join(lines), path)
+    items = []
+    position = 0
+    for directive in directives:
+        run = position
+        while run < len(tokens) and tokens[run][2] < directive.line:
+            run += 1
+        if run > position:
+            items.append(TokenRun(tokens[position:run]))
+        items.append(directive)
+        position = run
+    if position < len(tokens):
+        items.append(TokenRun(tokens[position:]))
+    return Header(path, items)
+
+
+class HeaderCache:
+    """Headers already read, scanned and parsed, shared by every file of a
+    batch so each header is processed once.
+
+    An entry is keyed by the header path and checked against its
+    modification time and size; when those changed, the file is read again
+    and reused if its hash still matches. Parsed function lists are kept per
+    header and per expanded token sequence (the macros in effect may
+    change what a header expands to), pickled so every user gets its own
+    copy of the nodes to annotate and optimize.
+    """
+
+    def __init__(self):
+        self.headers = {}
+        self.parsed = {}
+        self.dependencies = {}
+        self.hits = 0
+        self.misses = 0
+        self.parse_hits = 0
+
+    def get(self, path):
+        """(Header, digest) for `path`. Raises OSError if it cannot be read."""
+        stat = os.stat(path)
+        entry = self.headers.get(path)
+        if entry is not None and entry[0] == (stat.st_mtime_ns, stat.st_size):
+            self.hits += 1
+            return entry[2], entry[1]
+        with open(path, 'rb') as source:
+            data = source.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if entry is not None and entry[1] == digest:
+            self.hits += 1
+            header = entry[2]
+        else:
+            self.misses += 1
+            header = scan(data.decode(), path)
+            self.parsed.pop(path, None)
+        self.headers[path] = ((stat.st_mtime_ns, stat.st_size), digest, header)
+        return header, digest
+
+    def record(self, c_path, dependencies):
+        """Remembers the headers `c_path` read, for up_to_date()."""
+        self.dependencies[c_path] = list(dependencies)
+
+    def up_to_date(self, c_path):
+        """Whether every header `c_path` read when last recorded still has
+        the same contents."""
+        for path, digest in self.dependencies.get(c_path, ()):
+            try:
+                if self.get(path)[1] != digest:
+                    return False
+            except (OSError, UnicodeDecodeError, RuntimeError):
+                return False
+        return True
+
+    def parse(self, part, compact=False):
+        """Function list of a header part. A part that took no macro
+        substitution is identified by the runs it copied, which stay valid
+        until the header is scanned again; otherwise by its tokens."""
+        path, tokens = part.header, part.tokens
+        if part.expanded:
+            # Positions are part of the key: the tree records them.
+            key = hashlib.sha256(repr([tuple(token) for token in tokens]).encode()).digest()
+        else:
+            key = tuple(part.runs)
+        key = (key, compact)
+        parsed = self.parsed.setdefault(path, {})
+        data = parsed.get(key)
+        if data is not None:
+            self.parse_hits += 1
+            return pickle.loads(data)
+        body = parse_tokens(tokens, compact)
+        parsed[key] = pickle.dumps(body, pickle.HIGHEST_PROTOCOL)
+        return body
+
+
+def parse_tokens(tokens, compact=False):
+    end = tokens[-1][2] if tokens else 1
+    return Parser(Lexer.from_tokens(tokens + [('EOF', 'EOF', end, 1)]), compact).parse()["body"]
+
+
+class Part:
+    """Consecutive tokens that came from one file; `header` is None for the
+    main file. `runs` holds the item index of every token run copied into
+    it and `expanded` whether any of them had macros replaced."""
+
+    __slots__ = ("header", "tokens", "runs", "expanded")
+
+    def __init__(self, header):
+        self.header = header
+        self.tokens = []
+        self.runs = []
+        self.expanded = False
+
+
+class TranslationUnit:
+    """Result of preprocessing one C file: its tokens split into parts by
+    originating file, and the (path, digest) of every header read."""
+
+    def __init__(self, parts, dependencies, separable):
+        self.parts = parts
+        self.dependencies = dependencies
+        # True when every part holds whole function definitions, so parts
+        # can be parsed on their own.
+        self.separable = separable
+
+    def tokens(self):
+        tokens = [token for part in self.parts for token in part.tokens]
+        end = tokens[-1][2] if tokens else 1
+        tokens.append(('EOF', 'EOF', end, 1))
+        return tokens
+
+    def digest(self):
+        """Hash of the headers read, for cache keys of the including file."""
+        digest = hashlib.sha256()
+        for path, header_digest in self.dependencies:
+            digest.update(f"{path}\0{header_digest}\0".encode())
+        return digest.hexdigest()
+
+    def parse(self, cache=None, compact=False):
+        """Program node for the unit. Header parts are parsed through
+        `cache` when given and the parts are separable."""
+        parser = Parser(None, compact)
+        if not self.separable:
+            return Parser(Lexer.from_tokens(self.tokens()), compact).parse()
+        body = []
+        for part in self.parts:
+            if part.header is not None and cache is not None:
+                body.extend(cache.parse(part, compact))
+            elif part.tokens:
+                body.extend(parse_tokens(part.tokens, compact))
+        return parser.node("Program", body=body)
+
+
+class Preprocessor:
+    """Handles #include, object-like #define and #undef, #ifdef, #ifndef,
+    #else, #endif and #pragma once ahead of the Lexer.
+
+    Includes are followed with an explicit stack of open files. A header
+    whose include guard is already defined, or that was marked with
+    #pragma once, is skipped without replaying it.
+    """
+
+    def __init__(self, include_paths=(), cache=None, defines=None):
+        self.include_paths = list(include_paths)
+        self.cache = cache if cache is not None else HeaderCache()
+        self.macros = {}
+        self.once = set()
+        for name, value in (defines or {}).items():
+            self.macros[name] = tokenize(str(value), "<command line>")
+
+    def preprocess(self, source_text, path="<source>"):
+        main = scan(source_text, path)
+        parts = [Part(None)]
+        dependencies = []
+        depth = 0
+        separable = True
+        # Frames are [header, next item, conditional stack]; each
+        # conditional entry is [active, taken, seen #else].
+        stack = [[main, 0, []]]
+        while stack:
+            frame = stack[-1]
+            header, index, conditionals = frame
+            if index == len(header.items):
+                if conditionals:
+                    raise RuntimeError(f"{header.path}: #ifdef or #ifndef without #endif")
+                stack.pop()
+                if stack:
+                    # Back in the including file; the bottom frame is the main file.
+                    returned = stack[-1][0] if len(stack) > 1 else None
+                    depth, separable = self.switch(parts, returned, depth, separable)
+                continue
+            frame[1] += 1
+            item = header.items[index]
+            active = not conditionals or conditionals[-1][0]
+            if type(item) is not Directive:
+                if active:
+                    part = parts[-1]
+                    part.runs.append(index)
+                    if self.expand(item, part.tokens):
+                        part.expanded = True
+                continue
+            included = self.directive(item, header, conditionals, active)
+            if included is not None:
+                included_path, included_header, digest = included
+                dependencies.append((included_path, digest))
+                if len(stack) >= max_include_depth:
+                    raise RuntimeError(f"{header.path}:{item.line}: #include nested too deeply")
+                depth, separable = self.switch(parts, included_header, depth, separable)
+                stack.append([included_header, 0, []])
+        depth, separable = self.switch(parts, None, depth, separable)
+        parts = [part for part in parts if part.tokens]
+        return TranslationUnit(parts, dependencies, separable and depth == 0)
+
+    def switch(self, parts, header, depth, separable):
+        """Starts a new part for tokens from `header` (a Header, or None
+        for the main file) and updates the brace depth and whether every
+        part so far ends on a function boundary."""
+        current = parts[-1]
+        if current.tokens:
+            for token in current.tokens:
+                if token[0] == 'LBRACE':
+                    depth += 1
+                elif token[0] == 'RBRACE':
+                    depth -= 1
+            separable = separable and depth == 0 and current.tokens[-1][0] == 'RBRACE'
+        path = header.path if header is not None else None
+        if current.tokens or current.header != path:
+            if current.tokens:
+                parts.append(Part(path))
+            else:
+                current.header = path
+        return depth, separable
+
+    def expand(self, run, output):
+        """Appends the tokens of `run` to `output` with macros replaced.
+        Returns whether any macro was."""
+        macros = self.macros
+        if run.names.isdisjoint(macros):
+            output.extend(run)
+            return False
+        # Each macro is disabled while its own replacement is read, as in C.
+        stack = [(iter(run), frozenset())]
+        while stack:
+            source, hidden = stack[-1]
+            token = next(source, None)
+            if token is None:
+                stack.pop()
+                continue
+            if token[0] in name_kinds and token[1] in macros and token[1] not in hidden:
+                stack.append((iter(macros[token[1]]), hidden | {token[1]}))
+            else:
+                output.append(token)
+        return True
+
+    def directive(self, directive, header, conditionals, active):
+        """Applies one directive. Returns (path, Header, digest) for an
+        #include to enter, otherwise None."""
+        name = directive.name
+        where = f"{header.path}:{directive.line}"
+        if name in ("ifdef", "ifndef"):
+            mo = name_pattern.match(directive.rest)
+            if mo is None:
+                raise RuntimeError(f"{where}: #{name} needs a macro name")
+            condition = (mo.group("name") in self.macros) == (name == "ifdef")
+            conditionals.append([active and condition, condition, False])
+        elif name == "else":
+            if not conditionals or conditionals[-1][2]:
+                raise RuntimeError(f"{where}: #else without #if")
+            entry = conditionals[-1]
+            parent_active = len(conditionals) == 1 or conditionals[-2][0]
+            entry[0] = parent_active and not entry[1]
+            entry[2] = True
+        elif name == "endif":
+            if not conditionals:
+                raise RuntimeError(f"{where}: #endif without #if")
+            conditionals.pop()
+        elif not active:
+            pass
+        elif name == "define":
+            mo = define_pattern.match(directive.rest)
+            if mo is None:
+                raise RuntimeError(f"{where}: #define needs a macro name")
+            if mo.group("function"):
+                raise RuntimeError(f"{where}: function-like macros are not supported")
+            replacement = tokenize(directive.rest[mo.end():], header.path)
+            self.macros[mo.group("name")] = [(kind, value, directive.line, column)
+                                             for kind, value, _, column in replacement]
+        elif name == "undef":
+            mo = name_pattern.match(directive.rest)
+            if mo is None:
+                raise RuntimeError(f"{where}: #undef needs a macro name")
+            self.macros.pop(mo.group("name"), None)
+        elif name == "include":
+            return self.include(directive, header, where)
+        elif name == "pragma":
+            if directive.rest.strip() == "once":
+                self.once.add(header.path)
+        elif name == "error":
+            raise RuntimeError(f"{where}: #error {directive.rest.strip()}")
+        elif name:
+            raise RuntimeError(f"{where}: unsupported directive #{name}")
+        return None
+
+    def include(self, directive, header, where):
+        mo = include_pattern.match(directive.rest)
+        if mo is None:
+            raise RuntimeError(f"{where}: #include expects \"file\" or <file>")
+        name = mo.group("local") or mo.group("system")
+        directories = list(self.include_paths)
+        if mo.group("local"):
+            directories.insert(0, os.path.dirname(os.path.abspath(header.path)))
+        for directory in directories:
+            path = os.path.normpath(os.path.join(directory, name))
+            if os.path.isfile(path):
+                break
+        else:
+            raise RuntimeError(f"{where}: cannot find include file {name!r}")
+        if path in self.once:
+            return None
+        try:
+            included, digest = self.cache.get(path)
+        except (OSError, UnicodeDecodeError) as e:
+            raise RuntimeError(f"{where}: cannot read {name!r}: {e}") from None
+        if included.guard is not None and included.guard in self.macros:
+            return None
+        return path, included, digest
+
+
+# Shared by every file compiled in this process.
+header_cache = HeaderCache()
+
+
+def preprocess(source_text, path="<source>", include_paths=(), cache=None):
+    return Preprocessor(include_paths, cache).preprocess(source_text, path)
+
+
+def add_arguments(argparser):
+    argparser.add_argument("-I", dest="include_paths", action="append", default=[], metavar="DIR",
+                           help="add DIR to the directories searched for #include files")
@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+
+
+class NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def count(self, **counts):
+        pass
+
+
+null_phase = NullPhase()
+
+
+class NullCollector:
+    """Collector used when profiling is off: phase() hands back one shared
+    no-op context manager, so an instrumented phase costs a function call."""
+    enabled = False
+
+    def phase(self, name):
+        return null_phase
+
+
+class Phase:
+    __slots__ = ("collector", "name", "counts", "start", "cpu_start", "memory_start",
+                 "wall", "cpu", "allocated", "peak", "pid", "tid")
+
+    def __init__(self, collector, name):
+        self.collector = collector
+        self.name = name
+        self.counts = {}
+        self.allocated = None
+        self.peak = None
+
+    def count(self, **counts):
+        self.counts.update(counts)
+
+    def __enter__(self):
+        if self.collector.trace_memory:
+            import tracemalloc
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.cpu_start = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self.start
+        self.cpu = time.process_time() - self.cpu_start
+        if self.collector.trace_memory:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            self.allocated = current - self.memory_start
+            self.peak = peak - self.memory_start
+        self.collector.phases.append(self)
+        return False
+
+    def as_dict(self):
+        record = {"name": self.name, "start": self.start,
+                  "wall": self.wall, "cpu": self.cpu, "pid": self.pid, "tid": self.tid}
+        if self.allocated is not None:
+            record["allocated_bytes"] = self.allocated
+            record["peak_bytes"] = self.peak
+        record.update(self.counts)
+        return record
+
+
+class ProfileCollector:
+    """Records wall time, CPU time, tracemalloc allocations and item counts
+    (tokens, nodes, symbols...) for every phase. Phases may nest."""
+    enabled = True
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.phases = []
+        if trace_memory:
+            # Imported here: with its dependencies tracemalloc costs several
+            # milliseconds of startup that plain timing does not need.
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def phase(self, name):
+        return Phase(self, name)
+
+    def records(self):
+        # perf_counter is a system-wide monotonic clock on Linux, so records
+        # returned by worker processes can be merged into the same list.
+        return [phase.as_dict() for phase in self.phases]
+
+
+def relative(records):
+    origin = min((record["start"] for record in records), default=0)
+    return [dict(record, start=record["start"] - origin) for record in records]
+
+
+def to_json(records):
+    import json
+    return json.dumps({"phases": relative(records)}, indent=2)
+
+
+def to_chrome_trace(records):
+    # Complete ("X") events in microseconds, loadable in chrome://tracing or
+    # Perfetto.
+    import json
+    events = []
+    for record in relative(records):
+        args = {key: value for key, value in record.items()
+                if key not in ("name", "start", "wall", "pid", "tid")}
+        events.append({"name": record["name"], "ph": "X", "ts": record["start"] * 1e6,
+                       "dur": record["wall"] * 1e6, "pid": record["pid"], "tid": record["tid"],
+                       "args": args})
+    return json.dumps({"traceEvents": events})
+
+
+def write(path, format="json", records=None):
+    if records is None:
+        records = collector.records() if collector.enabled else []
+    with open(path, 'w') as output:
+        output.write(to_chrome_trace(records) if format == "chrome" else to_json(records))
+
+
+collector = NullCollector()
+
+
+def enable(trace_memory=True):
+    global collector
+    collector = ProfileCollector(trace_memory)
+    return collector
+
+
+def disable():
+    global collector
+    collector = NullCollector()
+
+
+def phase(name):
+    return collector.phase(name)
+
+
+def count_nodes(tree):
+    from visitor import children
+
+    count = 0
+    stack = [tree] if tree is not None else []
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(children(node))
+    return count
+
+
+def add_arguments(argparser):
+    argparser.add_argument("--profile", metavar="PATH", help="write per-phase timings to PATH")
+    argparser.add_argument("--profile-format", choices=["json", "chrome"], default="json")
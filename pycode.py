@@ -0,0 +1,407 @@
+import math
+import struct
+import sys
+
+from classfile import comparison_operators, expression_types, function_signatures
+from visitor import children, node_type
+
+
+float32 = struct.Struct("f")
+
+
+# Runtime helpers. They give the generated Python the int and float
+# semantics of the JVM, so running in-process prints what the Java class
+# would print.
+
+def to_float(value):
+    """Rounds to the nearest float, like the JVM's i2f and float ops."""
+    return float32.unpack(float32.pack(value))[0]
+
+
+def to_int(value):
+    """f2i: truncates, saturates at the int range and maps NaN to 0."""
+    if value != value:
+        return 0
+    if value >= 2147483647:
+        return 2147483647
+    if value <= -2147483648:
+        return -2147483648
+    return int(value)
+
+
+def int_divide(left, right):
+    if right == 0:
+        raise RuntimeError("java.lang.ArithmeticException: / by zero")
+    quotient = abs(left) // abs(right)
+    if (left < 0) != (right < 0):
+        quotient = -quotient
+    return (quotient + 0x80000000 & 0xFFFFFFFF) - 0x80000000
+
+
+def int_remainder(left, right):
+    if right == 0:
+        raise RuntimeError("java.lang.ArithmeticException: / by zero")
+    remainder = abs(left) % abs(right)
+    return -remainder if left < 0 else remainder
+
+
+def float_divide(left, right):
+    if right == 0:
+        if left != left or left == 0:
+            return math.nan
+        return math.copysign(math.inf, left) * math.copysign(1.0, right)
+    return to_float(left / right)
+
+
+def float_remainder(left, right):
+    if right == 0 or left != left or right != right or math.isinf(left):
+        return math.nan
+    return to_float(math.fmod(left, right))
+
+
+def format_float(value):
+    """Float.toString: the shortest digits that read back as the same
+    float, in plain notation from 10^-3 up to 10^7 and as d.dddEn outside."""
+    if value != value:
+        return "NaN"
+    if math.isinf(value):
+        return "Infinity" if value > 0 else "-Infinity"
+    if value == 0:
+        return "-0.0" if math.copysign(1.0, value) < 0 else "0.0"
+    for precision in range(9):
+        text = f"{value:.{precision}e}"
+        if to_float(float(text)) == value:
+            break
+    mantissa, exponent = text.split("e")
+    exponent = int(exponent)
+    digits = mantissa.lstrip("-").replace(".", "").rstrip("0") or "0"
+    sign = "-" if value < 0 else ""
+    if 1e-3 <= abs(value) < 1e7:
+        if exponent >= 0:
+            integer = digits[:exponent + 1].ljust(exponent + 1, "0")
+            fraction = digits[exponent + 1:] or "0"
+        else:
+            integer = "0"
+            fraction = "0" * (-exponent - 1) + digits
+        return f"{sign}{integer}.{fraction}"
+    return f"{sign}{digits[0]}.{digits[1:] or '0'}E{exponent}"
+
+
+runtime = {
+    "to_float": to_float,
+    "to_int": to_int,
+    "int_divide": int_divide,
+    "int_remainder": int_remainder,
+    "float_divide": float_divide,
+    "float_remainder": float_remainder,
+    "format_float": format_float,
+}
+
+# Python templates per (operand type, operator); ints wrap to 32 bits.
+binary_templates = {
+    ("int", '+'): "({0} + {1} + 0x80000000 & 0xFFFFFFFF) - 0x80000000",
+    ("int", '-'): "({0} - {1} + 0x80000000 & 0xFFFFFFFF) - 0x80000000",
+    ("int", '*'): "({0} * {1} + 0x80000000 & 0xFFFFFFFF) - 0x80000000",
+    ("int", '/'): "int_divide({0}, {1})",
+    ("int", '%'): "int_remainder({0}, {1})",
+    ("int", '&'): "{0} & {1}",
+    # Shift counts use their low five bits, as on the JVM.
+    ("int", '<<'): "(({0} << ({1} & 31)) + 0x80000000 & 0xFFFFFFFF) - 0x80000000",
+    ("int", '>>'): "{0} >> ({1} & 31)",
+    ("int", '^'): "{0} ^ {1}",
+    ("float", '+'): "to_float({0} + {1})",
+    ("float", '-'): "to_float({0} - {1})",
+    ("float", '*'): "to_float({0} * {1})",
+    ("float", '/'): "float_divide({0}, {1})",
+    ("float", '%'): "float_remainder({0}, {1})",
+}
+
+
+def wrap_int(value):
+    return (value + 0x80000000 & 0xFFFFFFFF) - 0x80000000
+
+
+def convert(operand, source, target):
+    if source == target or target == "void":
+        return operand
+    constant = operand.lstrip("-").isdigit()
+    if source == "int" and target == "float":
+        return repr(to_float(int(operand))) if constant else f"to_float({operand})"
+    if source == "float" and target == "int":
+        return f"to_int({operand})"
+    raise RuntimeError(f"Cannot convert {source} to {target}")
+
+
+def writes_variables(root):
+    # The store of an assignment at the root happens after every read.
+    stack = [root["right"]] if node_type(root) == "AssignmentExpression" else [root]
+    while stack:
+        node = stack.pop()
+        if node_type(node) in ("AssignmentExpression", "UpdateExpression"):
+            return True
+        stack.extend(children(node))
+    return False
+
+
+class PythonTranslator:
+    """Lowers a program of C functions to Python source. Every operator
+    result goes to a temporary, so the generated code is flat however deep
+    the C expression is, and && / || become if blocks. Variables are
+    prefixed with v_ and functions with f_ to keep clear of Python names."""
+
+    def __init__(self):
+        self.signatures = {}
+        self.lines = []
+
+    def translate(self, tree):
+        functions = [element for element in tree["body"] if node_type(element) == "FunctionDeclaration"]
+        if len(functions) != len(tree["body"]):
+            raise RuntimeError("Only programs made of C functions can be run")
+        self.signatures.update(function_signatures(functions))
+        for function in functions:
+            FunctionTranslator(self, function).translate()
+        return "\n".join(self.lines) + "\n"
+
+
+class FunctionTranslator:
+    def __init__(self, program, function):
+        self.program = program
+        self.lines = program.lines
+        self.function = function
+        self.is_main = function["name"] == "main"
+        self.return_type, param_types = program.signatures[function["name"]]
+        self.locals = {} if self.is_main else {param["name"]: type for param, type in
+                                               zip(function["params"], param_types)}
+        self.indent = 1
+        self.temporaries = 0
+
+    def emit(self, line):
+        self.lines.append("    " * self.indent + line)
+
+    def temporary(self):
+        self.temporaries += 1
+        return f"t{self.temporaries}"
+
+    def local_type(self, name):
+        if name not in self.locals:
+            raise RuntimeError(f"Undeclared identifier '{name}'")
+        return self.locals[name]
+
+    def return_type_of(self, name):
+        signature = self.program.signatures.get(name)
+        return signature[0] if signature else None
+
+    def translate(self):
+        params = "" if self.is_main else ", ".join("v_" + param["name"] for param in self.function["params"])
+        self.lines.append(f"def f_{self.function['name']}({params}):")
+        returned = False
+        for statement in self.function["body"]:
+            if statement is None:
+                continue
+            self.statement(statement)
+            if node_type(statement) == "ReturnStatement":
+                returned = True
+                break
+        if not returned:
+            # C lets control reach the end of a non-void function; return 0.
+            if self.return_type == "int":
+                self.emit("return 0")
+            elif self.return_type == "float":
+                self.emit("return 0.0")
+            else:
+                self.emit("return")
+
+    def statement(self, node):
+        kind = node_type(node)
+        if kind == "VariableDeclaration":
+            type = node["datatype"]
+            if type not in ("int", "float"):
+                raise RuntimeError(f"Unsupported type {type}")
+            self.locals[node["name"]] = type
+            self.emit(f"v_{node['name']} = {'0' if type == 'int' else '0.0'}")
+        elif kind == "ReturnStatement":
+            argument = node["argument"]
+            if argument is None:
+                self.emit("return")
+            elif self.is_main:
+                value, type = self.expression(argument)
+                if type == "void":
+                    raise RuntimeError("Cannot print the result of a void call")
+                text = f"str({value})" if type == "int" else f"format_float({value})"
+                self.emit(f"write({text} + '\\n')")
+                self.emit("return")
+            elif self.return_type == "void":
+                self.expression(argument)
+                self.emit("return")
+            else:
+                value, type = self.expression(argument)
+                self.emit(f"return {convert(value, type, self.return_type)}")
+        elif kind == "AssignmentExpression":
+            self.expression(node)
+        elif kind == "ExpressionStatement":
+            self.expression(node["expression"])
+        else:
+            raise RuntimeError(f"Cannot run statement {kind}")
+
+    def expression(self, root):
+        """Emits the lines computing `root` and returns (operand, type),
+        where operand is a Python name or constant holding the value.
+        Walks an explicit work stack, like the class file backend, so deep
+        expressions do not recurse."""
+        types = expression_types(root, self.local_type, self.return_type_of)
+        # With writes inside the expression, a variable read must be copied
+        # before a later operand changes it.
+        copy_reads = writes_variables(root)
+        values = []
+        work = [("node", root)]
+        while work:
+            action, argument = work.pop()
+            if action == "node":
+                work.extend(reversed(self.expand(argument, types, copy_reads)))
+            else:
+                action(values, *argument)
+        return values.pop(), types[id(root)]
+
+    def result(self, values, text):
+        target = self.temporary()
+        self.emit(f"{target} = {text}")
+        values.append(target)
+
+    def expand(self, node, types, copy_reads):
+        kind = node_type(node)
+        if kind == "Literal":
+            value = node["value"]
+            value = wrap_int(value) if isinstance(value, int) else to_float(value)
+            return [(lambda values: values.append(repr(value)), ())]
+        if kind == "Identifier":
+            name = "v_" + node["name"]
+            if copy_reads:
+                return [(self.result, (name,))]
+            return [(lambda values: values.append(name), ())]
+        if kind == "AssignmentExpression":
+            name = "v_" + node["left"]["name"]
+            target_type = types[id(node)]
+            right_type = types[id(node["right"])]
+
+            def assign(values):
+                value = convert(values.pop(), right_type, target_type)
+                if copy_reads:
+                    target = self.temporary()
+                    self.emit(f"{target} = {name} = {value}")
+                    values.append(target)
+                else:
+                    self.emit(f"{name} = {value}")
+                    values.append(name)
+            return [("node", node["right"]), (assign, ())]
+        if kind == "UpdateExpression":
+            name = "v_" + node["argument"]["name"]
+            type = types[id(node)]
+            operator = '+' if node["operator"] == '++' else '-'
+            step = binary_templates[(type, operator)].format(name, "1" if type == "int" else "1.0")
+
+            def update(values):
+                if node["prefix"]:
+                    self.emit(f"{name} = {step}")
+                    self.result(values, name)
+                else:
+                    self.result(values, name)
+                    self.emit(f"{name} = {step}")
+            return [(update, ())]
+        if kind == "CallExpression":
+            name = node["callee"]["name"]
+            return_type, param_types = self.program.signatures[name]
+            arguments = node["arguments"]
+            if len(param_types) != len(arguments):
+                raise RuntimeError(f"'{name}' expects {len(param_types)} arguments")
+            argument_types = [types[id(argument)] for argument in arguments]
+
+            def call(values):
+                operands = values[len(values) - len(arguments):]
+                del values[len(values) - len(arguments):]
+                text = ", ".join(convert(operand, source, target) for operand, source, target in
+                                 zip(operands, argument_types, param_types))
+                if return_type == "void":
+                    self.emit(f"f_{name}({text})")
+                    values.append("None")
+                else:
+                    self.result(values, f"f_{name}({text})")
+            return [("node", argument) for argument in arguments] + [(call, ())]
+        if kind == "UnaryExpression":
+            operator = node["operator"]
+            type = types[id(node["argument"])]
+            if operator == '+':
+                return [("node", node["argument"])]
+            if operator == '-':
+                template = "(-{0} + 0x80000000 & 0xFFFFFFFF) - 0x80000000" if type == "int" else "-{0}"
+            elif operator == '!':
+                template = "0 if {0} else 1"
+            else:
+                raise RuntimeError(f"Cannot run unary '{operator}'")
+            return [("node", node["argument"]),
+                    (lambda values: self.result(values, template.format(values.pop())), ())]
+        if kind == "BinaryExpression":
+            operator = node["operator"]
+            left, right = node["left"], node["right"]
+            if operator in ('&&', '||'):
+                return self.short_circuit(operator, left, right)
+            operand_type = "float" if "float" in (types[id(left)], types[id(right)]) else "int"
+            left_type, right_type = types[id(left)], types[id(right)]
+            if operator in comparison_operators:
+                template = f"1 if {{0}} {operator} {{1}} else 0"
+            elif (operand_type, operator) in binary_templates:
+                template = binary_templates[(operand_type, operator)]
+            else:
+                raise RuntimeError(f"Cannot run {operand_type} '{operator}'")
+
+            def binary(values):
+                right_value = convert(values.pop(), right_type, operand_type)
+                left_value = convert(values.pop(), left_type, operand_type)
+                self.result(values, template.format(left_value, right_value))
+            return [("node", left), ("node", right), (binary, ())]
+        raise RuntimeError(f"Cannot run expression {kind}")
+
+    def short_circuit(self, operator, left, right):
+        target = self.temporary()
+
+        def open_block(values):
+            condition = values.pop()
+            if operator == '&&':
+                self.emit(f"{target} = 0")
+                self.emit(f"if {condition}:")
+            else:
+                self.emit(f"{target} = 1")
+                self.emit(f"if not {condition}:")
+            self.indent += 1
+
+        def close_block(values):
+            self.emit(f"{target} = 1 if {values.pop()} else 0")
+            self.indent -= 1
+            values.append(target)
+        return [("node", left), (open_block, ()), ("node", right), (close_block, ())]
+
+
+def translate(tree):
+    """Returns the Python source for `tree`."""
+    return PythonTranslator().translate(tree)
+
+
+def compile_program(tree, filename="<program>"):
+    """Compiles `tree` to a code object defining one f_<name> per function."""
+    return compile(translate(tree), filename, "exec")
+
+
+def run(program, out=None):
+    """Runs C main in-process and writes what System.out.println would
+    print to `out` (stdout by default). `program` is an analyzed AST or a
+    code object from compile_program."""
+    if not hasattr(program, "co_code"):
+        program = compile_program(program)
+    out = out or sys.stdout
+    namespace = dict(runtime, write=out.write)
+    exec(program, namespace)
+    if "f_main" not in namespace:
+        raise RuntimeError("No main function to run")
+    try:
+        namespace["f_main"]()
+    except RecursionError:
+        raise RuntimeError("java.lang.StackOverflowError") from None
@@ -0,0 +1,87 @@
+import sys
+
+
+class Symbol:
+    __slots__ = ("name", "kind", "datatype", "line", "column", "scope")
+
+    def __init__(self, name, kind, datatype=None, line=None, column=None, scope=None):
+        self.name = name
+        self.kind = kind
+        self.datatype = datatype
+        self.line = line
+        self.column = column
+        self.scope = scope
+
+    def __repr__(self):
+        position = f" at {self.line}:{self.column}" if self.line is not None else ""
+        datatype = f" {self.datatype}" if self.datatype is not None else ""
+        return f"<{self.kind}{datatype} {self.name!r}{position}>"
+
+
+class Scope:
+    __slots__ = ("kind", "name", "parent", "symbols")
+
+    def __init__(self, kind, name=None, parent=None):
+        self.kind = kind
+        self.name = name
+        self.parent = parent
+        self.symbols = {}
+
+    def lookup(self, name):
+        scope = self
+        while scope is not None:
+            symbol = scope.symbols.get(name)
+            if symbol is not None:
+                return symbol
+            scope = scope.parent
+        return None
+
+
+class SymbolTable:
+    """Chained scopes (global -> function -> block) backed by dicts.
+
+    Names are interned on insertion, so lookups hash once and compare by
+    identity. A name declared twice in the same scope keeps the position of
+    its first occurrence.
+    """
+
+    def __init__(self):
+        self.global_scope = Scope("global")
+        self.current_scope = self.global_scope
+        self.order = []
+
+    def enter_scope(self, kind, name=None):
+        self.current_scope = Scope(kind, name, self.current_scope)
+        return self.current_scope
+
+    def exit_scope(self):
+        if self.current_scope.parent is None:
+            raise RuntimeError("Cannot leave the global scope")
+        scope = self.current_scope
+        self.current_scope = scope.parent
+        return scope
+
+    def declare(self, name, kind, datatype=None, line=None, column=None):
+        symbols = self.current_scope.symbols
+        symbol = symbols.get(name)
+        if symbol is None:
+            name = sys.intern(name)
+            symbol = Symbol(name, kind, datatype, line, column, self.current_scope)
+            symbols[name] = symbol
+            self.order.append(symbol)
+        return symbol
+
+    def is_declared_locally(self, name):
+        return name in self.current_scope.symbols
+
+    def lookup(self, name):
+        return self.current_scope.lookup(name)
+
+    def __contains__(self, name):
+        return self.current_scope.lookup(name) is not None
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __len__(self):
+        return len(self.order)
@@ -0,0 +1,50 @@
+"""Round trips through the binary AST format, eager and lazy."""
+import pickle
+
+import pytest
+
+import ast_binary
+from main import Lexer, Parser, SemanticAnalyzer
+from optimizer import optimize
+
+source_text = """int f(int a, float b) {
+    int c;
+    c = a * 2 + 1;
+    c += -a;
+    return c;
+}
+int main() {
+    int x;
+    x = 3000000000 / 2;
+    return f(x, 2) && !x;
+}
+"""
+
+
+def parsed(compact=False):
+    return Parser(Lexer(source_text), compact).parse()
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_eager_load_gives_the_dict_tree(compact):
+    tree = parsed(compact)
+    expected = tree.to_dict() if compact else tree
+    assert ast_binary.loads(ast_binary.dumps(tree), lazy=False) == expected
+
+
+def test_lazy_load_matches_the_compact_tree(tmp_path):
+    path = tmp_path / "tree.bin"
+    with open(path, 'wb') as out:
+        ast_binary.dump(parsed(), out)
+    tree = ast_binary.load(str(path))
+    assert tree.to_dict() == parsed()
+    # Decoded fields are stored, so reads return the same objects.
+    assert tree.body[0] is tree.body[0]
+    assert pickle.loads(pickle.dumps(tree)) == parsed(compact=True)
+
+
+def test_lazy_tree_can_be_analyzed_and_optimized():
+    tree = ast_binary.loads(ast_binary.dumps(parsed()))
+    SemanticAnalyzer(tree).analyze()
+    optimized = optimize(tree, 1)
+    assert optimized.body[1].body[-1]["type"] == "ReturnStatement"
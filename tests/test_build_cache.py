@@ -0,0 +1,62 @@
+"""BuildCache keys, hits and misses, eviction, and javac_batch.build's use
+of it."""
+import os
+
+import build_cache
+from build_cache import BuildCache
+from javac_batch import JavacBatch, build
+
+source_text = "int main() { int a; a = 2; return a * 3; }"
+
+
+def test_key_depends_on_source_options_and_version(tmp_path):
+    cache = BuildCache(str(tmp_path), version="1")
+    key = cache.key(source_text, "-O0")
+    assert cache.key(source_text, "-O0") == key
+    assert cache.key(source_text, "-O1") != key
+    assert cache.key(source_text + " ", "-O0") != key
+    assert BuildCache(str(tmp_path), version="2").key(source_text, "-O0") != key
+
+
+def test_version_covers_the_modules_that_shape_outputs():
+    base = os.path.dirname(os.path.abspath(build_cache.__file__))
+    assert {"javac_batch.py", "parallel.py", "driver.py", "emitter.py"} <= set(build_cache.pipeline_modules)
+    assert all(os.path.exists(os.path.join(base, module)) for module in build_cache.pipeline_modules)
+
+
+def test_hit_and_miss(tmp_path):
+    cache = BuildCache(str(tmp_path))
+    key = cache.key(source_text)
+    assert cache.get(key, "A.java") is None
+    cache.put(key, "A.java", b"class A {}")
+    assert cache.get(key, "A.java") == b"class A {}"
+    cache.store(key, "tokens", [("ID", "a")])
+    assert cache.load(key, "tokens") == [("ID", "a")]
+    assert cache.load_tree(key) is None
+
+
+def test_evict_drops_least_recently_used(tmp_path):
+    cache = BuildCache(str(tmp_path), max_bytes=150)
+    keys = [cache.key(str(n)) for n in range(3)]
+    for age, key in enumerate(keys):
+        cache.put(key, "data", b"x" * 60)
+        os.utime(cache.entry(key), (age, age))
+    cache.get(keys[0], "data")  # now the most recently used
+    cache.evict()
+    assert [cache.get(key, "data") is not None for key in keys] == [True, False, True]
+
+
+def test_build_reuses_cached_artifacts(tmp_path):
+    cache = BuildCache(str(tmp_path / "cache"))
+    c_path = str(tmp_path / "a.c")
+    for optimization in (0, 1, 2):
+        batch = JavacBatch(str(tmp_path / "out"))
+        key, cached = build(c_path, source_text, batch, cache, optimization)
+        java_source = cache.get(key, "A.java")
+        assert not cached and java_source is not None
+        assert cache.load_tree(key) is not None
+        # A second build takes the Java source from the cache.
+        again = JavacBatch(str(tmp_path / "out"))
+        assert build(c_path, source_text, again, cache, optimization) == (key, False)
+        with open(os.path.join(str(tmp_path / "out"), "A.java"), 'rb') as java_file:
+            assert java_file.read() == java_source
@@ -0,0 +1,34 @@
+"""remover_comentarios must give the same text whatever the block size."""
+import io
+
+import pytest
+
+from benchmarks import new_path  # noqa: F401  (puts new/ on sys.path for utils)
+from utils import remover_comentarios
+
+programa = ('int a; // linha "com aspas"\n'
+            '/* bloco\n   de /* várias */ linhas */ int b;\n'
+            'char *s = "não // é /* comentário */";\n'
+            "char c = '/'; char d = '\\''; int e = 4 / 2;\n"
+            'x = "escape \\" // ainda texto";\n'
+            '/* sem fim')
+esperado = ('int a; \n'
+            ' \n linhas */ int b;\n'
+            'char *s = "não // é /* comentário */";\n'
+            "char c = '/'; char d = '\\''; int e = 4 / 2;\n"
+            'x = "escape \\" // ainda texto";\n'
+            ' ')
+
+
+def remover(texto, tamanho_bloco):
+    return "".join(remover_comentarios(io.StringIO(texto), tamanho_bloco))
+
+
+def test_whole_text():
+    assert remover(programa, 1 << 20) == esperado
+
+
+@pytest.mark.parametrize("tamanho_bloco", [1, 2, 3, 5, 7, 16])
+def test_block_boundaries(tamanho_bloco):
+    assert remover(programa, tamanho_bloco) == esperado
+    assert remover(programa, tamanho_bloco).count("\n") == esperado.count("\n")
@@ -0,0 +1,55 @@
+"""Reuse of outputs by the compiler server between requests."""
+import daemon
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def compile_one(service, c_path, output_dir, **options):
+    [result] = service.compile([c_path], output_dir, **options)
+    return result
+
+
+def test_unchanged_file_is_reused(tmp_path):
+    service = daemon.CompilerService()
+    c_path = write(tmp_path / "a.c", "int main() { return 1; }")
+    output_dir = str(tmp_path / "out")
+    first = compile_one(service, c_path, output_dir)
+    assert first["error"] is None and not first["cached"]
+    second = compile_one(service, c_path, output_dir)
+    assert second["cached"] and second["output"] == first["output"]
+    assert service.stats()["reused"] == 1
+
+
+def test_edited_or_deleted_output_is_recompiled(tmp_path):
+    service = daemon.CompilerService()
+    c_path = write(tmp_path / "a.c", "int main() { return 1; }")
+    output_dir = str(tmp_path / "out")
+    output = compile_one(service, c_path, output_dir)["output"]
+    write(tmp_path / "a.c", "int main() { return 2; }")
+    assert not compile_one(service, c_path, output_dir)["cached"]
+    (tmp_path / "out" / "A.java").unlink()
+    assert not compile_one(service, c_path, output_dir)["cached"]
+    assert "println(2)" in open(output).read()
+
+
+def test_options_are_part_of_the_key(tmp_path):
+    service = daemon.CompilerService()
+    c_path = write(tmp_path / "a.c", "int main() { return 1; }")
+    output_dir = str(tmp_path / "out")
+    compile_one(service, c_path, output_dir)
+    assert not compile_one(service, c_path, output_dir, optimization=1)["cached"]
+    # Without javac there is no .class file, so a javac request compiles.
+    assert not compile_one(service, c_path, output_dir, javac=True)["cached"]
+
+
+def test_failures_are_per_file_results(tmp_path):
+    service = daemon.CompilerService()
+    good = write(tmp_path / "a.c", "int main() { return 1; }")
+    bad = write(tmp_path / "b.c", "int main( { }")
+    results = {result["file"]: result for result in service.compile([good, bad], str(tmp_path / "out"))}
+    assert results[good]["error"] is None
+    assert results[bad]["error"] is not None and results[bad]["output"] is None
+    assert daemon.print_results(list(results.values()), 0.0) == 1
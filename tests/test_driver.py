@@ -0,0 +1,35 @@
+"""The multi-file driver: per-file errors and the build cache."""
+import driver
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return str(path)
+
+
+def test_errors_are_reported_per_file(tmp_path, capsys):
+    good = write(tmp_path / "x" / "a.c", "int main() { return 1; }")
+    other = write(tmp_path / "y" / "a.c", "int main() { return 2; }")
+    bad = write(tmp_path / "bad.c", "int main( { }")
+    status = driver.main([good, other, bad, "-j", "2", "-d", str(tmp_path / "out"), "--no-cache"])
+    err = capsys.readouterr().err
+    assert status == 1
+    assert f"{other}: output: class A is already generated from {good}" in err
+    assert f"{bad}: analyze:" in err
+    assert (tmp_path / "out" / "A.java").read_text().count("println(1)") == 1
+
+
+def test_outputs_come_from_the_cache(tmp_path):
+    c_path = write(tmp_path / "a.c", "int main() { return 1; }")
+    output_dir = str(tmp_path / "out")
+    (tmp_path / "out").mkdir()
+    cache_dir = str(tmp_path / "cache")
+    for backend in ("java", "classfile"):
+        first = driver.compile_file(c_path, output_dir, backend=backend, cache_dir=cache_dir)
+        second = driver.compile_file(c_path, output_dir, backend=backend, cache_dir=cache_dir)
+        assert first[2] is None and second[2] is None
+        assert "codegen" in first[3] and "codegen" not in second[3]
+        assert second[1] == first[1]
+    # A different -O level is a different entry.
+    assert "codegen" in driver.compile_file(c_path, output_dir, optimization=1, cache_dir=cache_dir)[3]
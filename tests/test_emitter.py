@@ -0,0 +1,50 @@
+"""Java text generated from the AST, at -O0 and -O1, and from the IR."""
+import pytest
+
+import ir
+from main import Lexer, Parser, SemanticAnalyzer, generate_java_code
+from optimizer import optimize
+
+
+def java(source_text, level=0):
+    tree = Parser(Lexer(source_text)).parse()
+    SemanticAnalyzer(tree).analyze()
+    tree = optimize(tree, level)
+    if level >= 2:
+        tree, _ = ir.lower(tree)
+    return generate_java_code(tree)
+
+
+@pytest.mark.parametrize("level", [0, 1, 2])
+def test_return_without_value(level):
+    source = java("void g() { return; } int main() { g(); return; }", level)
+    assert "public static void g() {" in source
+    assert "System.out.println" not in source
+    assert source.count("return;") == 2
+
+
+def test_conditions_become_int_values():
+    source = java("int main() { int a; int b; b = 3; a = b < 10; a = a && b; a = !a; return a; }")
+    assert "a = (b < 10) ? 1 : 0;" in source
+    assert "a = ((a != 0) && (b != 0)) ? 1 : 0;" in source
+    assert "a = (a == 0) ? 1 : 0;" in source
+
+
+def test_float_to_int_is_cast():
+    source = java("int f(int x) { return x; } "
+                  "int main() { int a; float q; q = 7; q = q / 2; a = q; return f(q); }")
+    assert "a = (int) q;" in source
+    assert "f((int) q)" in source
+
+
+@pytest.mark.parametrize("level", [0, 1, 2])
+def test_shift_and_xor_assignments(level):
+    from classfile import generate_class_file
+
+    source_text = "int main() { int a; int b; a = 5; b = 2; a <<= b; a >>= 1; a ^= b; return a; }"
+    if level == 0:
+        source = java(source_text)
+        assert "a = a << b;" in source and "a = a >> 1;" in source and "a = a ^ b;" in source
+    tree = Parser(Lexer(source_text)).parse()
+    SemanticAnalyzer(tree).analyze()
+    assert generate_class_file(optimize(tree, level)).startswith(b"\xca\xfe\xba\xbe")
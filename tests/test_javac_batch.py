@@ -0,0 +1,83 @@
+"""javac_batch: class names, diagnostics mapped back to C files, and
+batching, with a stand-in javac script."""
+import os
+import stat
+import sys
+
+import pytest
+
+from javac_batch import JavacBatch, class_name_for
+
+
+def test_class_names():
+    assert class_name_for("dir/teste1.c") == "Teste1"
+    assert class_name_for("my-file_name.c") == "MyFileName"
+    assert class_name_for("1st.c") == "C1st"
+
+
+def registered(tmp_path, *c_paths, **options):
+    batch = JavacBatch(str(tmp_path / "out"), **options)
+    java_paths = [batch.register(c_path)[1] for c_path in c_paths]
+    return batch, java_paths
+
+
+def test_diagnostics_map_to_c_files(tmp_path):
+    batch, (a_java, b_java) = registered(tmp_path, "src/a.c", "src/b.c")
+    output = "\n".join([
+        f"{a_java}:3: error: incompatible types: boolean cannot be converted to int",
+        "        a = b < 10;",
+        "              ^",
+        f"{b_java}:7: warning: [removal] something",
+        "/elsewhere/Other.java:1: error: not ours",
+        "2 errors",
+        "1 warning",
+    ])
+    diagnostics = list(batch.parse_diagnostics(output))
+    assert [(d.source, d.line, d.kind) for d in diagnostics] == [("src/a.c", 3, "error"), ("src/b.c", 7, "warning")]
+    assert diagnostics[0].message.splitlines() == ["incompatible types: boolean cannot be converted to int",
+                                                   "        a = b < 10;", "              ^"]
+    assert "not ours" in diagnostics[1].message and "2 errors" not in diagnostics[1].message
+
+
+def test_collisions_are_rejected(tmp_path):
+    batch, _ = registered(tmp_path, "x/a.c")
+    with pytest.raises(RuntimeError, match="both map to class A"):
+        batch.register("y/a.c")
+
+
+def fake_javac(tmp_path, stderr, status, failing=None):
+    """A javac that records its arguments, and prints `stderr` and exits with
+    `status` when it is given `failing` (a Java file name) or always when
+    `failing` is None. PATH in `stderr` becomes the file's path."""
+    script = tmp_path / "javac"
+    log = tmp_path / "calls"
+    script.write_text(f"#!{sys.executable}\n"
+                      "import sys\n"
+                      f"open({str(log)!r}, 'a').write(' '.join(sys.argv[1:]) + '\\n')\n"
+                      f"paths = [arg for arg in sys.argv[3:] if {failing!r} in (None, arg.rsplit('/', 1)[-1])]\n"
+                      "if paths:\n"
+                      f"    sys.stderr.write({stderr!r}.replace('PATH', paths[0]))\n"
+                      f"    sys.exit({status})\n")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return str(script), log
+
+
+@pytest.mark.skipif(os.name != "posix", reason="uses an executable script as javac")
+def test_compile_batches_and_collects_diagnostics(tmp_path):
+    javac, log = fake_javac(tmp_path, "PATH:2: error: cannot find symbol\n1 error\n", 1, "B.java")
+    batch, _ = registered(tmp_path, "a.c", "b.c", "c.c", chunk_size=2, javac=javac)
+    diagnostics = batch.compile()
+    assert len(log.read_text().splitlines()) == 2
+    assert {c_path: [d.line for d in found] for c_path, found in diagnostics.items()} == {
+        "a.c": [], "b.c": [2], "c.c": []}
+
+
+@pytest.mark.skipif(os.name != "posix", reason="uses an executable script as javac")
+def test_failures_without_diagnostics_raise(tmp_path):
+    javac, _ = fake_javac(tmp_path, "javac: invalid flag\n", 2)
+    batch, _ = registered(tmp_path, "a.c", javac=javac)
+    with pytest.raises(RuntimeError, match="javac failed: javac: invalid flag"):
+        batch.compile()
+    missing, _ = registered(tmp_path / "other", "a.c", javac=str(tmp_path / "no-such-javac"))
+    with pytest.raises(RuntimeError, match="not found"):
+        missing.compile()
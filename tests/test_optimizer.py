@@ -0,0 +1,183 @@
+"""Differential tests for the optimizer and the IR passes: a program must
+print the same thing at every -O level.
+
+-O0 and -O1 are run in-process with pycode. The IR has no backend that runs
+here, so it is checked with a small interpreter below, once as built and
+once after the default passes.
+"""
+import io
+import random
+
+import pytest
+
+import ir
+import pycode
+from main import Lexer, Parser, SemanticAnalyzer, generate_java_code
+from optimizer import optimize
+
+
+def analyzed(source_text):
+    tree = Parser(Lexer(source_text)).parse()
+    SemanticAnalyzer(tree).analyze()
+    return tree
+
+
+def run_ast(source_text, level):
+    out = io.StringIO()
+    pycode.run(optimize(analyzed(source_text), level), out)
+    return out.getvalue()
+
+
+def binary(operator, left, right):
+    if operator in pycode.comparison_operators:
+        return int({'<': left < right, '>': left > right, '<=': left <= right, '>=': left >= right,
+                    '==': left == right, '!=': left != right}[operator])
+    if type(left) is float or type(right) is float:
+        return {'+': lambda: pycode.to_float(left + right), '-': lambda: pycode.to_float(left - right),
+                '*': lambda: pycode.to_float(left * right), '/': lambda: pycode.float_divide(left, right),
+                '%': lambda: pycode.float_remainder(left, right)}[operator]()
+    return {'+': lambda: pycode.wrap_int(left + right), '-': lambda: pycode.wrap_int(left - right),
+            '*': lambda: pycode.wrap_int(left * right), '/': lambda: pycode.int_divide(left, right),
+            '%': lambda: pycode.int_remainder(left, right), '&': lambda: left & right,
+            '^': lambda: left ^ right, '<<': lambda: pycode.wrap_int(left << (right & 31)),
+            '>>': lambda: left >> (right & 31)}[operator]()
+
+
+def run_ir(module):
+    """What the Java class for `module` would print: main's return value."""
+    functions = {function.name: function for function in module.functions}
+
+    def call(function, args):
+        values = dict(zip([name for name, _ in function.params], args))
+        block = function.blocks[0]
+        while True:
+            for instruction in block.instructions:
+                # Java locals start at zero.
+                operands = [values.get(arg, 0) if type(arg) is str else arg for arg in instruction.args]
+                op = instruction.op
+                if op == "copy":
+                    values[instruction.target] = operands[0]
+                elif op == "binary":
+                    values[instruction.target] = binary(instruction.operator, *operands)
+                elif op == "unary":
+                    value = operands[0]
+                    if instruction.operator == '!':
+                        values[instruction.target] = int(value == 0)
+                    else:
+                        values[instruction.target] = pycode.to_float(-value) if type(value) is float \
+                            else pycode.wrap_int(-value)
+                elif op == "convert":
+                    values[instruction.target] = ir.convert_constant(operands[0], function.types[instruction.target])
+                elif op == "call":
+                    result = call(functions[instruction.operator], operands)
+                    if instruction.target is not None:
+                        values[instruction.target] = result
+                elif op == "return":
+                    return operands[0] if operands else None
+                elif op == "jump":
+                    block = instruction.targets[0]
+                    break
+                elif op == "branch":
+                    block = instruction.targets[0] if operands[0] != 0 else instruction.targets[1]
+                    break
+
+    result = call(functions["main"], [])
+    if result is None:
+        return ""
+    return (pycode.format_float(result) if type(result) is float else str(result)) + "\n"
+
+
+def run_lowered(source_text, passes):
+    tree = optimize(analyzed(source_text), 2)
+    module, _ = ir.lower(tree, passes)
+    return run_ir(module)
+
+
+def generate_program(seed, functions=4, statements=12):
+    """Straight-line C with compound and nested assignments, increments,
+    logical operators and calls, where stores are easy to misjudge dead."""
+    rng = random.Random(seed)
+    parts = []
+    defined = []
+    for f in range(functions):
+        name = "main" if f == functions - 1 else f"f{f}"
+        params = [] if name == "main" else [f"p{i}" for i in range(rng.randint(0, 2))]
+        variables = list(params)
+        parts.append(f"int {name}({', '.join('int ' + param for param in params)}) {{\n")
+        for s in range(3):
+            variables.append(f"v{s}")
+            parts.append(f"    int v{s};\n    v{s} = {rng.randint(-9, 9)};\n")
+
+        def operand():
+            choice = rng.random()
+            if choice < 0.5:
+                return rng.choice(variables)
+            if choice < 0.8 or not defined:
+                return str(rng.randint(0, 20))
+            callee, arity = rng.choice(defined)
+            return f"{callee}({', '.join(rng.choice(variables) for _ in range(arity))})"
+
+        def expression(depth=0):
+            choice = rng.random()
+            if depth > 2 or choice < 0.3:
+                return operand()
+            if choice < 0.5:
+                return f"({rng.choice(variables)} {rng.choice(['+=', '-=', '*=', '=', '<<=', '>>=', '^='])} {expression(depth + 1)})"
+            if choice < 0.6:
+                return f"{rng.choice(['++', '--'])}{rng.choice(variables)}"
+            if choice < 0.7:
+                return f"!{operand()}"
+            operator = rng.choice(['+', '-', '*', '<', '==', '&&', '||'])
+            return f"({expression(depth + 1)} {operator} {expression(depth + 1)})"
+
+        for s in range(statements):
+            target = rng.choice(variables)
+            parts.append(f"    {target} {rng.choice(['=', '+=', '-=', '*=', '<<=', '>>=', '^='])} {expression()};\n")
+        parts.append(f"    return {expression()};\n}}\n")
+        defined.append((name, len(params)))
+    return "".join(parts)
+
+
+cases = [
+    "int main() { int a; int b; a = 1; b = (a += 2); return b; }",
+    "int main() { int a; int d; a = 3; d = -7; return (a *= d); }",
+    "int main() { int a; a = 5; a -= 2; a *= a; return a; }",
+    "int f(int x) { int y; y = x; y += y; return y; } int main() { int a; a = 4; return f(a -= 1); }",
+    "int main() { int a; int b; a = -37; b = 3; a <<= b; a >>= 2; a ^= b; b <<= 30; b <<= 33; return a + b; }",
+    "int main() { int a; int s; a = 5; s = -1; a <<= s; return a; }",
+    # Calls to functions defined further down.
+    "int main() { int a; a = 2; return f(a) + g(); } int f(int x) { return x * g(); } int g() { return 7; }",
+]
+
+
+@pytest.mark.parametrize("source_text", cases)
+def test_levels_agree_on_compound_assignments(source_text):
+    expected = run_ast(source_text, 0)
+    assert run_ast(source_text, 1) == expected
+    assert run_lowered(source_text, []) == expected
+    assert run_lowered(source_text, None) == expected
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_levels_agree_on_generated_programs(seed):
+    source_text = generate_program(seed)
+    expected = run_ast(source_text, 0)
+    assert run_ast(source_text, 1) == expected, source_text
+    assert run_lowered(source_text, []) == expected, source_text
+    assert run_lowered(source_text, None) == expected, source_text
+
+
+def java_or_error(source_text, level):
+    try:
+        return generate_java_code(optimize(analyzed(source_text), level))
+    except RuntimeError as e:
+        return f"error: {e}"
+
+
+@pytest.mark.parametrize("source_text", [
+    "int main() { int a; int c; a = 3; c = a->b; return c; }",
+    "int main() { int a; int b; a = 1; b = &a; return 0; }",
+    "int main() { int a; a = 1; &a; return 0; }",
+])
+def test_levels_agree_on_unsupported_constructs(source_text):
+    assert java_or_error(source_text, 1) == java_or_error(source_text, 0)
@@ -0,0 +1,65 @@
+"""HeaderCache reuse and invalidation when an included header changes."""
+import os
+
+import preprocessor
+from preprocessor import HeaderCache
+
+header_text = "int twice(int a) { return a * 2; }\n"
+source_text = '#include "h.h"\nint main() { return twice(3); }\n'
+
+
+def write_header(tmp_path, text):
+    header = tmp_path / "h.h"
+    header.write_text(text)
+    return str(header)
+
+
+def preprocess(tmp_path, cache):
+    unit = preprocessor.preprocess(source_text, str(tmp_path / "a.c"), [str(tmp_path)], cache)
+    unit.parse(cache)
+    return unit
+
+
+def test_unchanged_header_is_reused(tmp_path):
+    write_header(tmp_path, header_text)
+    cache = HeaderCache()
+    first = preprocess(tmp_path, cache)
+    assert (cache.hits, cache.misses, cache.parse_hits) == (0, 1, 0)
+    second = preprocess(tmp_path, cache)
+    assert (cache.hits, cache.misses, cache.parse_hits) == (1, 1, 1)
+    assert second.digest() == first.digest()
+
+
+def test_touched_header_with_same_contents_is_a_hit(tmp_path):
+    path = write_header(tmp_path, header_text)
+    cache = HeaderCache()
+    preprocess(tmp_path, cache)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    preprocess(tmp_path, cache)
+    assert (cache.hits, cache.misses, cache.parse_hits) == (1, 1, 1)
+
+
+def test_edited_header_is_rescanned_and_reparsed(tmp_path):
+    path = write_header(tmp_path, header_text)
+    cache = HeaderCache()
+    first = preprocess(tmp_path, cache)
+    cache.record("a.c", first.dependencies)
+    assert cache.up_to_date("a.c")
+    write_header(tmp_path, header_text.replace("a * 2", "a * 2 + 1"))
+    assert not cache.up_to_date("a.c")
+    assert path not in cache.parsed
+    second = preprocess(tmp_path, cache)
+    assert cache.misses == 2
+    assert cache.parse_hits == 0
+    assert second.digest() != first.digest()
+    body = second.parse(cache)
+    assert body["body"][0]["body"][0]["argument"]["operator"] == "+"
+
+
+def test_missing_header_is_not_up_to_date(tmp_path):
+    path = write_header(tmp_path, header_text)
+    cache = HeaderCache()
+    cache.record("a.c", preprocess(tmp_path, cache).dependencies)
+    os.remove(path)
+    assert not cache.up_to_date("a.c")
@@ -0,0 +1,48 @@
+"""The lexical analyzer of new/: the single-pass scan, the rule chain and
+the buffer mode must agree on tokens and on where errors are."""
+import contextlib
+import io
+
+import pytest
+
+from benchmarks import new_path  # noqa: F401  (puts new/ on sys.path for utils)
+from utils import Utils
+
+programa = 'int main() {\n    int a;\n    a <<= 2;\n    a = "é"; b = a;\n}\n'
+
+
+def analisar(modo, texto):
+    """(tokens, identificadores, linhas de erro) de um modo do analisador."""
+    saida = io.StringIO()
+    analisador = Utils(None)
+    with contextlib.redirect_stdout(saida):
+        try:
+            if modo == "scan":
+                analisador.scan(texto)
+            elif modo == "buffer":
+                analisador.scan_buffer(texto.encode())
+            else:
+                for rule in analisador.rules():
+                    texto = rule(texto)
+        except SystemExit:
+            pass
+    erros = [linha for linha in saida.getvalue().splitlines() if linha.startswith("Erro")]
+    return (sorted(map(tuple, analisador.element_list)) if modo != "cadeia" else None,
+            [simbolo.name for simbolo in analisador.tabela_de_simbolos], erros)
+
+
+@pytest.mark.parametrize("modo", ["buffer", "cadeia"])
+def test_modes_agree_with_scan(modo):
+    tokens, simbolos, erros = analisar("scan", programa)
+    assert ("<<=", "operator") in tokens and not erros
+    outros_tokens, outros_simbolos, outros_erros = analisar(modo, programa)
+    assert outros_simbolos == simbolos
+    assert outros_tokens in (None, tokens)
+    assert outros_erros == erros
+
+
+@pytest.mark.parametrize("modo", ["scan", "buffer", "cadeia"])
+def test_illegal_character_position(modo):
+    texto = programa.replace("b = a;", "b = a + é;")
+    _, _, erros = analisar(modo, texto)
+    assert erros == ["Erro: o caractere 'é' não é permitido! (linha 4, coluna 22)"]
@@ -0,0 +1,23 @@
+"""SemanticAnalyzer errors and the symbols it records."""
+import pytest
+
+from main import Lexer, Parser, SemanticAnalyzer
+
+
+def analyze(source_text, compact=False):
+    analyzer = SemanticAnalyzer(Parser(Lexer(source_text), compact).parse())
+    analyzer.analyze()
+    return analyzer
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_errors_report_positions(compact):
+    with pytest.raises(RuntimeError, match=r"Redeclaration of 'a' at 3:9, first declared at 2:9"):
+        analyze("int main() {\n    int a;\n    int a;\n    return 0;\n}", compact)
+    with pytest.raises(RuntimeError, match=r"Undeclared identifier 'b' at 2:16"):
+        analyze("int main() {\n    return 1 + b;\n}", compact)
+
+
+def test_symbols_carry_positions():
+    symbols = {symbol.name: symbol for symbol in analyze("int f(int p) {\n    int q;\n    return p;\n}").symbols}
+    assert [(symbols[name].line, symbols[name].column) for name in ("f", "p", "q")] == [(1, 5), (1, 11), (2, 9)]
@@ -0,0 +1,51 @@
+"""Column-wise token buffers over bytes and memory-mapped files."""
+import pytest
+
+from main import Lexer, Parser, TokenBuffer
+
+source_text = "int f(int a) {\n    return a * 2;\n}\n\nint main() {\n  int é_not_ascii_free;\n}\n"
+clean_source = "int f(int a) {\n    return a * 2;\n}\n\nint main() {\n    return f(21) >= 3;\n}\n"
+
+
+def test_tokens_match_the_lexer():
+    buffer = TokenBuffer(clean_source.encode())
+    assert list(buffer) == Lexer(clean_source).tokens
+    assert buffer[-1] == Lexer(clean_source).tokens[-1]
+    assert len(buffer) == len(Lexer(clean_source).tokens)
+
+
+def test_file_buffer_parses_like_text(tmp_path):
+    path = tmp_path / "a.c"
+    path.write_text(clean_source)
+    lexer = Lexer.from_file(str(path))
+    assert Parser(lexer).parse() == Parser(Lexer(clean_source)).parse()
+    lexer.tokens.close()
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.c"
+    path.write_bytes(b"")
+    assert list(TokenBuffer.from_file(str(path))) == [('EOF', 'EOF', 1, 1)]
+
+
+def test_errors_have_the_lexer_position():
+    with pytest.raises(RuntimeError) as from_text:
+        Lexer(source_text)
+    with pytest.raises(RuntimeError) as from_bytes:
+        TokenBuffer(source_text.encode())
+    assert str(from_bytes.value) == str(from_text.value) == "'é' unexpected on line 6, column 7"
+
+
+def test_scanner_buffer_over_a_mapped_file(tmp_path):
+    from benchmarks import new_path  # noqa: F401  (puts new/ on sys.path for utils)
+    from utils import Utils
+
+    text = 'int main() { /* "x" */ float y; y = 1.5; printf("ok %d", y); }\n// fim\n'
+    path = tmp_path / "a.c"
+    path.write_text(text)
+    scanned = Utils(None)
+    scanned.scan(text.replace('/* "x" */', '').replace('// fim', ''))
+    mapped = Utils(None)
+    mapped.scan_buffer(mapped.mapear_arquivo(str(path)))
+    assert list(mapped.element_list) == scanned.element_list
+    assert list(mapped.lista_de_tokens) == scanned.lista_de_tokens
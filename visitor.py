@@ -0,0 +1,71 @@
+from ast_nodes import Node
+
+
+def node_type(node):
+    if isinstance(node, dict):
+        return node["type"]
+    return type(node).__name__
+
+
+def is_node(value):
+    return isinstance(value, Node) or (isinstance(value, dict) and "type" in value)
+
+
+def children(node):
+    """Child nodes of `node` in field order, for dict and ast_nodes trees."""
+    if isinstance(node, dict):
+        values = node.values()
+    else:
+        values = [getattr(node, slot) for slot in node.__slots__]
+    result = []
+    for value in values:
+        if isinstance(value, list):
+            result.extend(item for item in value if is_node(item))
+        elif is_node(value):
+            result.append(value)
+    return result
+
+
+class NodeVisitor:
+    """Base class for passes run by walk().
+
+    visit_<Type> is called before a node's children and leave_<Type> after
+    them. The handler tables are built once per subclass, so dispatch is a
+    single dict lookup per node and pass.
+    """
+    visit_table = {}
+    leave_table = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.visit_table = {name[6:]: getattr(cls, name) for name in dir(cls) if name.startswith("visit_")}
+        cls.leave_table = {name[6:]: getattr(cls, name) for name in dir(cls) if name.startswith("leave_")}
+
+
+def walk(tree, passes):
+    """Depth-first traversal with an explicit stack, running every pass in
+    `passes` on each node so several analyses share a single walk."""
+    if tree is None:
+        return
+    passes = list(passes)
+    stack = [(tree, False)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        node, leaving = pop()
+        kind = node_type(node)
+        if leaving:
+            for visitor in passes:
+                handler = visitor.leave_table.get(kind)
+                if handler is not None:
+                    handler(visitor, node)
+            continue
+        for visitor in passes:
+            handler = visitor.visit_table.get(kind)
+            if handler is not None:
+                handler(visitor, node)
+        if any(kind in visitor.leave_table for visitor in passes):
+            push((node, True))
+        kids = children(node)
+        for child in reversed(kids):
+            push((child, False))